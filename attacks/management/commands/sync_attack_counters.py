@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from attacks.models import Attack
+from users import cache as user_cache
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Backfill or verify the per-user successful_attacks counter against the Attack table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report users whose counter is out of sync; exit non-zero if any are found',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of users to fix per UPDATE statement',
+        )
+
+    def handle(self, *args, **options):
+        successful_attacks = Attack.objects.filter(
+            attacker=OuterRef('pk'),
+            success=True
+        ).order_by().values('attacker').annotate(total=Count('id')).values('total')
+
+        mismatched_ids = list(
+            User.objects.annotate(
+                actual=Coalesce(Subquery(successful_attacks), 0)
+            ).exclude(
+                successful_attacks=F('actual')
+            ).order_by('pk').values_list('pk', flat=True)
+        )
+
+        if not mismatched_ids:
+            self.stdout.write(self.style.SUCCESS("All successful attack counters are consistent"))
+            return
+
+        if options['check']:
+            raise CommandError(
+                f"{len(mismatched_ids)} users have an out-of-sync successful_attacks counter"
+            )
+
+        batch_size = options['batch_size']
+        fixed = 0
+        for start in range(0, len(mismatched_ids), batch_size):
+            batch = mismatched_ids[start:start + batch_size]
+            fixed += User.objects.filter(pk__in=batch).update(
+                successful_attacks=Coalesce(Subquery(successful_attacks), 0)
+            )
+            user_cache.invalidate(*batch)  # Queryset updates bypass User.save
+
+        self.stdout.write(self.style.SUCCESS(f"Fixed successful_attacks counter for {fixed} users"))
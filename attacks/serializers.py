@@ -30,8 +30,9 @@ class AttackResultSerializer(serializers.ModelSerializer):
 
 
 class AttackHistorySerializer(serializers.ModelSerializer):
+    """Expects attacks fetched with select_related('attacker', 'defender')"""
     opponent_username = serializers.SerializerMethodField()
-    zone_id = serializers.CharField(source='zone.id', read_only=True)
+    zone_id = serializers.CharField(read_only=True)
 
     class Meta:
         model = Attack
@@ -42,7 +43,7 @@ class AttackHistorySerializer(serializers.ModelSerializer):
 
     def get_opponent_username(self, obj):
         # For attacks made by user, show defender
-        if obj.attacker == self.context['user']:
+        if obj.attacker_id == self.context['user'].pk:
             return obj.defender.username if obj.defender else 'Unclaimed Zone'
         # For attacks received by user, show attacker
         else:
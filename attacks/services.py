@@ -2,10 +2,14 @@ import random
 from django.contrib.gis.geos import Point
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
 from django.utils import timezone
 from zones.models import Zone
 from zones.services import ZoneService
-from utils.notifications import send_zone_attack_notification_task, send_zone_result_notification_task
+from leaderboard.services import GameStatsService
+from utils.metrics import timed
+from utils.notifications import NotificationBatch, NotificationService
 from .models import Attack, AttackCooldown
 
 User = get_user_model()
@@ -76,8 +80,14 @@ class AttackService:
         }
 
     @staticmethod
+    @timed('attack')
+    @transaction.atomic
     def execute_attack(attacker, zone_id, attacker_location):
-        """Execute an attack on a zone"""
+        """Execute an attack on a zone
+
+        Runs in one transaction so the attack, stat changes and outbox notifications
+        are committed together, or not at all.
+        """
         # Validate attack
         zone = AttackService.validate_attack(attacker, zone_id, attacker_location)
 
@@ -96,35 +106,51 @@ class AttackService:
             attacker_location=attacker_location,
             xp_gained=battle_result['xp_gained']
         )
-          # Update user XP
-        ZoneService.update_user_stats(attacker, battle_result['xp_gained'])
 
-        # Send notifications
+        GameStatsService.record_attack(zone)
+
+        # Keep the successful attack counter used by the attacks leaderboard in sync
+        if attack.success:
+            User.objects.filter(pk=attacker.pk).update(
+                successful_attacks=F('successful_attacks') + 1
+            )
+            attacker.successful_attacks += 1
+
+        # Collect notifications and dispatch them together
+        notifications = NotificationBatch()
         if zone.owner:
             # Send attack notification to defender
-            send_zone_attack_notification_task.delay(
+            notifications.add(NotificationService.build_zone_attack_notification(
                 zone.owner.id, zone_id, attacker.username
-            )
+            ))
 
         # If attack successful, transfer zone ownership
         if battle_result['success']:
             old_owner = zone.owner
-            zone.claim(attacker)
+            if not zone.claim(attacker, from_owner=old_owner):
+                # Captured or expired since the battle was decided; roll the attack back
+                raise ValueError("Zone changed hands during the attack. Try again")
 
-            # Update both users' zone counts
+            # Update the defender's zone count
             if old_owner:
                 ZoneService.update_user_stats(old_owner, 0)  # Just update count
                 # Send zone lost notification
-                send_zone_result_notification_task.delay(
-                    old_owner.id, zone_id, attacker.username, True
-                )
-            ZoneService.update_user_stats(attacker, 0)  # Just update count
+                notifications.add(NotificationService.build_zone_lost_notification(
+                    old_owner.id, zone_id, attacker.username
+                ))
         else:
             # Attack failed, send defended notification
             if zone.owner:
-                send_zone_result_notification_task.delay(
-                    zone.owner.id, zone_id, attacker.username, False
-                )
+                notifications.add(NotificationService.build_zone_defended_notification(
+                    zone.owner.id, zone_id, attacker.username
+                ))
+
+        # Update attacker XP and zone count in one write, after any ownership change
+        ZoneService.update_user_stats(
+            attacker, battle_result['xp_gained'], zones_captured=1 if battle_result['success'] else 0
+        )
+
+        notifications.flush()  # Delivered by the outbox dispatcher after commit
 
         # Set cooldown
         AttackCooldown.set_cooldown(
@@ -138,14 +164,22 @@ class AttackService:
     @staticmethod
     def get_user_attack_history(user, limit=50):
         """Get user's attack history (both made and received)"""
-        attacks_made = Attack.objects.filter(attacker=user)
-        attacks_received = Attack.objects.filter(defender=user)
-
-        # Combine and sort by timestamp
-        all_attacks = list(attacks_made) + list(attacks_received)
-        all_attacks.sort(key=lambda x: x.timestamp, reverse=True)
+        return list(
+            Attack.objects.filter(
+                Q(attacker=user) | Q(defender=user)
+            ).select_related('attacker', 'defender').order_by('-timestamp')[:limit]
+        )
 
-        return all_attacks[:limit]
+    @staticmethod
+    def get_attack_counts(user):
+        """Count attacks made, defenses and defenses won in one query"""
+        return Attack.objects.filter(
+            Q(attacker=user) | Q(defender=user)
+        ).aggregate(
+            attacks_made=Count('id', filter=Q(attacker=user)),
+            defenses_made=Count('id', filter=Q(defender=user)),
+            defenses_won=Count('id', filter=Q(defender=user, success=False)),
+        )
 
     @staticmethod
     def get_user_cooldowns(user):
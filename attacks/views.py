@@ -13,6 +13,7 @@ from .services import AttackService
 
 class AttackZoneView(APIView):
     """Handle zone attack attempts and get attack history"""
+    query_budget = 20
 
     def post(self, request):
         serializer = AttackSerializer(data=request.data)
@@ -55,9 +56,10 @@ class AttackZoneView(APIView):
         attack_type = request.query_params.get('type', 'made')
 
         if attack_type == 'received':
-            attacks = Attack.objects.filter(defender=request.user).order_by('-timestamp')[:50]
+            attacks = Attack.objects.filter(defender=request.user)
         else:
-            attacks = Attack.objects.filter(attacker=request.user).order_by('-timestamp')[:50]
+            attacks = Attack.objects.filter(attacker=request.user)
+        attacks = attacks.select_related('attacker', 'defender').order_by('-timestamp')[:50]
 
         serializer = AttackHistorySerializer(
             attacks,
@@ -73,6 +75,8 @@ class AttackZoneView(APIView):
 
 class AttackHistoryView(APIView):
     """Get user's attack history"""
+    query_budget = 4
+    read_replica = True
 
     def get(self, request):
         attacks = AttackService.get_user_attack_history(request.user)
@@ -84,7 +88,8 @@ class AttackHistoryView(APIView):
 
         return Response({
             'attacks': serializer.data,
-            'count': len(serializer.data)        })
+            'count': len(serializer.data)
+        })
 
 
 class AttackCooldownView(APIView):
@@ -108,15 +113,18 @@ class AttackCooldownView(APIView):
 
 class AttackStatsView(APIView):
     """Get user's attack statistics"""
+    query_budget = 3
+    read_replica = True
 
     def get(self, request):
         user = request.user
 
         # Calculate attack stats
-        total_attacks = Attack.objects.filter(attacker=user).count()
-        successful_attacks = Attack.objects.filter(attacker=user, success=True).count()
-        total_defenses = Attack.objects.filter(defender=user).count()
-        successful_defenses = Attack.objects.filter(defender=user, success=False).count()
+        counts = AttackService.get_attack_counts(user)
+        total_attacks = counts['attacks_made']
+        successful_attacks = user.successful_attacks
+        total_defenses = counts['defenses_made']
+        successful_defenses = counts['defenses_won']
 
         attack_success_rate = (successful_attacks / total_attacks * 100) if total_attacks > 0 else 0
         defense_success_rate = (successful_defenses / total_defenses * 100) if total_defenses > 0 else 0
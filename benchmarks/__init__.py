@@ -0,0 +1,64 @@
+"""
+Benchmarks for the game backend.
+
+Each bench_* module is a standalone script: it configures Django, creates a throwaway
+test database, seeds it, and prints its results. Run them from the project root:
+
+    python -m benchmarks.bench_leaderboard_cache
+
+benchmarks/loadtest.py drives a running server instead, and benchmarks/micro holds
+pytest-benchmark micro benchmarks. Their extra dependencies are in
+benchmarks/requirements.txt.
+"""
+import os
+import random
+from contextlib import contextmanager
+
+import django
+
+
+def setup_django():
+    """Configure Django for a standalone benchmark script"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """Run the benchmark against a throwaway copy of the configured database"""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed_users(count, prefix='bench'):
+    """Create users with spread-out stats, without hashing a password per user"""
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+
+    users = [
+        User(
+            username=f'{prefix}{i}',
+            password='!',  # Unusable password
+            xp=random.randint(0, 50000),
+            level=random.randint(1, 50),
+            zones_owned=random.randint(0, 30),
+            successful_attacks=random.randint(0, 500),
+        )
+        for i in range(count)
+    ]
+    return User.objects.bulk_create(users, batch_size=1000)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
@@ -0,0 +1,173 @@
+"""
+Sync (WSGI) vs async (ASGI) read endpoints, one worker process each.
+
+Starts gunicorn with a single sync worker on config.wsgi and uvicorn with a single
+worker on config.asgi, then holds N concurrent clients against the nearby, leaderboard
+and profile endpoints (the sync ones on the WSGI server, the /api/v1/async/ ones on the
+ASGI server) for each concurrency level. Per level it reports req/s, p50/p99 latency,
+errors, and the worker's RSS growth per in-flight request. "served" is the highest
+concurrency whose p99 stays under --slo-ms without errors.
+
+Uses the configured database; seed it first:
+
+    python -m benchmarks.loadtest --seed --users 100 --zones 400
+    DB_CONN_MAX_AGE=0 python -m benchmarks.bench_asgi --concurrency 1 10 50 200
+
+Requires httpx (see benchmarks/requirements.txt) and Linux, for /proc RSS readings.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from benchmarks import percentile
+from benchmarks.loadtest import PASSWORD
+
+SERVERS = {
+    'wsgi': (
+        ['gunicorn', 'config.wsgi:application', '--workers', '1', '--worker-class', 'sync', '--backlog', '2048'],
+        '/api/v1/',
+    ),
+    'asgi': (
+        ['uvicorn', 'config.asgi:application', '--workers', '1', '--no-access-log', '--backlog', '2048'],
+        '/api/v1/async/',
+    ),
+}
+
+
+def worker_pid(server):
+    """The process serving requests: gunicorn's only worker, or uvicorn itself"""
+    children = subprocess.run(['pgrep', '-P', str(server.pid)], capture_output=True, text=True).stdout.split()
+    return int(children[0]) if children else server.pid
+
+
+def rss_kb(pid):
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def start(mode, port):
+    command, prefix = SERVERS[mode]
+    bind = ['--bind', f'127.0.0.1:{port}'] if mode == 'wsgi' else ['--host', '127.0.0.1', '--port', str(port)]
+    env = dict(os.environ, QUERY_COUNT_HEADER='False', DEBUG='False')
+    server = subprocess.Popen(command + bind, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return server, prefix
+
+
+async def wait_ready(client):
+    for _ in range(100):
+        try:
+            await client.get('/api/v1/health/')
+            return
+        except Exception:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+
+async def hold(client, prefix, headers, args, concurrency, pid):
+    latencies = []
+    errors = 0
+    peak_rss = 0
+    deadline = time.perf_counter() + args.duration
+    paths = [
+        (f'{prefix}zones/nearby/', {'latitude': args.latitude, 'longitude': args.longitude, 'radius': 200}),
+        (f'{prefix}leaderboard/', {'category': 'xp'}),
+        (f'{prefix}auth/profile/', {}),
+    ]
+
+    async def player(number):
+        nonlocal errors
+        index = number
+        while time.perf_counter() < deadline:
+            path, params = paths[index % len(paths)]
+            index += 1
+            started = time.perf_counter()
+            try:
+                response = await client.get(path, params=params, headers=headers)
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    async def sample_memory():
+        nonlocal peak_rss
+        while time.perf_counter() < deadline:
+            peak_rss = max(peak_rss, rss_kb(pid))
+            await asyncio.sleep(0.05)
+
+    await asyncio.gather(sample_memory(), *(player(i) for i in range(concurrency)))
+    latencies.sort()
+    return {
+        'rps': len(latencies) / args.duration,
+        'p50_ms': percentile(latencies, 50) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 99) * 1000 if latencies else None,
+        'errors': errors,
+        'peak_rss_kb': peak_rss,
+    }
+
+
+async def run(mode, args):
+    import httpx
+
+    server, prefix = start(mode, args.port)
+    try:
+        limits = httpx.Limits(max_connections=max(args.concurrency))
+        async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{args.port}', limits=limits, timeout=60) as client:
+            await wait_ready(client)
+            response = await client.post('/api/v1/auth/login/', json={'username': 'load0', 'password': PASSWORD})
+            response.raise_for_status()
+            headers = {'Authorization': f"Bearer {response.json()['tokens']['access']}"}
+
+            pid = worker_pid(server)
+            await hold(client, prefix, headers, args, 1, pid)  # Warm up caches and connections
+            idle_rss = rss_kb(pid)
+
+            results = []
+            for concurrency in args.concurrency:
+                result = await hold(client, prefix, headers, args, concurrency, pid)
+                result['concurrency'] = concurrency
+                result['kb_per_in_flight'] = (result['peak_rss_kb'] - idle_rss) / concurrency
+                results.append(result)
+            return results
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50, 200])
+    parser.add_argument('--duration', type=float, default=15.0, help='Seconds per concurrency level')
+    parser.add_argument('--slo-ms', type=float, default=500.0, help='p99 latency a level must stay under')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latitude', type=float, default=27.7000)
+    parser.add_argument('--longitude', type=float, default=85.3000)
+    args = parser.parse_args()
+
+    if not sys.platform.startswith('linux'):
+        sys.exit("Reads worker memory from /proc, so it only runs on Linux")
+
+    for mode in SERVERS:
+        results = asyncio.run(run(mode, args))
+        served = max(
+            (r['concurrency'] for r in results if not r['errors'] and r['p99_ms'] is not None and r['p99_ms'] < args.slo_ms),
+            default=0
+        )
+        print(f"{mode}: served {served} concurrent clients within p99 < {args.slo_ms:.0f}ms")
+        print(f"  {'clients':>7s} {'req/s':>8s} {'p50 ms':>8s} {'p99 ms':>8s} {'errors':>7s} {'KB/in-flight':>13s}")
+        for r in results:
+            print(
+                f"  {r['concurrency']:7d} {r['rps']:8.1f} {r['p50_ms'] or 0:8.1f} {r['p99_ms'] or 0:8.1f} "
+                f"{r['errors']:7d} {r['kb_per_in_flight']:13.1f}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Per-request database queries and throughput of an authenticated endpoint with the stock
+JWTAuthentication vs CachedJWTAuthentication.
+
+    python -m benchmarks.bench_auth --users 500 --requests 5000
+"""
+import argparse
+import random
+import time
+
+from benchmarks import seed_users, setup_django, test_database
+
+
+def run(authentication_class, tokens, requests):
+    """Send profile requests for random users, returning (req/s, queries per request)"""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIRequestFactory
+    from users.views import ProfileView
+
+    view = ProfileView.as_view(authentication_classes=[authentication_class])
+    factory = APIRequestFactory()
+
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        for _ in range(requests):
+            request = factory.get('/api/v1/auth/profile/', HTTP_AUTHORIZATION=f'Bearer {random.choice(tokens)}')
+            response = view(request)
+            assert response.status_code == 200
+        elapsed = time.perf_counter() - started
+
+    return requests / elapsed, len(queries) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+        from rest_framework_simplejwt.tokens import AccessToken
+        from users.authentication import CachedJWTAuthentication
+
+        tokens = [str(AccessToken.for_user(user)) for user in seed_users(args.users)]
+
+        stock_rate, stock_queries = run(JWTAuthentication, tokens, args.requests)
+        cached_rate, cached_queries = run(CachedJWTAuthentication, tokens, args.requests)
+
+        print(f"users={args.users} requests={args.requests} (profile endpoint)")
+        print(f"  JWTAuthentication:       {stock_rate:8.1f} req/s  {stock_queries:.2f} queries/request")
+        print(f"  CachedJWTAuthentication: {cached_rate:8.1f} req/s  {cached_queries:.2f} queries/request")
+
+
+if __name__ == '__main__':
+    main()
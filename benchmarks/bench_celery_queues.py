@@ -0,0 +1,118 @@
+"""
+Push latency while batch jobs are running, with one shared queue vs the dedicated queues
+from CELERY_TASK_ROUTES. Runs Celery workers in-process against an in-memory broker, so
+no Redis or database is needed.
+
+Shared: one worker with two slots consumes every task. Dedicated: a notifications worker
+and a batch worker with one slot each, started with the prefetch values used in
+docker-compose.yml. Latency is measured from enqueue to the push task starting.
+
+    python -m benchmarks.bench_celery_queues --batch-jobs 4 --batch-seconds 2 --pushes 50
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from celery import Celery
+from celery.contrib.testing.worker import start_worker
+
+from benchmarks import setup_django
+
+
+def build_app(routes):
+    app = Celery('bench', broker='memory://', backend='cache+memory://')
+    app.conf.update(
+        task_routes=routes,
+        task_default_queue='batch',
+        worker_prefetch_multiplier=1,
+        broker_transport_options={'polling_interval': 0.005},
+        worker_hijack_root_logger=False,
+    )
+    latencies = []
+    lock = threading.Lock()
+
+    @app.task(name='bench.push')
+    def push(enqueued_at):
+        with lock:
+            latencies.append(time.perf_counter() - enqueued_at)
+
+    @app.task(name='bench.rebuild')
+    def rebuild(seconds):
+        time.sleep(seconds)
+
+    return app, push, rebuild, latencies
+
+
+def run(mode, args, routes):
+    app, push, rebuild, latencies = build_app(routes if mode == 'dedicated' else {})
+    workers = (
+        [{'queues': ['batch'], 'concurrency': 2, 'prefetch_multiplier': 4}]
+        if mode == 'shared' else
+        [
+            {'queues': ['notifications'], 'concurrency': 1, 'prefetch_multiplier': 4},
+            {'queues': ['batch'], 'concurrency': 1, 'prefetch_multiplier': 1},
+        ]
+    )
+
+    contexts = [
+        start_worker(
+            app, pool='threads', concurrency=worker['concurrency'], queues=worker['queues'],
+            prefetch_multiplier=worker['prefetch_multiplier'], perform_ping_check=False,
+            shutdown_timeout=args.batch_seconds * args.batch_jobs + 10,
+        )
+        for worker in workers
+    ]
+    for context in contexts:
+        context.__enter__()
+    try:
+        for _ in range(args.batch_jobs):
+            rebuild.delay(args.batch_seconds)
+        for _ in range(args.pushes):
+            push.delay(time.perf_counter())
+            time.sleep(args.push_interval)
+
+        deadline = time.time() + args.batch_seconds * args.batch_jobs + 10
+        while len(latencies) < args.pushes and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        for context in reversed(contexts):
+            context.__exit__(None, None, None)
+    return sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--batch-jobs', type=int, default=4)
+    parser.add_argument('--batch-seconds', type=float, default=2.0)
+    parser.add_argument('--pushes', type=int, default=50)
+    parser.add_argument('--push-interval', type=float, default=0.02)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+
+    # Route the stand-in tasks the way the real ones are routed
+    routes = {
+        'bench.push': settings.CELERY_TASK_ROUTES['utils.notifications.*'],
+        'bench.rebuild': settings.CELERY_TASK_ROUTES['leaderboard.tasks.*'],
+    }
+
+    print(
+        f"{args.batch_jobs} batch jobs of {args.batch_seconds}s, "
+        f"{args.pushes} pushes every {args.push_interval * 1000:.0f}ms"
+    )
+    for mode in ('shared', 'dedicated'):
+        latencies = run(mode, args, routes)
+        if not latencies:
+            print(f"  {mode:9s}: no pushes ran")
+            continue
+        p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+        print(
+            f"  {mode:9s}: push latency p50 {statistics.median(latencies) * 1000:8.1f} ms  "
+            f"p95 {p95 * 1000:8.1f} ms  max {latencies[-1] * 1000:8.1f} ms  ({len(latencies)} ran)"
+        )
+
+
+if __name__ == '__main__':
+    main()
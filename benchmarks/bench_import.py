@@ -0,0 +1,71 @@
+"""
+Worker boot cost of loading the app with Firebase initialized lazily vs eagerly.
+
+Each run starts a fresh interpreter, sets up Django and imports attacks.services (which
+pulls in utils.notifications), then reports wall time and peak RSS. The eager variant
+also imports firebase_admin and its messaging module, as module import used to.
+
+    python -m benchmarks.bench_import --runs 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = '''
+import json, os, resource, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+import django
+django.setup()
+import attacks.services
+if sys.argv[1] == 'eager':
+    import firebase_admin
+    from firebase_admin import credentials, messaging
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    'seconds': elapsed,
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'firebase_loaded': 'firebase_admin' in sys.modules,
+}))
+'''
+
+
+def measure(mode, runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE, mode],
+            capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        'seconds': statistics.median(sample['seconds'] for sample in samples),
+        'rss_kb': statistics.median(sample['rss_kb'] for sample in samples),
+        'firebase_loaded': samples[-1]['firebase_loaded'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    lazy = measure('lazy', args.runs)
+    eager = measure('eager', args.runs)
+
+    print(f"median of {args.runs} fresh interpreters")
+    for name, result in (('lazy', lazy), ('eager', eager)):
+        print(
+            f"  {name:5s} boot: {result['seconds'] * 1000:8.1f} ms  "
+            f"peak RSS {result['rss_kb'] / 1024:7.1f} MiB  firebase loaded={result['firebase_loaded']}"
+        )
+    print(
+        f"  saved: {(eager['seconds'] - lazy['seconds']) * 1000:.1f} ms, "
+        f"{(eager['rss_kb'] - lazy['rss_kb']) / 1024:.1f} MiB per process"
+    )
+
+
+if __name__ == '__main__':
+    main()
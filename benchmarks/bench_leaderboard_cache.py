@@ -0,0 +1,60 @@
+"""
+Leaderboard read throughput with and without the versioned response cache.
+
+    python -m benchmarks.bench_leaderboard_cache --requests 2000 --hit-rate 0.95
+"""
+import argparse
+import time
+
+from benchmarks import seed_users, setup_django, test_database
+
+
+def run(view, factory, user, requests, hit_rate):
+    """Send requests, bumping the leaderboard version so that (1 - hit_rate) of them miss"""
+    from rest_framework.test import force_authenticate
+    from leaderboard import cache as leaderboard_cache
+
+    miss_every = max(1, round(1 / (1 - hit_rate))) if hit_rate < 1 else None
+
+    started = time.perf_counter()
+    for i in range(requests):
+        if miss_every and i % miss_every == 0:
+            leaderboard_cache.bump_version('xp')
+        request = factory.get('/api/v1/leaderboard/', {'category': 'xp'})
+        force_authenticate(request, user=user)
+        response = view(request)
+        assert response.status_code == 200
+    elapsed = time.perf_counter() - started
+
+    return requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--hit-rate', type=float, default=0.95)
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        from rest_framework.test import APIRequestFactory
+        from leaderboard.services import LeaderboardService
+        from leaderboard.views import LeaderboardView
+
+        users = seed_users(args.users)
+        LeaderboardService.update_leaderboard('xp')
+
+        view = LeaderboardView.as_view()
+        factory = APIRequestFactory()
+
+        uncached = run(view, factory, users[0], args.requests, hit_rate=0)
+        cached = run(view, factory, users[0], args.requests, hit_rate=args.hit_rate)
+
+        print(f"users={args.users} requests={args.requests}")
+        print(f"  every request rebuilt:   {uncached:8.1f} req/s")
+        print(f"  {args.hit_rate:.0%} cache hit rate:     {cached:8.1f} req/s ({cached / uncached:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
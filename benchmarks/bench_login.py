@@ -0,0 +1,80 @@
+"""
+Login throughput per core for each password hasher, through the real LoginView, plus the
+cost of a refresh token rotation. Hashers whose library isn't installed are skipped.
+
+    python -m benchmarks.bench_login --logins 50
+"""
+import argparse
+import time
+
+from benchmarks import setup_django, test_database
+
+HASHERS = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'argon2': 'users.hashers.TunedArgon2PasswordHasher',
+    'bcrypt': 'users.hashers.TunedBCryptSHA256PasswordHasher',
+}
+
+
+def run_logins(name, hasher, logins):
+    """Log one user in repeatedly in this process, returning logins per second"""
+    from django.contrib.auth import get_user_model
+    from django.test import override_settings
+    from rest_framework.test import APIRequestFactory
+    from users.views import LoginView
+
+    User = get_user_model()
+    view = LoginView.as_view()
+    factory = APIRequestFactory()
+
+    with override_settings(PASSWORD_HASHERS=[hasher]):
+        User.objects.create_user(username=f'login-{name}', password='bench-password')
+        payload = {'username': f'login-{name}', 'password': 'bench-password', 'push_token': f'token-{name}'}
+
+        started = time.perf_counter()
+        for _ in range(logins):
+            response = view(factory.post('/api/v1/auth/login/', payload, format='json'))
+            assert response.status_code == 200
+        return logins / (time.perf_counter() - started), response.data['tokens']['refresh']
+
+
+def run_refreshes(refresh, count):
+    from users.serializers import FamilyTokenRefreshSerializer
+
+    started = time.perf_counter()
+    for _ in range(count):
+        serializer = FamilyTokenRefreshSerializer(data={'refresh': refresh})
+        serializer.is_valid(raise_exception=True)
+        refresh = serializer.validated_data['refresh']
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logins', type=int, default=50)
+    parser.add_argument('--refreshes', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        from django.utils.module_loading import import_string
+
+        print(f"logins={args.logins} (single process, so rates are per core)")
+        refresh = None
+        for name, path in HASHERS.items():
+            hasher = import_string(path)()
+            if hasher.library:
+                try:
+                    hasher._load_library()
+                except ValueError as e:
+                    print(f"  {name:7s}: skipped ({e})")
+                    continue
+            rate, refresh = run_logins(name, path, args.logins)
+            print(f"  {name:7s}: {rate:8.1f} logins/s  ({1000 / rate:6.1f} ms each)")
+
+        if refresh:
+            print(f"  refresh rotation: {run_refreshes(refresh, args.refreshes):8.1f} refreshes/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Per-call overhead of the Prometheus instrumentation.
+
+Times a trivial function bare and wrapped with utils.metrics.timed, plus a labelled
+counter increment, in a fresh interpreter per mode: in-process values, and mmap'd files
+under PROMETHEUS_MULTIPROC_DIR as gunicorn and Celery run with. No database needed.
+
+    python -m benchmarks.bench_metrics --calls 200000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+PROBE = '''
+import json, sys, timeit
+from utils.metrics import NOTIFICATIONS, timed
+
+def work():
+    return 1
+
+instrumented = timed('bench')(work)
+calls = int(sys.argv[1])
+
+def per_call(func):
+    return min(timeit.repeat(func, number=calls, repeat=5)) / calls * 1e6
+
+print(json.dumps({
+    'bare_us': per_call(work),
+    'timed_us': per_call(instrumented),
+    'counter_us': per_call(lambda: NOTIFICATIONS.labels('bench').inc()),
+}))
+'''
+
+
+def measure(calls, multiproc_dir=None):
+    env = dict(os.environ)
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    if multiproc_dir:
+        env['PROMETHEUS_MULTIPROC_DIR'] = multiproc_dir
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, str(calls)],
+        capture_output=True, text=True, check=True, env=env
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--budget-us', type=float, default=5.0, help='Fail when timed() adds more than this')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as multiproc_dir:
+        results = {
+            'single process': measure(args.calls),
+            'multiprocess': measure(args.calls, multiproc_dir),
+        }
+
+    over_budget = False
+    for mode, result in results.items():
+        overhead = result['timed_us'] - result['bare_us']
+        over_budget |= overhead > args.budget_us
+        print(
+            f"{mode:15s} bare {result['bare_us']:.2f}us  timed {result['timed_us']:.2f}us "
+            f"(+{overhead:.2f}us)  counter.labels().inc() {result['counter_us']:.2f}us"
+        )
+    if over_budget:
+        sys.exit(f"Instrumentation overhead is above {args.budget_us}us per call")
+
+
+if __name__ == '__main__':
+    main()
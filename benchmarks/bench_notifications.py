@@ -0,0 +1,57 @@
+"""
+Push throughput of the per-message path vs batched send_each, using the in-memory
+transport with a simulated FCM round trip.
+
+    python -m benchmarks.bench_notifications --messages 2000 --latency-ms 20
+"""
+import argparse
+import time
+
+from benchmarks import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    args = parser.parse_args()
+
+    setup_django()
+    from utils.notifications import InMemoryTransport, NotificationService, set_transport
+
+    messages = [
+        {
+            'token': f'token-{i}',
+            'title': "Zone Under Attack!",
+            'body': f"attacker{i} is attacking your zone zone_{i}_{i}",
+            'data': {'type': 'zone_attack', 'zone_id': f'zone_{i}_{i}', 'attacker': f'attacker{i}'},
+        }
+        for i in range(args.messages)
+    ]
+
+    transport = InMemoryTransport(latency=args.latency_ms / 1000)
+    previous = set_transport(transport)
+    try:
+        started = time.perf_counter()
+        for message in messages:
+            NotificationService.send_push_notification(
+                message['token'], message['title'], message['body'], message['data']
+            )
+        per_message = args.messages / (time.perf_counter() - started)
+        per_message_calls = transport.calls
+
+        transport.calls = 0
+        started = time.perf_counter()
+        NotificationService.send_messages(messages)
+        batched = args.messages / (time.perf_counter() - started)
+        batched_calls = transport.calls
+    finally:
+        set_transport(previous)
+
+    print(f"messages={args.messages} simulated round trip={args.latency_ms}ms")
+    print(f"  per-message send: {per_message:10.1f} msg/s ({per_message_calls} transport calls)")
+    print(f"  batched send_each: {batched:9.1f} msg/s ({batched_calls} transport calls)")
+
+
+if __name__ == '__main__':
+    main()
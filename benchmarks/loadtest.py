@@ -0,0 +1,265 @@
+"""
+End-to-end load test against a running server.
+
+Virtual players log in, then loop through realistic behaviour: walk between grid cells,
+look at nearby zones, check in where they stand, attack zones owned by others and check
+the leaderboard. Per endpoint it reports requests/sec, p50/p95/p99 latency, errors and
+the SQL queries per request (from the X-DB-Query-Count header the server sends when
+QUERY_COUNT_HEADER is on), and can write everything as JSON for diffing across commits.
+
+    # Seed players and zones into the configured database, then run for a minute
+    python -m benchmarks.loadtest --seed --users 1000 --zones 2500
+    python -m benchmarks.loadtest --players 50 --duration 60 --output results.json
+
+    # Compare two runs
+    python -m benchmarks.loadtest --compare before.json results.json
+
+Requires httpx (see benchmarks/requirements.txt).
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from collections import defaultdict
+
+from benchmarks import percentile
+
+PASSWORD = 'load-test-password'
+CELL = 0.0002  # Grid cell size in degrees (~22m), matching one zone per cell
+ENDPOINTS = ('login', 'nearby', 'checkin', 'attack', 'leaderboard')
+
+
+def zone_id(row, col):
+    return f'load_{row}_{col}'
+
+
+def cell_location(args, row, col):
+    return args.latitude + row * CELL, args.longitude + col * CELL
+
+
+def seed(args):
+    """Create load test players and a square grid of zones, replacing earlier ones"""
+    from benchmarks import setup_django
+    setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.gis.geos import Point
+    from zones.models import Zone
+
+    User = get_user_model()
+    User.objects.filter(username__startswith='load').delete()
+    Zone.objects.filter(id__startswith='load_').delete()
+
+    password = make_password(PASSWORD)  # Hash once, share between players
+    User.objects.bulk_create(
+        [User(username=f'load{i}', password=password) for i in range(args.users)],
+        batch_size=1000
+    )
+
+    side = int(args.zones ** 0.5)
+    zones = []
+    for row in range(side):
+        for col in range(side):
+            latitude, longitude = cell_location(args, row, col)
+            zones.append(Zone(id=zone_id(row, col), location=Point(longitude, latitude)))
+    Zone.objects.bulk_create(zones, batch_size=1000)
+    print(f"Seeded {args.users} players and {len(zones)} zones ({side}x{side} grid)")
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.queries = defaultdict(list)
+
+    def record(self, endpoint, started, response):
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        if response.status_code >= 500 or response.status_code in (401, 403):
+            self.errors[endpoint] += 1
+        count = response.headers.get('X-DB-Query-Count')
+        if count is not None:
+            self.queries[endpoint].append(int(count))
+
+    def report(self, elapsed):
+        endpoints = {}
+        for endpoint in ENDPOINTS:
+            latencies = sorted(self.latencies.get(endpoint, []))
+            if not latencies:
+                continue
+            queries = self.queries.get(endpoint)
+            endpoints[endpoint] = {
+                'requests': len(latencies),
+                'rps': len(latencies) / elapsed,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+                'errors': self.errors.get(endpoint, 0),
+                'queries_per_request': sum(queries) / len(queries) if queries else None,
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        return {'endpoints': endpoints, 'total_requests': total, 'total_rps': total / elapsed}
+
+
+async def player(client, args, number, stats, deadline):
+    """One virtual player: log in, then act until the deadline"""
+    side = int(args.zones ** 0.5)
+    username = f'load{number % args.users}'
+
+    started = time.perf_counter()
+    response = await client.post('/api/v1/auth/login/', json={'username': username, 'password': PASSWORD})
+    stats.record('login', started, response)
+    if response.status_code != 200:
+        return
+    client_headers = {'Authorization': f"Bearer {response.json()['tokens']['access']}"}
+
+    row, col = random.randrange(side), random.randrange(side)
+    rivals = []
+    while time.perf_counter() < deadline:
+        action = random.choices(
+            ('walk', 'nearby', 'checkin', 'attack', 'leaderboard'),
+            weights=(30, 25, 25, 10, 10)
+        )[0]
+        latitude, longitude = cell_location(args, row, col)
+
+        if action == 'walk':
+            row = min(side - 1, max(0, row + random.choice((-1, 0, 1))))
+            col = min(side - 1, max(0, col + random.choice((-1, 0, 1))))
+            continue
+
+        started = time.perf_counter()
+        if action == 'nearby':
+            response = await client.get(
+                '/api/v1/zones/nearby/',
+                params={'latitude': latitude, 'longitude': longitude, 'radius': 200},
+                headers=client_headers
+            )
+            if response.status_code == 200:
+                rivals = [
+                    zone for zone in response.json()['zones']
+                    if zone['is_claimed'] and zone['owner_username'] != username and zone['id'].startswith('load_')
+                ]
+        elif action == 'checkin':
+            response = await client.post(
+                f'/api/v1/zones/{zone_id(row, col)}/checkin/',
+                json={'latitude': latitude, 'longitude': longitude},
+                headers=client_headers
+            )
+        elif action == 'attack':
+            if not rivals:
+                continue
+            _, target_row, target_col = random.choice(rivals)['id'].split('_')
+            row, col = int(target_row), int(target_col)  # Walk there first
+            latitude, longitude = cell_location(args, row, col)
+            response = await client.post(
+                '/api/v1/attacks/',
+                json={'zone_id': zone_id(row, col), 'latitude': latitude, 'longitude': longitude},
+                headers=client_headers
+            )
+            rivals = []
+        else:
+            response = await client.get(
+                '/api/v1/leaderboard/', params={'category': 'xp'}, headers=client_headers
+            )
+        stats.record(action, started, response)
+
+        if args.think_ms:
+            await asyncio.sleep(random.uniform(0, 2 * args.think_ms) / 1000)
+
+
+async def run(args):
+    import httpx
+
+    stats = Stats()
+    limits = httpx.Limits(max_connections=args.players)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(player(client, args, i, stats, deadline) for i in range(args.players)))
+        elapsed = time.perf_counter() - started
+    return stats.report(elapsed)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report):
+    print(f"{'endpoint':12s} {'requests':>9s} {'rps':>8s} {'p50 ms':>8s} {'p95 ms':>8s} "
+          f"{'p99 ms':>8s} {'errors':>7s} {'queries':>8s}")
+    for endpoint, result in report['endpoints'].items():
+        queries = result['queries_per_request']
+        print(
+            f"{endpoint:12s} {result['requests']:9d} {result['rps']:8.1f} {result['p50_ms']:8.1f} "
+            f"{result['p95_ms']:8.1f} {result['p99_ms']:8.1f} {result['errors']:7d} "
+            f"{queries if queries is None else f'{queries:.1f}':>8}"
+        )
+    print(f"total: {report['total_requests']} requests, {report['total_rps']:.1f} req/s")
+
+
+def compare(before_path, after_path):
+    """Print per-endpoint changes between two JSON reports"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    for endpoint in ENDPOINTS:
+        old = before['endpoints'].get(endpoint)
+        new = after['endpoints'].get(endpoint)
+        if not old or not new:
+            continue
+        changes = []
+        for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request'):
+            if old[key] is None or new[key] is None:
+                continue
+            change = (new[key] - old[key]) / old[key] * 100 if old[key] else 0
+            changes.append(f"{key} {old[key]:.1f}->{new[key]:.1f} ({change:+.0f}%)")
+        print(f"  {endpoint:12s} " + '  '.join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--seed', action='store_true', help='Seed players and zones, then exit')
+    parser.add_argument('--users', type=int, default=1000, help='Seeded players to log in as')
+    parser.add_argument('--zones', type=int, default=2500, help='Seeded zones, laid out as a square grid')
+    parser.add_argument('--latitude', type=float, default=27.7000)
+    parser.add_argument('--longitude', type=float, default=85.3000)
+    parser.add_argument('--players', type=int, default=50, help='Concurrent virtual players')
+    parser.add_argument('--duration', type=float, default=60.0, help='Seconds to run')
+    parser.add_argument('--think-ms', type=float, default=100.0, help='Mean pause between actions')
+    parser.add_argument('--output', help='Write the report as JSON to this path')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='Compare two JSON reports')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.seed:
+        seed(args)
+        return
+
+    report = asyncio.run(run(args))
+    report.update({
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'config': {key: getattr(args, key) for key in ('base_url', 'users', 'zones', 'players', 'duration', 'think_ms')},
+    })
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+
+@pytest.fixture(autouse=True)
+def local_cache(settings):
+    """Keep micro benchmarks off the shared Redis cache"""
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
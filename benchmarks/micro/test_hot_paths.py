@@ -0,0 +1,56 @@
+"""
+Micro benchmarks for pure-Python hot paths, run with pytest-benchmark:
+
+    pytest benchmarks/micro --benchmark-json=micro.json
+"""
+import random
+
+from django.contrib.auth import get_user_model
+from leaderboard.codecs import decode_scores, encode_scores
+from users import cache as user_cache
+from users.curves import get_curve
+from utils.notifications import NotificationService
+
+User = get_user_model()
+
+
+def ranked_scores(count=10000):
+    return sorted((random.randint(0, 50000) for _ in range(count)), reverse=True)
+
+
+def test_encode_keyframe(benchmark):
+    scores = ranked_scores()
+    benchmark(encode_scores, scores)
+
+
+def test_decode_delta(benchmark):
+    base = ranked_scores()
+    scores = [score + random.randint(0, 50) for score in base]
+    blob = encode_scores(scores, base)
+    assert benchmark(decode_scores, blob, base) == scores
+
+
+def test_level_lookup(benchmark):
+    curve = get_curve()
+    xps = [random.randint(0, 100000) for _ in range(10000)]
+    benchmark(lambda: [curve.level_for_xp(xp) for xp in xps])
+
+
+def test_attack_power(benchmark):
+    user = User(level=25, zones_owned=7)
+    benchmark(lambda: user.attack_power)
+
+
+def test_build_digest(benchmark):
+    notifications = [
+        NotificationService.build_zone_attack_notification(1, f'zone_{i}_{i}', f'raider{i % 7}')
+        for i in range(50)
+    ]
+    benchmark(NotificationService.build_digest_notification, 1, notifications)
+
+
+def test_cached_user_hit(benchmark):
+    user = User(id=1, username='player')
+    user_cache.clear_local()
+    user_cache.get_user(1, lambda: user)
+    benchmark(user_cache.get_user, 1, lambda: user)
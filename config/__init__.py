@@ -1,3 +1,4 @@
 from .celery import app as celery_app
+from . import celery_config  # noqa: F401  Registers the beat schedule
 
 __all__ = ('celery_app',)
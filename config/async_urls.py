@@ -0,0 +1,15 @@
+"""
+Async read endpoints, served without blocking the event loop when running under ASGI
+(config/asgi.py). They mirror their sync counterparts' responses; writes stay sync.
+"""
+from django.urls import path
+from leaderboard import async_views as leaderboard_views
+from users import async_views as users_views
+from zones import async_views as zones_views
+
+urlpatterns = [
+    path('zones/nearby/', zones_views.nearby_zones, name='async_nearby_zones'),
+    path('zones/live/', zones_views.live_zones, name='live_zones'),
+    path('leaderboard/', leaderboard_views.leaderboard, name='async_leaderboard'),
+    path('auth/profile/', users_views.profile, name='async_profile'),
+]
@@ -8,3 +8,8 @@ app = Celery('gameapp')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
 app.autodiscover_tasks()
+
+from utils import metrics, profiling, replicas  # noqa: E402  Needs DJANGO_SETTINGS_MODULE set above
+metrics.connect_celery_signals()
+profiling.connect_celery_signals()
+replicas.connect_celery_signals()
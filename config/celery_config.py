@@ -11,6 +11,26 @@ celery_app.conf.beat_schedule = {
         'task': 'leaderboard.tasks.update_leaderboards',
         'schedule': crontab(minute=0, hour='*/4'),  # Every 4 hours
     },
+    'close-leaderboard-periods': {
+        'task': 'leaderboard.tasks.close_leaderboard_periods',
+        'schedule': crontab(minute=5),  # Every hour, shortly after the period boundary
+    },
+    'prune-leaderboard-snapshots': {
+        'task': 'leaderboard.tasks.prune_leaderboard_snapshots',
+        'schedule': crontab(minute=30, hour=3),  # Daily
+    },
+    'reconcile-game-stats': {
+        'task': 'leaderboard.tasks.reconcile_game_stats',
+        'schedule': crontab(minute=45, hour=4),  # Daily
+    },
+    'flush-progression': {
+        'task': 'users.tasks.flush_progression',
+        'schedule': crontab(),  # Every minute, behind the flusher threads
+    },
+    'prune-notification-outbox': {
+        'task': 'notifications.tasks.prune_notification_outbox',
+        'schedule': crontab(minute=15, hour=5),  # Daily
+    },
 }
 
 celery_app.conf.timezone = 'UTC'
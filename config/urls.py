@@ -5,6 +5,8 @@ from rest_framework import permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.utils import timezone
+from utils.metrics import metrics_view
+from utils.views import ProfileDetailView, ProfileListView
 
 class HealthCheckView(APIView):
     """Simple health check endpoint"""
@@ -43,5 +45,10 @@ urlpatterns = [
     path('api/v1/zones/', include('zones.urls')),
     path('api/v1/attacks/', include('attacks.urls')),
     path('api/v1/leaderboard/', include('leaderboard.urls')),
+    path('api/v1/notifications/', include('notifications.urls')),
+    path('api/v1/async/', include('config.async_urls')),
     path('api/v1/health/', HealthCheckView.as_view(), name='health_check'),
+    path('metrics', metrics_view, name='metrics'),
+    path('api/v1/profiles/', ProfileListView.as_view(), name='profiles'),
+    path('api/v1/profiles/<int:profile_id>/', ProfileDetailView.as_view(), name='profile_detail'),
 ]
@@ -15,7 +15,7 @@ print(f'Path exists: {os.path.exists(settings.FIREBASE_CREDENTIALS_PATH) if sett
 try:
     import firebase_admin
     print('✅ Firebase Admin SDK installed')
-    print(f'Apps initialized: {len(firebase_admin._apps)}')
+    print(f'Push transport: {settings.PUSH_TRANSPORT} (the Firebase app is created on first send)')
 except ImportError:
     print('❌ Firebase Admin SDK not installed')
 
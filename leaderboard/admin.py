@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import LeaderboardEntry, LeaderboardSnapshot
+from .models import LeaderboardEntry, LeaderboardPeriodScore, LeaderboardSnapshot
 
 
 @admin.register(LeaderboardEntry)
@@ -11,9 +11,18 @@ class LeaderboardEntryAdmin(admin.ModelAdmin):
     readonly_fields = ('last_updated',)
 
 
+@admin.register(LeaderboardPeriodScore)
+class LeaderboardPeriodScoreAdmin(admin.ModelAdmin):
+    list_display = ('user', 'period', 'period_start', 'xp_gained', 'zones_captured', 'last_updated')
+    list_filter = ('period', 'period_start')
+    search_fields = ('user__username',)
+    ordering = ('-period_start', '-xp_gained')
+    readonly_fields = ('last_updated',)
+
+
 @admin.register(LeaderboardSnapshot)
 class LeaderboardSnapshotAdmin(admin.ModelAdmin):
-    list_display = ('category', 'snapshot_date')
-    list_filter = ('category', 'snapshot_date')
+    list_display = ('category', 'period', 'period_start', 'encoding', 'snapshot_date')
+    list_filter = ('category', 'period', 'encoding', 'snapshot_date')
     ordering = ('-snapshot_date',)
-    readonly_fields = ('snapshot_date', 'data')
+    readonly_fields = ('snapshot_date', 'encoding', 'base', 'user_ids', 'scores', 'data')
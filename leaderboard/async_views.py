@@ -0,0 +1,43 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.renderers import JSONRenderer
+from utils.async_api import async_api_view, json_response
+from . import cache as leaderboard_cache
+from .views import LeaderboardView, parse_limit, validate_leaderboard_params
+
+
+@async_api_view()
+async def leaderboard(request):
+    """Get leaderboard for specified category, served from the response cache when current"""
+    category = request.GET.get('category', 'xp')
+    period = request.GET.get('period', 'all')
+    limit = parse_limit(request.GET.get('limit', 100), 100)
+
+    error = validate_leaderboard_params(category, period)
+    if limit is None:
+        error = 'Invalid limit. Use a positive number'
+    if error:
+        return json_response({'error': error}, status_code=400)
+
+    scope = leaderboard_cache.get_scope(category, period)
+    version = await leaderboard_cache.aget_version(scope)
+    etag = leaderboard_cache.get_etag(scope, limit, version)
+
+    body = await leaderboard_cache.aget_response(scope, limit, version)
+    cacheable = body is not None
+    if body is None:
+        payload, cacheable = await sync_to_async(LeaderboardView.build_leaderboard)(category, period, limit)
+        body = JSONRenderer().render(payload)
+        if cacheable:
+            await leaderboard_cache.aset_response(scope, limit, version, body)
+
+    if cacheable and request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    response = HttpResponse(body, content_type='application/json')
+    if cacheable:
+        response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
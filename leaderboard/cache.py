@@ -0,0 +1,85 @@
+"""
+Versioned response cache for leaderboard reads.
+
+Each leaderboard (a category, or a category and period window) has a version counter in
+the shared cache. Rendered responses are stored under a key that includes the version, so
+bumping the version after a rebuild or incremental update invalidates every cached
+page at once without having to find and delete them.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'leaderboard:version:{scope}'
+RESPONSE_KEY = 'leaderboard:response:{scope}:{limit}:v{version}'
+
+
+def get_scope(category, period='all', period_start=None):
+    """The cache scope of a leaderboard; windowed ones get a new scope every period"""
+    if period == 'all':
+        return category
+    if period_start is None:
+        from .services import PeriodLeaderboardService
+        period_start = PeriodLeaderboardService.get_period_start(period)
+    return f'{category}:{period}:{period_start.isoformat()}'
+
+
+def get_version(scope):
+    """Get the current version of a leaderboard, starting at 1"""
+    key = VERSION_KEY.format(scope=scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+    return version
+
+
+async def aget_version(scope):
+    key = VERSION_KEY.format(scope=scope)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, 1, None)
+        version = await cache.aget(key, 1)
+    return version
+
+
+def bump_version(scope):
+    """Invalidate cached responses for a leaderboard once the current transaction commits"""
+    key = VERSION_KEY.format(scope=scope)
+
+    def _bump():
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, None)
+
+    transaction.on_commit(_bump)
+
+
+def get_etag(scope, limit, version):
+    return f'"{scope}-{limit}-v{version}"'
+
+
+def get_response(scope, limit, version):
+    """Get pre-rendered response bytes, or None on a miss"""
+    return cache.get(RESPONSE_KEY.format(scope=scope, limit=limit, version=version))
+
+
+def set_response(scope, limit, version, body):
+    cache.set(
+        RESPONSE_KEY.format(scope=scope, limit=limit, version=version),
+        body,
+        settings.LEADERBOARD_RESPONSE_CACHE_TIMEOUT
+    )
+
+
+async def aget_response(scope, limit, version):
+    return await cache.aget(RESPONSE_KEY.format(scope=scope, limit=limit, version=version))
+
+
+async def aset_response(scope, limit, version, body):
+    await cache.aset(
+        RESPONSE_KEY.format(scope=scope, limit=limit, version=version),
+        body,
+        settings.LEADERBOARD_RESPONSE_CACHE_TIMEOUT
+    )
@@ -0,0 +1,66 @@
+"""
+Compact encoding for leaderboard snapshot score columns.
+
+Scores are stored as zigzag varints of differences, then zlib-compressed. A keyframe
+stores each score relative to the one ranked above it; a delta stores each score
+relative to the score at the same rank in its base snapshot. Both keep the numbers
+small, so most values fit in a single byte.
+"""
+import zlib
+
+
+def _zigzag(value):
+    """Map signed ints onto unsigned ints (0, -1, 1, -2 -> 0, 1, 2, 3)"""
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value):
+    return value // 2 if value % 2 == 0 else -(value + 1) // 2
+
+
+def _write_varints(values):
+    buffer = bytearray()
+    for value in values:
+        while value >= 0x80:
+            buffer.append((value & 0x7F) | 0x80)
+            value >>= 7
+        buffer.append(value)
+    return bytes(buffer)
+
+
+def _read_varints(buffer):
+    values = []
+    value = shift = 0
+    for byte in buffer:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = shift = 0
+    return values
+
+
+def encode_scores(scores, base_scores=None):
+    """Pack scores as a keyframe, or as a delta against base_scores"""
+    if base_scores is None:
+        previous = [0] + list(scores[:-1])
+    else:
+        previous = [base_scores[i] if i < len(base_scores) else 0 for i in range(len(scores))]
+
+    deltas = (score - prev for score, prev in zip(scores, previous))
+    return zlib.compress(_write_varints(_zigzag(delta) for delta in deltas))
+
+
+def decode_scores(blob, base_scores=None):
+    """Unpack scores written by encode_scores"""
+    deltas = [_unzigzag(value) for value in _read_varints(zlib.decompress(bytes(blob)))]
+
+    scores = []
+    for i, delta in enumerate(deltas):
+        if base_scores is None:
+            previous = scores[-1] if scores else 0
+        else:
+            previous = base_scores[i] if i < len(base_scores) else 0
+        scores.append(previous + delta)
+    return scores
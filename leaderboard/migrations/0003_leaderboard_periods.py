@@ -0,0 +1,92 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("leaderboard", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="leaderboardsnapshot",
+            name="period",
+            field=models.CharField(
+                choices=[
+                    ("all", "All Time"),
+                    ("daily", "Daily"),
+                    ("weekly", "Weekly"),
+                    ("season", "Season"),
+                ],
+                default="all",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="leaderboardsnapshot",
+            name="period_start",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="leaderboardsnapshot",
+            index=models.Index(
+                fields=["category", "period", "period_start"],
+                name="leaderboard_categor_c04c31_idx",
+            ),
+        ),
+        migrations.CreateModel(
+            name="LeaderboardPeriodScore",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[
+                            ("daily", "Daily"),
+                            ("weekly", "Weekly"),
+                            ("season", "Season"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("period_start", models.DateField()),
+                ("xp_gained", models.PositiveIntegerField(default=0)),
+                ("zones_captured", models.PositiveIntegerField(default=0)),
+                ("last_updated", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="leaderboard_period_scores",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["period", "period_start", "-xp_gained"],
+                        name="leaderboard_period_ef6a04_idx",
+                    ),
+                    models.Index(
+                        fields=["period", "period_start", "-zones_captured"],
+                        name="leaderboard_period_4bab8d_idx",
+                    ),
+                ],
+                "unique_together": {("user", "period", "period_start")},
+            },
+        ),
+    ]
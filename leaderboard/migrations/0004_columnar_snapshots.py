@@ -0,0 +1,77 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:37
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("leaderboard", "0003_leaderboard_periods"),
+    ]
+
+    operations = [
+        # Existing rows keep their JSON payload and are marked as legacy
+        migrations.AddField(
+            model_name="leaderboardsnapshot",
+            name="encoding",
+            field=models.CharField(
+                choices=[
+                    ("json", "Legacy JSON"),
+                    ("columnar", "Columnar Keyframe"),
+                    ("delta", "Columnar Delta"),
+                ],
+                default="json",
+                max_length=10,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="leaderboardsnapshot",
+            name="encoding",
+            field=models.CharField(
+                choices=[
+                    ("json", "Legacy JSON"),
+                    ("columnar", "Columnar Keyframe"),
+                    ("delta", "Columnar Delta"),
+                ],
+                default="columnar",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="leaderboardsnapshot",
+            name="user_ids",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.BigIntegerField(), default=list, size=None
+            ),
+        ),
+        migrations.AddField(
+            model_name="leaderboardsnapshot",
+            name="scores",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="leaderboardsnapshot",
+            name="base",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="deltas",
+                to="leaderboard.leaderboardsnapshot",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="leaderboardsnapshot",
+            name="data",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="leaderboardsnapshot",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["user_ids"], name="leaderboard_user_id_ddb723_gin"
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+
+def drop_duplicate_period_snapshots(apps, schema_editor):
+    """Keep the first snapshot of each frozen window"""
+    LeaderboardSnapshot = apps.get_model("leaderboard", "LeaderboardSnapshot")
+    seen = set()
+    duplicates = []
+    windows = LeaderboardSnapshot.objects.exclude(period="all").order_by("id").values_list(
+        "id", "category", "period", "period_start"
+    )
+    for snapshot_id, *window in windows:
+        if tuple(window) in seen:
+            duplicates.append(snapshot_id)
+        else:
+            seen.add(tuple(window))
+    LeaderboardSnapshot.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("leaderboard", "0005_gamestat"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_period_snapshots, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="leaderboardsnapshot",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("period", "all"), _negated=True),
+                fields=("category", "period", "period_start"),
+                name="unique_period_snapshot",
+            ),
+        ),
+    ]
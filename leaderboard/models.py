@@ -1,5 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from .codecs import decode_scores
 
 User = get_user_model()
 
@@ -32,17 +35,93 @@ class LeaderboardEntry(models.Model):
         return f"{self.user.username} - {self.category}: {self.score} (Rank {self.rank})"
 
 
+class LeaderboardPeriodScore(models.Model):
+    """Per-user totals for a daily, weekly or seasonal leaderboard window"""
+
+    PERIOD_CHOICES = [
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('season', 'Season'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_period_scores')
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    xp_gained = models.PositiveIntegerField(default=0)
+    zones_captured = models.PositiveIntegerField(default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['user', 'period', 'period_start']
+        indexes = [
+            models.Index(fields=['period', 'period_start', '-xp_gained']),
+            models.Index(fields=['period', 'period_start', '-zones_captured']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.period} {self.period_start}: {self.xp_gained} XP, {self.zones_captured} zones"
+
+
 class LeaderboardSnapshot(models.Model):
-    """Store periodic snapshots of leaderboard data"""
+    """Store periodic snapshots of leaderboard data
+
+    Rankings are stored column-wise: user_ids lists users in rank order (rank is the
+    1-based position) and scores holds the matching scores packed by leaderboard.codecs.
+    Delta snapshots pack their scores relative to their base keyframe.
+    """
+
+    PERIOD_CHOICES = [('all', 'All Time')] + LeaderboardPeriodScore.PERIOD_CHOICES
+
+    ENCODING_CHOICES = [
+        ('json', 'Legacy JSON'),
+        ('columnar', 'Columnar Keyframe'),
+        ('delta', 'Columnar Delta'),
+    ]
+
     category = models.CharField(max_length=10, choices=LeaderboardEntry.CATEGORY_CHOICES)
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES, default='all')
+    period_start = models.DateField(null=True, blank=True)  # Set for frozen daily/weekly/season windows
     snapshot_date = models.DateTimeField(auto_now_add=True)
-    data = models.JSONField()  # Store top users data
+    encoding = models.CharField(max_length=10, choices=ENCODING_CHOICES, default='columnar')
+    user_ids = ArrayField(models.BigIntegerField(), default=list)
+    scores = models.BinaryField(null=True, blank=True)
+    base = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='deltas')
+    data = models.JSONField(null=True, blank=True)  # Legacy list of dicts, only set when encoding is json
 
     class Meta:
         indexes = [
             models.Index(fields=['category', 'snapshot_date']),
+            models.Index(fields=['category', 'period', 'period_start']),
+            GinIndex(fields=['user_ids']),
+        ]
+        constraints = [
+            # A finished window is frozen once, however many close_periods runs overlap
+            models.UniqueConstraint(
+                fields=['category', 'period', 'period_start'],
+                condition=~models.Q(period='all'),
+                name='unique_period_snapshot'
+            ),
         ]
         ordering = ['-snapshot_date']
 
     def __str__(self):
+        if self.period != 'all':
+            return f"{self.category} {self.period} leaderboard - {self.period_start}"
         return f"{self.category} leaderboard - {self.snapshot_date.date()}"
+
+    def get_scores(self):
+        """Decode the score column, following the base keyframe for deltas"""
+        if self.encoding == 'json':
+            return [row['score'] for row in self.data]
+        base_scores = self.base.get_scores() if self.encoding == 'delta' else None
+        return decode_scores(self.scores, base_scores)
+
+
+class GameStat(models.Model):
+    """Global counters kept up to date by increments on the write paths"""
+    key = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key}: {self.value}"
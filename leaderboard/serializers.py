@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from attacks.services import AttackService
 from .models import LeaderboardEntry
 
 User = get_user_model()
@@ -47,17 +48,24 @@ class DetailedUserStatsSerializer(serializers.ModelSerializer):
             'attack_success_rate', 'defense_success_rate'
         ]
 
+    def get_attack_counts(self, obj):
+        """All of the user's attack counts, from one query per serialized user"""
+        counts = getattr(obj, '_attack_counts', None)
+        if counts is None:
+            counts = obj._attack_counts = AttackService.get_attack_counts(obj)
+        return counts
+
     def get_attacks_made(self, obj):
-        return obj.attacks_made.count()
+        return self.get_attack_counts(obj)['attacks_made']
 
     def get_attacks_won(self, obj):
-        return obj.attacks_made.filter(success=True).count()
+        return obj.successful_attacks
 
     def get_defenses_made(self, obj):
-        return obj.attacks_received.count()
+        return self.get_attack_counts(obj)['defenses_made']
 
     def get_defenses_won(self, obj):
-        return obj.attacks_received.filter(success=False).count()
+        return self.get_attack_counts(obj)['defenses_won']
 
     def get_attack_success_rate(self, obj):
         total = self.get_attacks_made(obj)
@@ -1,9 +1,21 @@
+import heapq
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Q
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, F, Func, IntegerField, Q, Value
+from django.db.models.functions import Cast
 from django.utils import timezone
+from utils.metrics import timed
+from utils.replicas import primary_reads
 from zones.models import Zone
 from attacks.models import Attack
-from .models import LeaderboardEntry, LeaderboardSnapshot
+from . import cache as leaderboard_cache
+from .codecs import encode_scores
+from .models import GameStat, LeaderboardEntry, LeaderboardPeriodScore, LeaderboardSnapshot
 
 User = get_user_model()
 
@@ -15,16 +27,20 @@ class LeaderboardService:
     def get_leaderboard(category='xp', limit=100):
         """Get leaderboard for specified category"""
         try:
-            entries = LeaderboardEntry.objects.filter(
-                category=category
-            ).select_related('user')[:limit]
+            entries = list(
+                LeaderboardEntry.objects.filter(
+                    category=category
+                ).select_related('user')[:limit]
+            )
 
             # If no cached entries, generate them
-            if not entries.exists():
+            if not entries:
                 LeaderboardService.update_leaderboard(category)
-                entries = LeaderboardEntry.objects.filter(
-                    category=category
-                ).select_related('user')[:limit]
+                entries = list(
+                    LeaderboardEntry.objects.filter(
+                        category=category
+                    ).select_related('user')[:limit]
+                )
 
             return entries
         except Exception:
@@ -41,23 +57,19 @@ class LeaderboardService:
         elif category == 'level':
             users = User.objects.filter(is_active=True).order_by('-level', '-xp')[:limit]
         elif category == 'attacks':
-            users = User.objects.filter(is_active=True).annotate(
-                successful_attacks=Count('attacks_made', filter=Q(attacks_made__success=True))
-            ).order_by('-successful_attacks')[:limit]
+            users = User.objects.filter(is_active=True).order_by('-successful_attacks')[:limit]
         else:
             users = User.objects.filter(is_active=True).order_by('-xp')[:limit]
 
-        return users
+        return list(users)
 
     @staticmethod
+    @timed('leaderboard_rebuild')
     def update_leaderboard(category=None):
         """Update cached leaderboard entries"""
         categories = [category] if category else ['xp', 'zones', 'level', 'attacks']
 
         for cat in categories:
-            # Clear existing entries for this category
-            LeaderboardEntry.objects.filter(category=cat).delete()
-
             # Calculate new rankings
             if cat == 'xp':
                 users = User.objects.filter(is_active=True).order_by('-xp')
@@ -69,29 +81,34 @@ class LeaderboardService:
                 users = User.objects.filter(is_active=True).order_by('-level', '-xp')
                 score_field = 'level'
             elif cat == 'attacks':
-                users = User.objects.filter(is_active=True).annotate(
-                    successful_attacks=Count('attacks_made', filter=Q(attacks_made__success=True))
-                ).order_by('-successful_attacks')
+                users = User.objects.filter(is_active=True).order_by('-successful_attacks')
                 score_field = 'successful_attacks'
 
-            # Create leaderboard entries
-            entries_to_create = []
-            for rank, user in enumerate(users[:1000], 1):  # Top 1000 users
-                if cat == 'attacks':
-                    score = user.successful_attacks
-                else:
+            # Read before the transaction starts, so tasks allowed to use a replica do
+            ranked = list(users[:1000])  # Top 1000 users
+
+            # Rebuild atomically so readers never see a half-built board and the
+            # response cache version only moves once the new entries are committed
+            with transaction.atomic():
+                # Clear existing entries for this category
+                LeaderboardEntry.objects.filter(category=cat).delete()
+
+                # Create leaderboard entries
+                entries_to_create = []
+                for rank, user in enumerate(ranked, 1):
                     score = getattr(user, score_field)
 
-                entries_to_create.append(
-                    LeaderboardEntry(
-                        user=user,
-                        category=cat,
-                        score=score,
-                        rank=rank
+                    entries_to_create.append(
+                        LeaderboardEntry(
+                            user=user,
+                            category=cat,
+                            score=score,
+                            rank=rank
+                        )
                     )
-                )
 
-            LeaderboardEntry.objects.bulk_create(entries_to_create)
+                LeaderboardEntry.objects.bulk_create(entries_to_create)
+                leaderboard_cache.bump_version(cat)
 
     @staticmethod
     def get_user_rank(user, category='xp'):
@@ -128,11 +145,10 @@ class LeaderboardService:
             ).count()
             score = user.level
         elif category == 'attacks':
-            user_attacks = user.attacks_made.filter(success=True).count()
-            higher_users = User.objects.filter(is_active=True).annotate(
-                successful_attacks=Count('attacks_made', filter=Q(attacks_made__success=True))
-            ).filter(successful_attacks__gt=user_attacks).count()
-            score = user_attacks
+            higher_users = User.objects.filter(
+                successful_attacks__gt=user.successful_attacks, is_active=True
+            ).count()
+            score = user.successful_attacks
 
         total_users = User.objects.filter(is_active=True).count()
         rank = higher_users + 1
@@ -149,41 +165,401 @@ class LeaderboardService:
     @staticmethod
     def get_leaderboard_stats():
         """Get general leaderboard statistics"""
-        total_users = User.objects.filter(is_active=True).count()
-        total_zones = Zone.objects.filter(owner__isnull=False).count()
-        total_attacks = Attack.objects.count()
+        return GameStatsService.get_stats()
 
-        # Most active zone (most attacks)
-        most_active_zone = Zone.objects.annotate(
-            attack_count=Count('attacks')
-        ).order_by('-attack_count').first()
+    @staticmethod
+    def create_snapshot(category):
+        """Create a snapshot of current leaderboard"""
+        if not LeaderboardEntry.objects.filter(category=category).exists():
+            LeaderboardService.update_leaderboard(category)
 
-        # Top player by XP
-        top_player = User.objects.filter(is_active=True).order_by('-xp').first()
+        rows = LeaderboardEntry.objects.filter(
+            category=category
+        ).order_by('rank').values_list('user_id', 'score')[:100]
 
-        return {
-            'total_users': total_users,
-            'total_zones': total_zones,
-            'total_attacks': total_attacks,
-            'most_active_zone': most_active_zone.id if most_active_zone else 'None',
-            'top_player': top_player.username if top_player else 'None'
-        }
+        user_ids = [user_id for user_id, _ in rows]
+        scores = [score for _, score in rows]
+        return LeaderboardService.store_snapshot(category, user_ids, scores)
 
     @staticmethod
-    def create_snapshot(category):
-        """Create a snapshot of current leaderboard"""
-        entries = LeaderboardService.get_leaderboard(category, limit=100)
+    def store_snapshot(category, user_ids, scores, period='all', period_start=None):
+        """Store a ranking column-wise, delta-encoding all-time snapshots between keyframes"""
+        keyframe = None
+        if period == 'all':
+            keyframe = LeaderboardSnapshot.objects.filter(
+                category=category,
+                period='all',
+                encoding='columnar'
+            ).order_by('-snapshot_date').first()
 
-        data = []
-        for entry in entries:
-            data.append({
-                'rank': entry.rank,
-                'username': entry.user.username,
-                'score': entry.score,
-                'level': entry.user.level
-            })
+            interval = settings.LEADERBOARD_SNAPSHOT_KEYFRAME_INTERVAL
+            if keyframe and keyframe.deltas.count() + 1 >= interval:
+                keyframe = None
+
+        if keyframe:
+            return LeaderboardSnapshot.objects.create(
+                category=category,
+                encoding='delta',
+                base=keyframe,
+                user_ids=user_ids,
+                scores=encode_scores(scores, keyframe.get_scores())
+            )
 
-        LeaderboardSnapshot.objects.create(
+        return LeaderboardSnapshot.objects.create(
             category=category,
-            data=data
+            period=period,
+            period_start=period_start,
+            encoding='columnar',
+            user_ids=user_ids,
+            scores=encode_scores(scores)
+        )
+
+    @staticmethod
+    def get_rank_history(user, category='xp', period='all', limit=100):
+        """Get the user's rank in past snapshots, resolved in SQL without decoding scores"""
+        rank = Func(
+            F('user_ids'),
+            Cast(Value(user.pk), BigIntegerField()),
+            function='array_position',
+            output_field=IntegerField()
+        )
+
+        return list(
+            LeaderboardSnapshot.objects.filter(
+                category=category,
+                period=period,
+                user_ids__contains=[user.pk]
+            ).annotate(
+                rank=rank
+            ).order_by('-snapshot_date').values('snapshot_date', 'period_start', 'rank')[:limit]
+        )
+
+    @staticmethod
+    def prune_snapshots(now=None):
+        """Downsample old snapshots, returning how many were deleted
+
+        All-time snapshots are all kept for a while, then one keyframe per day, then per
+        week. Frozen daily windows go after DAILY_DAYS and weekly ones after WEEKLY_DAYS;
+        a season is frozen once, as its final standings, and kept.
+        """
+        now = now or timezone.now()
+        retention = settings.LEADERBOARD_SNAPSHOT_RETENTION
+        raw_cutoff = now - timedelta(days=retention['RAW_DAYS'])
+        daily_cutoff = now - timedelta(days=retention['DAILY_DAYS'])
+        weekly_cutoff = now - timedelta(days=retention['WEEKLY_DAYS'])
+
+        old_snapshots = LeaderboardSnapshot.objects.filter(
+            period='all',
+            snapshot_date__lt=raw_cutoff
+        ).order_by('snapshot_date').values_list('id', 'category', 'snapshot_date', 'encoding')
+
+        seen_buckets = set()
+        doomed = []
+        for snapshot_id, category, snapshot_date, encoding in old_snapshots:
+            if snapshot_date >= daily_cutoff:
+                bucket = (category, snapshot_date.date())
+            else:
+                bucket = (category, snapshot_date.isocalendar()[:2])
+
+            # Deltas cannot stand on their own, so only keyframes represent a day or week
+            if snapshot_date >= weekly_cutoff and encoding != 'delta' and bucket not in seen_buckets:
+                seen_buckets.add(bucket)
+            else:
+                doomed.append(snapshot_id)
+
+        # Keyframes that recent deltas still decode against must stay
+        referenced = set(
+            LeaderboardSnapshot.objects.filter(
+                base_id__in=doomed
+            ).exclude(
+                id__in=doomed
+            ).values_list('base_id', flat=True)
+        )
+        doomed = [snapshot_id for snapshot_id in doomed if snapshot_id not in referenced]
+
+        deleted, _ = LeaderboardSnapshot.objects.filter(id__in=doomed).delete()
+        expired, _ = LeaderboardSnapshot.objects.filter(
+            Q(period='daily', period_start__lt=daily_cutoff.date()) |
+            Q(period='weekly', period_start__lt=weekly_cutoff.date())
+        ).delete()
+        return deleted + expired
+
+
+class PeriodLeaderboardService:
+    """Service class for daily, weekly and seasonal leaderboards"""
+
+    PERIODS = ['daily', 'weekly', 'season']
+
+    # Windowed categories and the bucket field they rank by
+    CATEGORY_FIELDS = {
+        'xp': 'xp_gained',
+        'zones': 'zones_captured',
+    }
+
+    @staticmethod
+    def get_period_start(period, day=None):
+        """Get the first day of the period containing the given day"""
+        day = day or timezone.localdate()
+        if period == 'daily':
+            return day
+        if period == 'weekly':
+            return day - timedelta(days=day.weekday())  # Weeks start on Monday
+        if period == 'season':
+            season_start = settings.LEADERBOARD_SEASON_START
+            season_length = settings.LEADERBOARD_SEASON_LENGTH_DAYS
+            seasons_elapsed = (day - season_start).days // season_length
+            return season_start + timedelta(days=seasons_elapsed * season_length)
+        raise ValueError(f"Unknown leaderboard period: {period}")
+
+    @staticmethod
+    def get_previous_period_start(period, day=None):
+        """Get the first day of the period before the one containing the given day"""
+        current_start = PeriodLeaderboardService.get_period_start(period, day)
+        return PeriodLeaderboardService.get_period_start(period, current_start - timedelta(days=1))
+
+    @staticmethod
+    def record_progress(user, xp_gained=0, zones_captured=0):
+        """Add XP and captures to the user's buckets for every active period"""
+        if not xp_gained and not zones_captured:
+            return
+
+        now = timezone.now()
+        today = timezone.localdate(now)
+
+        for period in PeriodLeaderboardService.PERIODS:
+            period_start = PeriodLeaderboardService.get_period_start(period, today)
+            bucket = LeaderboardPeriodScore.objects.filter(
+                user=user,
+                period=period,
+                period_start=period_start
+            )
+            increments = {
+                'xp_gained': F('xp_gained') + xp_gained,
+                'zones_captured': F('zones_captured') + zones_captured,
+                'last_updated': now,
+            }
+
+            if not bucket.update(**increments):
+                try:
+                    with transaction.atomic():
+                        LeaderboardPeriodScore.objects.create(
+                            user=user,
+                            period=period,
+                            period_start=period_start,
+                            xp_gained=xp_gained,
+                            zones_captured=zones_captured
+                        )
+                except IntegrityError:
+                    # Another request opened this bucket first
+                    bucket.update(**increments)
+
+            if xp_gained:
+                leaderboard_cache.bump_version(leaderboard_cache.get_scope('xp', period, period_start))
+            if zones_captured:
+                leaderboard_cache.bump_version(leaderboard_cache.get_scope('zones', period, period_start))
+
+    @staticmethod
+    def get_period_leaderboard(category='xp', period='daily', limit=100, period_start=None):
+        """Get ranked entries for a windowed leaderboard"""
+        score_field = PeriodLeaderboardService.CATEGORY_FIELDS[category]
+        period_start = period_start or PeriodLeaderboardService.get_period_start(period)
+
+        scores = LeaderboardPeriodScore.objects.filter(
+            period=period,
+            period_start=period_start,
+            **{f'{score_field}__gt': 0}
+        ).select_related('user').order_by(f'-{score_field}', 'user_id')[:limit]
+
+        return [
+            {
+                'rank': rank,
+                'username': score.user.username,
+                'level': score.user.level,
+                'score': getattr(score, score_field),
+                'last_updated': score.last_updated
+            }
+            for rank, score in enumerate(scores, 1)
+        ]
+
+    @staticmethod
+    def close_periods():
+        """Freeze finished periods into snapshots and drop buckets that are no longer needed
+
+        Overlapping runs are safe: unique_period_snapshot lets only one of them freeze a window.
+        """
+        closed = 0
+
+        for period in PeriodLeaderboardService.PERIODS:
+            previous_start = PeriodLeaderboardService.get_previous_period_start(period)
+
+            for category in PeriodLeaderboardService.CATEGORY_FIELDS:
+                already_frozen = LeaderboardSnapshot.objects.filter(
+                    category=category,
+                    period=period,
+                    period_start=previous_start
+                ).exists()
+                if already_frozen:
+                    continue
+
+                score_field = PeriodLeaderboardService.CATEGORY_FIELDS[category]
+                rows = LeaderboardPeriodScore.objects.filter(
+                    period=period,
+                    period_start=previous_start,
+                    **{f'{score_field}__gt': 0}
+                ).order_by(f'-{score_field}', 'user_id').values_list('user_id', score_field)[:100]
+
+                try:
+                    with transaction.atomic():
+                        LeaderboardService.store_snapshot(
+                            category,
+                            [user_id for user_id, _ in rows],
+                            [score for _, score in rows],
+                            period=period,
+                            period_start=previous_start
+                        )
+                except IntegrityError:
+                    continue  # Another run froze it first
+                closed += 1
+
+            # Keep the current and previous period live, older ones only survive as snapshots
+            LeaderboardPeriodScore.objects.filter(
+                period=period,
+                period_start__lt=previous_start
+            ).delete()
+
+        return closed
+
+
+class GameStatsService:
+    """Service class for the incrementally maintained global game statistics"""
+
+    COUNTERS = ['total_users', 'total_zones', 'total_attacks']
+
+    TOP_ZONES_CACHE_KEY = 'leaderboard:top_zones'
+    TOP_ZONES_LOCK_KEY = 'leaderboard:top_zones:lock'
+    TOP_ZONES_LOCK_SECONDS = 5  # Outlives a crashed holder by this much at most
+    TOP_ZONES_SIZE = 10
+
+    @staticmethod
+    def count(key):
+        """Count a statistic from scratch"""
+        if key == 'total_users':
+            return User.objects.filter(is_active=True).count()
+        if key == 'total_zones':
+            return Zone.objects.filter(owner__isnull=False).count()
+        if key == 'total_attacks':
+            return Attack.objects.count()
+        raise ValueError(f"Unknown game stat: {key}")
+
+    @staticmethod
+    def increment(key, amount=1):
+        """Apply a delta to a counter, seeding it from the database the first time"""
+        updated = GameStat.objects.filter(key=key).update(
+            value=F('value') + amount,
+            updated_at=timezone.now()
         )
+        if not updated:
+            # The write being counted has already happened, so the full count includes it
+            GameStat.objects.update_or_create(
+                key=key,
+                defaults={'value': GameStatsService.count(key)}
+            )
+
+    @staticmethod
+    def record_attack(zone):
+        """Count an attack globally and against its zone"""
+        GameStatsService.increment('total_attacks')
+        Zone.objects.filter(pk=zone.pk).update(attack_count=F('attack_count') + 1)
+        zone.attack_count += 1
+        attack_count = zone.attack_count
+        # A rolled back attack must not reach the shared heap
+        transaction.on_commit(lambda: GameStatsService.offer_zone(zone.pk, attack_count))
+
+    @staticmethod
+    @contextmanager
+    def top_zones_lock():
+        """Hold the cross-process lock on the cached heap, so no read-modify-write is lost"""
+        lock_seconds = GameStatsService.TOP_ZONES_LOCK_SECONDS
+        while not cache.add(GameStatsService.TOP_ZONES_LOCK_KEY, 1, lock_seconds):
+            time.sleep(0.01)
+        try:
+            yield
+        finally:
+            cache.delete(GameStatsService.TOP_ZONES_LOCK_KEY)
+
+    @staticmethod
+    @primary_reads()  # Kept in the cache and updated incrementally from there
+    def rebuild_top_zones():
+        """Rebuild the top-k most attacked zones heap from the indexed counter"""
+        with GameStatsService.top_zones_lock():
+            top_zones = list(
+                Zone.objects.filter(
+                    attack_count__gt=0
+                ).order_by('-attack_count').values_list('attack_count', 'id')[:GameStatsService.TOP_ZONES_SIZE]
+            )
+            heapq.heapify(top_zones)
+            cache.set(GameStatsService.TOP_ZONES_CACHE_KEY, top_zones, None)
+        return top_zones
+
+    @staticmethod
+    def offer_zone(zone_id, attack_count):
+        """Push a zone's new attack count into the top-k min-heap if it qualifies"""
+        with GameStatsService.top_zones_lock():
+            top_zones = cache.get(GameStatsService.TOP_ZONES_CACHE_KEY)
+            if top_zones is not None:
+                counts = {zid: count for count, zid in top_zones}
+                if zone_id in counts:
+                    counts[zone_id] = max(counts[zone_id], attack_count)
+                    top_zones = [(count, zid) for zid, count in counts.items()]
+                    heapq.heapify(top_zones)
+                elif len(top_zones) < GameStatsService.TOP_ZONES_SIZE:
+                    heapq.heappush(top_zones, (attack_count, zone_id))
+                elif attack_count > top_zones[0][0]:
+                    heapq.heapreplace(top_zones, (attack_count, zone_id))
+                else:
+                    return
+                cache.set(GameStatsService.TOP_ZONES_CACHE_KEY, top_zones, None)
+                return
+        GameStatsService.rebuild_top_zones()
+
+    @staticmethod
+    def get_stats():
+        """Read the global statistics without scanning any large table"""
+        counters = GameStat.objects.in_bulk(GameStatsService.COUNTERS)
+        missing = [key for key in GameStatsService.COUNTERS if key not in counters]
+        if missing:
+            GameStatsService.reconcile(missing)
+            counters = GameStat.objects.in_bulk(GameStatsService.COUNTERS)
+
+        top_zones = cache.get(GameStatsService.TOP_ZONES_CACHE_KEY)
+        if top_zones is None:
+            top_zones = GameStatsService.rebuild_top_zones()
+        most_active_zone = max(top_zones)[1] if top_zones else None
+
+        # Rank 1 of the cached XP leaderboard is an index lookup
+        top_entry = LeaderboardEntry.objects.filter(
+            category='xp', rank=1
+        ).select_related('user').first()
+        if top_entry:
+            top_player = top_entry.user
+        else:
+            top_player = User.objects.filter(is_active=True).order_by('-xp').first()
+
+        return {
+            'total_users': counters['total_users'].value,
+            'total_zones': counters['total_zones'].value,
+            'total_attacks': counters['total_attacks'].value,
+            'most_active_zone': most_active_zone or 'None',
+            'top_player': top_player.username if top_player else 'None'
+        }
+
+    @staticmethod
+    @primary_reads()
+    def reconcile(keys=None):
+        """Recount counters from scratch to correct any drift"""
+        for key in keys or GameStatsService.COUNTERS:
+            GameStat.objects.update_or_create(
+                key=key,
+                defaults={'value': GameStatsService.count(key)}
+            )
+        GameStatsService.rebuild_top_zones()
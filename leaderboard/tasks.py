@@ -1,5 +1,5 @@
 from celery import shared_task
-from .services import LeaderboardService
+from .services import GameStatsService, LeaderboardService, PeriodLeaderboardService
 
 
 @shared_task
@@ -25,3 +25,24 @@ def update_single_leaderboard(category):
         return f"{category} leaderboard updated successfully"
     except Exception as e:
         return f"Error updating {category} leaderboard: {e}"
+
+
+@shared_task
+def close_leaderboard_periods():
+    """Periodic task to freeze finished daily/weekly/season leaderboards"""
+    closed = PeriodLeaderboardService.close_periods()
+    return f"Closed {closed} leaderboard periods"
+
+
+@shared_task
+def prune_leaderboard_snapshots():
+    """Periodic task to downsample old leaderboard snapshots"""
+    deleted = LeaderboardService.prune_snapshots()
+    return f"Pruned {deleted} leaderboard snapshots"
+
+
+@shared_task
+def reconcile_game_stats():
+    """Periodic task to recount the global stats counters"""
+    GameStatsService.reconcile()
+    return "Game stats reconciled successfully"
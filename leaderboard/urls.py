@@ -4,11 +4,13 @@ from .views import (
     UserRankView,
     UserStatsView,
     LeaderboardStatsView,
+    RankHistoryView,
     RefreshLeaderboardView
 )
 
 urlpatterns = [
     path('', LeaderboardView.as_view(), name='leaderboard'),
+    path('history/', RankHistoryView.as_view(), name='rank_history'),
     path('<str:category>/', LeaderboardView.as_view(), name='leaderboard_category'),
     path('my-rank/', UserRankView.as_view(), name='user_rank'),
     path('stats/', LeaderboardStatsView.as_view(), name='leaderboard_stats'),
@@ -1,8 +1,12 @@
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
+from django.http import HttpResponse, HttpResponseNotModified
 from django.shortcuts import get_object_or_404
+from utils.replicas import primary_reads
+from . import cache as leaderboard_cache
 from .models import LeaderboardEntry
 from .serializers import (
     LeaderboardEntrySerializer,
@@ -10,31 +14,94 @@ from .serializers import (
     LeaderboardStatsSerializer,
     DetailedUserStatsSerializer
 )
-from .services import LeaderboardService
+from .services import LeaderboardService, PeriodLeaderboardService
 
 User = get_user_model()
 
 
+def parse_limit(value, maximum):
+    """The requested number of rows capped at maximum, or None unless it is a positive integer"""
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return None
+    return min(limit, maximum) if limit > 0 else None
+
+
+def validate_leaderboard_params(category, period):
+    """Return an error message for an unknown category or period, or None"""
+    if category not in ['xp', 'zones', 'level', 'attacks']:
+        return 'Invalid category. Use: xp, zones, level, or attacks'
+    if period not in ['all', 'daily', 'weekly', 'season']:
+        return 'Invalid period. Use: all, daily, weekly, or season'
+    if period != 'all' and category not in PeriodLeaderboardService.CATEGORY_FIELDS:
+        return 'Period leaderboards are only available for: xp, zones'
+    return None
+
+
 class LeaderboardView(APIView):
     """Get leaderboard for specified category"""
+    query_budget = 10
 
     def get(self, request, category=None):
         # Get category from URL path or query parameter
         if not category:
             category = request.query_params.get('category', 'xp')
 
-        limit = min(int(request.query_params.get('limit', 100)), 100)
-
-        if category not in ['xp', 'zones', 'level', 'attacks']:
-            return Response(
-                {'error': 'Invalid category. Use: xp, zones, level, or attacks'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        limit = parse_limit(request.query_params.get('limit', 100), 100)
+        period = request.query_params.get('period', 'all')
+
+        error = validate_leaderboard_params(category, period)
+        if limit is None:
+            error = 'Invalid limit. Use a positive number'
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Serve pre-rendered bytes while the leaderboard version is unchanged
+        scope = leaderboard_cache.get_scope(category, period)
+        version = leaderboard_cache.get_version(scope)
+        etag = leaderboard_cache.get_etag(scope, limit, version)
+
+        body = leaderboard_cache.get_response(scope, limit, version)
+        cacheable = body is not None
+        if body is None:
+            payload, cacheable = LeaderboardView.build_leaderboard(category, period, limit)
+            body = JSONRenderer().render(payload)
+            if cacheable:
+                leaderboard_cache.set_response(scope, limit, version, body)
+
+        # Realtime fallbacks change without a version bump, so only cacheable bodies get an ETag
+        if cacheable and request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        response = HttpResponse(body, content_type='application/json')
+        if cacheable:
+            response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    @staticmethod
+    @primary_reads()  # Cached under the version the primary has bumped
+    def build_leaderboard(category, period, limit):
+        """Build the response payload and whether it may be cached"""
+        if period != 'all':
+            data = PeriodLeaderboardService.get_period_leaderboard(category, period, limit)
+            return {
+                'category': category,
+                'period': period,
+                'period_start': PeriodLeaderboardService.get_period_start(period),
+                'leaderboard': data,
+                'count': len(data)
+            }, True
 
         entries = LeaderboardService.get_leaderboard(category, limit)
+        cacheable = True
 
         # If entries are User objects (real-time), convert to leaderboard format
-        if entries and isinstance(entries.first(), User):
+        if entries and isinstance(entries[0], User):
+            cacheable = False
             data = []
             for rank, user in enumerate(entries, 1):
                 if category == 'xp':
@@ -44,7 +111,7 @@ class LeaderboardView(APIView):
                 elif category == 'level':
                     score = user.level
                 elif category == 'attacks':
-                    score = user.attacks_made.filter(success=True).count()
+                    score = user.successful_attacks
 
                 data.append({
                     'rank': rank,
@@ -57,11 +124,12 @@ class LeaderboardView(APIView):
             serializer = LeaderboardEntrySerializer(entries, many=True)
             data = serializer.data
 
-        return Response({
+        return {
             'category': category,
+            'period': period,
             'leaderboard': data,
             'count': len(data)
-        })
+        }, cacheable
 
 
 class UserRankView(APIView):
@@ -83,6 +151,8 @@ class UserRankView(APIView):
 
 class UserStatsView(APIView):
     """Get detailed stats for a user"""
+    query_budget = 12
+    read_replica = True
 
     def get(self, request, username=None):
         if username:
@@ -108,8 +178,38 @@ class UserStatsView(APIView):
         })
 
 
+class RankHistoryView(APIView):
+    """Get current user's rank across past leaderboard snapshots"""
+    read_replica = True
+
+    def get(self, request):
+        category = request.query_params.get('category', 'xp')
+        period = request.query_params.get('period', 'all')
+        limit = parse_limit(request.query_params.get('limit', 100), 500)
+
+        if category not in ['xp', 'zones', 'level', 'attacks']:
+            return Response(
+                {'error': 'Invalid category. Use: xp, zones, level, or attacks'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if limit is None:
+            return Response(
+                {'error': 'Invalid limit. Use a positive number'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        history = LeaderboardService.get_rank_history(request.user, category, period, limit)
+        return Response({
+            'category': category,
+            'period': period,
+            'history': history,
+            'count': len(history)
+        })
+
+
 class LeaderboardStatsView(APIView):
     """Get general leaderboard statistics"""
+    read_replica = True
 
     def get(self, request):
         stats = LeaderboardService.get_leaderboard_stats()
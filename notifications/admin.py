@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import PendingNotification
+
+
+@admin.register(PendingNotification)
+class PendingNotificationAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'title', 'status', 'attempts', 'created_at', 'delivered_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('recipient__username', 'title')
+    readonly_fields = ('created_at', 'delivered_at')
+    ordering = ('-created_at',)
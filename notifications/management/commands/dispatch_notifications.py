@@ -0,0 +1,49 @@
+import signal
+from django.core.management.base import BaseCommand
+from notifications.services import OutboxService
+
+
+class Command(BaseCommand):
+    help = "Run a long-lived dispatcher that sends pending outbox notifications in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Maximum notifications claimed per batch (FCM accepts up to 500 per call)',
+        )
+        parser.add_argument(
+            '--idle-sleep',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when the outbox has no full batch pending',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Dispatch a single batch and exit',
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            dispatched = OutboxService.dispatch_batch(options['batch_size'])
+            self.stdout.write(f"Dispatched {dispatched} notifications")
+            return
+
+        stopping = []
+
+        def stop(signum, frame):
+            stopping.append(signum)
+
+        # Finish the current batch before exiting
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write("Notification dispatcher started")
+        OutboxService.run_dispatcher(
+            batch_size=options['batch_size'],
+            idle_sleep=options['idle_sleep'],
+            should_stop=lambda: bool(stopping)
+        )
+        self.stdout.write("Notification dispatcher stopped")
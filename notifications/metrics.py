@@ -0,0 +1,30 @@
+"""
+Counters for the notification pipeline, kept in the shared cache so every dispatcher
+process adds to the same totals. They are also exported to Prometheus through
+utils.metrics.NOTIFICATIONS.
+"""
+from django.core.cache import cache
+from utils.metrics import NOTIFICATIONS
+
+KEY = 'notifications:metrics:{name}'
+
+COUNTERS = [
+    'notifications_sent',  # Pushes handed to the transport, including digests
+    'notifications_coalesced',  # Outbox rows folded into a digest push
+    'notifications_duplicates_dropped',  # Identical outbox rows dropped inside a window
+]
+
+
+def increment(name, amount=1):
+    if not amount:
+        return
+    NOTIFICATIONS.labels(name).inc(amount)
+    key = KEY.format(name=name)
+    if not cache.add(key, amount, None):
+        cache.incr(key, amount)
+
+
+def snapshot():
+    """Get the current value of every counter"""
+    values = cache.get_many([KEY.format(name=name) for name in COUNTERS])
+    return {name: values.get(KEY.format(name=name), 0) for name in COUNTERS}
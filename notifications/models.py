@@ -0,0 +1,40 @@
+from django.db import models
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+User = get_user_model()
+
+
+class PendingNotification(models.Model):
+    """Push notification written in the same transaction as the event that caused it"""
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('delivered', 'Delivered'),
+        ('skipped', 'Skipped (No Push Token)'),
+        ('failed', 'Failed'),
+    ]
+
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='pending_notifications')
+    title = models.CharField(max_length=100)
+    body = models.CharField(max_length=255)
+    data = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)  # Pushed back after a failed send
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Dispatchers only ever scan the pending rows, oldest first
+            models.Index(
+                fields=['id'],
+                condition=models.Q(status='pending'),
+                name='notifications_pending_idx'
+            ),
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.title} -> {self.recipient_id} ({self.status})"
@@ -0,0 +1,154 @@
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Subquery
+from django.utils import timezone
+from utils.notifications import NotificationService
+from . import metrics
+from .models import PendingNotification
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxService:
+    """Service class for the transactional notification outbox"""
+
+    @staticmethod
+    def enqueue(notifications):
+        """Write notifications to the outbox as part of the caller's transaction"""
+        return PendingNotification.objects.bulk_create([
+            PendingNotification(
+                recipient_id=notification['user_id'],
+                title=notification['title'],
+                body=notification['body'],
+                data=notification['data']
+            )
+            for notification in notifications
+        ])
+
+    @staticmethod
+    def coalesce(rows):
+        """Fold each recipient's rows into one push, dropping identical repeats
+
+        Returns (notification, row_ids) pairs and the number of duplicates dropped.
+        """
+        rows_by_recipient = {}
+        for row in rows:
+            rows_by_recipient.setdefault(row.recipient_id, []).append(row)
+
+        groups = []
+        duplicates = 0
+        for recipient_id, recipient_rows in rows_by_recipient.items():
+            unique = {}
+            for row in recipient_rows:
+                key = (row.title, row.body)
+                if key in unique:
+                    duplicates += 1
+                else:
+                    unique[key] = {
+                        'user_id': recipient_id,
+                        'title': row.title,
+                        'body': row.body,
+                        'data': row.data,
+                    }
+
+            notifications = list(unique.values())
+            if len(notifications) == 1:
+                notification = notifications[0]
+            else:
+                notification = NotificationService.build_digest_notification(recipient_id, notifications)
+            groups.append((notification, [row.id for row in recipient_rows]))
+
+        return groups, duplicates
+
+    @staticmethod
+    def dispatch_batch(batch_size=500):
+        """Claim up to batch_size pending rows, send them and record the outcome
+
+        Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED and stay locked until
+        their outcome is written, so parallel dispatchers always work on disjoint
+        batches and a row is never sent twice. Rows are claimed oldest first, so no
+        recipient waits behind others' backlogs. A recipient's rows are only claimed once
+        their oldest pending row has waited out the coalescing window, and the ones
+        claimed together are sent as a single digest.
+        """
+        now = timezone.now()
+        window_closed = now - timedelta(seconds=settings.NOTIFICATION_COALESCE_WINDOW_SECONDS)
+
+        due_recipients = PendingNotification.objects.filter(
+            status='pending',
+            next_attempt_at__lte=now,
+            created_at__lte=window_closed
+        ).values('recipient_id')
+
+        with transaction.atomic():
+            rows = list(
+                PendingNotification.objects.select_for_update(
+                    skip_locked=True
+                ).filter(
+                    status='pending',
+                    next_attempt_at__lte=now,
+                    recipient_id__in=Subquery(due_recipients)
+                ).order_by('id')[:batch_size]
+            )
+            if not rows:
+                return 0
+
+            groups, duplicates = OutboxService.coalesce(rows)
+            results = NotificationService.deliver_batch([notification for notification, _ in groups])
+
+            delivered, skipped, failed = [], [], []
+            for (notification, row_ids), result in zip(groups, results):
+                if result is True:
+                    delivered.extend(row_ids)
+                elif result is None:
+                    skipped.extend(row_ids)
+                else:
+                    failed.extend(row_ids)
+
+            PendingNotification.objects.filter(id__in=delivered).update(
+                status='delivered',
+                attempts=F('attempts') + 1,
+                delivered_at=now
+            )
+            PendingNotification.objects.filter(id__in=skipped).update(status='skipped')
+
+            if failed:
+                PendingNotification.objects.filter(id__in=failed).update(
+                    attempts=F('attempts') + 1,
+                    next_attempt_at=now + timedelta(seconds=settings.NOTIFICATION_RETRY_DELAY_SECONDS)
+                )
+                PendingNotification.objects.filter(
+                    id__in=failed,
+                    attempts__gte=settings.NOTIFICATION_MAX_ATTEMPTS
+                ).update(status='failed')
+
+        metrics.increment('notifications_sent', sum(1 for result in results if result is not None))
+        metrics.increment('notifications_coalesced', len(rows) - duplicates - len(groups))
+        metrics.increment('notifications_duplicates_dropped', duplicates)
+
+        return len(rows)
+
+    @staticmethod
+    def run_dispatcher(batch_size=500, idle_sleep=1.0, should_stop=lambda: False):
+        """Dispatch pending notifications until should_stop() returns True"""
+        while not should_stop():
+            try:
+                dispatched = OutboxService.dispatch_batch(batch_size)
+            except Exception as e:
+                logger.error(f"Notification dispatch failed: {e}")
+                dispatched = 0
+
+            if dispatched < batch_size:
+                time.sleep(idle_sleep)
+
+    @staticmethod
+    def prune(days=7):
+        """Delete finished outbox rows older than the given number of days"""
+        deleted, _ = PendingNotification.objects.filter(
+            status__in=['delivered', 'skipped', 'failed'],
+            created_at__lt=timezone.now() - timedelta(days=days)
+        ).delete()
+        return deleted
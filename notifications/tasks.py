@@ -0,0 +1,9 @@
+from celery import shared_task
+from .services import OutboxService
+
+
+@shared_task
+def prune_notification_outbox():
+    """Periodic task to delete old delivered and failed outbox rows"""
+    deleted = OutboxService.prune()
+    return f"Pruned {deleted} outbox notifications"
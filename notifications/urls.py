@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import NotificationMetricsView
+
+urlpatterns = [
+    path('metrics/', NotificationMetricsView.as_view(), name='notification_metrics'),
+]
@@ -0,0 +1,25 @@
+import pytest
+from users import cache as user_cache
+from zones import live
+
+
+@pytest.fixture(autouse=True)
+def local_cache(settings):
+    """Keep tests off the shared Redis cache"""
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    user_cache.clear_local()
+
+
+@pytest.fixture(autouse=True)
+def enforce_query_budgets(settings):
+    """Fail any request that runs more queries than its view's query_budget"""
+    settings.QUERY_BUDGET_ENFORCE = True
+
+
+@pytest.fixture(autouse=True)
+def live_broker(settings):
+    """Deliver live zone updates in process"""
+    settings.LIVE_BACKEND = 'memory'
+    previous = live.set_broker(live.MemoryBroker())
+    yield
+    live.set_broker(previous)
@@ -4,7 +4,10 @@ from django.contrib.auth import get_user_model
 from django.contrib.gis.geos import Point
 from zones.models import Zone
 from attacks.models import Attack
+from rest_framework.test import APIRequestFactory, force_authenticate
 from attacks.services import AttackService
+from attacks.views import AttackHistoryView, AttackStatsView
+from utils.queries import query_budget
 
 
 @pytest.mark.django_db
@@ -65,3 +68,36 @@ class TestAttackService:
         assert 'defender_power' in outcome
         assert 'xp_gained' in outcome
         assert isinstance(outcome['success'], bool)
+
+
+@pytest.mark.django_db
+class TestAttackHistoryQueries:
+    def test_history_queries_do_not_grow_with_attacks(self):
+        """Test attack history and stats stay within a fixed query budget"""
+        User = get_user_model()
+        user = User.objects.create_user(username='veteran', password='testpass')
+        for i in range(5):
+            rival = User.objects.create_user(username=f'rival{i}', password='testpass')
+            zone = Zone.objects.create(id=f'history_{i}', location=Point(-122.4194, 37.7749))
+            Attack.objects.create(
+                attacker=user if i % 2 else rival, defender=rival if i % 2 else user, zone=zone,
+                attacker_location=zone.location, attacker_power=10, defender_power=10,
+                result='failed', success=False
+            )
+
+        factory = APIRequestFactory()
+        request = factory.get('/api/v1/attacks/history/')
+        force_authenticate(request, user)
+        with query_budget(AttackHistoryView.query_budget, max_duplicates=0):
+            response = AttackHistoryView.as_view()(request)
+        assert response.status_code == 200
+        assert {attack['opponent_username'] for attack in response.data['attacks']} == {
+            f'rival{i}' for i in range(5)
+        }
+
+        request = factory.get('/api/v1/attacks/stats/')
+        force_authenticate(request, user)
+        with query_budget(AttackStatsView.query_budget):
+            response = AttackStatsView.as_view()(request)
+        assert response.data['total_attacks'] == 2
+        assert response.data['successful_defenses'] == 3
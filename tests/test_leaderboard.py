@@ -0,0 +1,220 @@
+import pytest
+from asgiref.sync import async_to_sync
+from datetime import date, datetime, timezone
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import AsyncClient, Client
+from django.contrib.gis.geos import Point
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from zones.models import Zone
+from leaderboard import cache as leaderboard_cache
+from leaderboard.codecs import decode_scores, encode_scores
+from leaderboard.models import LeaderboardEntry, LeaderboardPeriodScore, LeaderboardSnapshot
+from leaderboard.services import GameStatsService, LeaderboardService, PeriodLeaderboardService
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestLeaderboardService:
+    def test_attacks_leaderboard_uses_counter(self):
+        """Test attacks category ranks by the maintained successful_attacks counter"""
+        User.objects.create_user(username='rookie', password='testpass', successful_attacks=1)
+        User.objects.create_user(username='veteran', password='testpass', successful_attacks=7)
+
+        LeaderboardService.update_leaderboard('attacks')
+
+        entries = list(LeaderboardEntry.objects.filter(category='attacks'))
+        assert [entry.user.username for entry in entries] == ['veteran', 'rookie']
+        assert [entry.score for entry in entries] == [7, 1]
+
+    def test_realtime_attacks_rank(self):
+        """Test real-time attacks rank compares counters"""
+        User.objects.create_user(username='veteran', password='testpass', successful_attacks=7)
+        rookie = User.objects.create_user(username='rookie', password='testpass', successful_attacks=1)
+
+        rank = LeaderboardService.calculate_realtime_rank(rookie, 'attacks')
+
+        assert rank['rank'] == 2
+        assert rank['score'] == 1
+
+
+@pytest.mark.django_db
+class TestLeaderboardView:
+    def test_cached_leaderboard_is_revalidated(self):
+        """Test a cached leaderboard answers a matching If-None-Match with 304"""
+        user = User.objects.create_user(username='testuser', password='testpass', xp=50)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.get('/api/v1/leaderboard/', {'category': 'xp'})
+        etag = response['ETag']
+
+        assert client.get('/api/v1/leaderboard/', {'category': 'xp'}, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    def test_realtime_leaderboard_has_no_etag(self, monkeypatch):
+        """Test a realtime fallback is neither tagged nor answered with 304"""
+        user = User.objects.create_user(username='testuser', password='testpass', xp=50)
+        monkeypatch.setattr(LeaderboardService, 'get_leaderboard', LeaderboardService.calculate_realtime_leaderboard)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.get('/api/v1/leaderboard/', {'category': 'xp'}, HTTP_IF_NONE_MATCH='"xp-100-v1"')
+
+        assert response.status_code == 200
+        assert 'ETag' not in response
+
+    def test_invalid_limit_is_a_bad_request(self):
+        """Test a non-numeric or non-positive limit answers 400 on every leaderboard read"""
+        user = User.objects.create_user(username='testuser', password='testpass')
+        client = APIClient()
+        client.force_authenticate(user)
+        async_client = AsyncClient()
+        auth = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+        for limit in ('abc', '-5'):
+            assert client.get('/api/v1/leaderboard/', {'limit': limit}).status_code == 400
+            assert client.get('/api/v1/leaderboard/history/', {'limit': limit}).status_code == 400
+            response = async_to_sync(async_client.get)('/api/v1/async/leaderboard/', {'limit': limit}, headers=auth)
+            assert response.status_code == 400
+
+    def test_async_leaderboard_matches_sync(self):
+        """Test the async leaderboard returns what the sync view does"""
+        user = User.objects.create_user(username='testuser', password='testpass', xp=50)
+        auth = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+        expected = Client().get('/api/v1/leaderboard/', headers=auth)
+        response = async_to_sync(AsyncClient().get)('/api/v1/async/leaderboard/', headers=auth)
+
+        assert response.status_code == expected.status_code == 200
+        assert response.json() == expected.json()
+
+
+@pytest.mark.django_db
+class TestPeriodLeaderboardService:
+    def test_period_start(self):
+        """Test period boundaries for daily and weekly windows"""
+        wednesday = date(2025, 6, 11)
+
+        assert PeriodLeaderboardService.get_period_start('daily', wednesday) == wednesday
+        assert PeriodLeaderboardService.get_period_start('weekly', wednesday) == date(2025, 6, 9)
+
+    def test_period_cache_scope_follows_the_window(self):
+        """Test a windowed leaderboard's cached responses don't outlive its period"""
+        monday, tuesday = date(2025, 6, 9), date(2025, 6, 10)
+
+        assert leaderboard_cache.get_scope('xp', 'daily', monday) != leaderboard_cache.get_scope('xp', 'daily', tuesday)
+        assert leaderboard_cache.get_scope('xp', 'weekly') == leaderboard_cache.get_scope(
+            'xp', 'weekly', PeriodLeaderboardService.get_period_start('weekly')
+        )
+
+    def test_record_progress_accumulates(self):
+        """Test XP and captures accumulate in every period bucket"""
+        user = User.objects.create_user(username='testuser', password='testpass')
+
+        PeriodLeaderboardService.record_progress(user, xp_gained=10, zones_captured=1)
+        PeriodLeaderboardService.record_progress(user, xp_gained=5)
+
+        buckets = LeaderboardPeriodScore.objects.filter(user=user)
+        assert buckets.count() == 3
+        assert all(bucket.xp_gained == 15 and bucket.zones_captured == 1 for bucket in buckets)
+
+        leaderboard = PeriodLeaderboardService.get_period_leaderboard('xp', 'weekly')
+        assert leaderboard[0]['username'] == 'testuser'
+        assert leaderboard[0]['score'] == 15
+
+    def test_progress_into_an_existing_bucket_refreshes_the_cache(self, django_capture_on_commit_callbacks):
+        """Test every increment, not just the one opening a bucket, invalidates the cached window"""
+        user = User.objects.create_user(username='testuser', password='testpass')
+        client = APIClient()
+        client.force_authenticate(user)
+        params = {'category': 'xp', 'period': 'daily'}
+
+        with django_capture_on_commit_callbacks(execute=True):
+            PeriodLeaderboardService.record_progress(user, xp_gained=10)
+        first = client.get('/api/v1/leaderboard/', params)
+        with django_capture_on_commit_callbacks(execute=True):
+            PeriodLeaderboardService.record_progress(user, xp_gained=5)
+        second = client.get('/api/v1/leaderboard/', params, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        assert second.status_code == 200
+        assert second['ETag'] != first['ETag']
+        assert second.json()['leaderboard'][0]['score'] == 15
+
+    def test_windows_are_frozen_once(self):
+        """Test a finished window gets one snapshot however often it is closed"""
+        assert PeriodLeaderboardService.close_periods() == 6
+        assert PeriodLeaderboardService.close_periods() == 0
+
+        previous_start = PeriodLeaderboardService.get_previous_period_start('daily')
+        with pytest.raises(IntegrityError), transaction.atomic():
+            LeaderboardService.store_snapshot('xp', [], [], period='daily', period_start=previous_start)
+        assert LeaderboardSnapshot.objects.filter(period='daily').count() == 2
+
+    def test_prune_expires_old_windows(self):
+        """Test frozen daily and weekly windows are pruned after their retention, seasons kept"""
+        for period, period_start in [
+            ('daily', date(2025, 1, 1)), ('daily', date(2025, 6, 1)),
+            ('weekly', date(2024, 1, 1)), ('weekly', date(2025, 1, 6)),
+            ('season', date(2023, 1, 1)),
+        ]:
+            LeaderboardService.store_snapshot('xp', [], [], period=period, period_start=period_start)
+
+        assert LeaderboardService.prune_snapshots(now=datetime(2025, 6, 11, tzinfo=timezone.utc)) == 2
+
+        kept = LeaderboardSnapshot.objects.order_by('period', 'period_start').values_list('period', 'period_start')
+        assert list(kept) == [
+            ('daily', date(2025, 6, 1)), ('season', date(2023, 1, 1)), ('weekly', date(2025, 1, 6)),
+        ]
+
+
+class TestSnapshotCodecs:
+    def test_keyframe_round_trip(self):
+        """Test keyframe scores decode back to the original column"""
+        scores = [9000, 8750, 8750, 120, 0]
+
+        assert decode_scores(encode_scores(scores)) == scores
+
+    def test_delta_round_trip(self):
+        """Test delta scores decode against their base keyframe"""
+        base = [9000, 8750, 8750, 120]
+        scores = [9010, 8700, 8755, 125, 40]
+
+        blob = encode_scores(scores, base)
+
+        assert decode_scores(blob, base) == scores
+
+
+@pytest.mark.django_db
+class TestGameStatsService:
+    def test_stats_follow_write_paths(self):
+        """Test claims and attacks are reflected without recounting"""
+        user = User.objects.create_user(username='testuser', password='testpass')
+        busy = Zone.objects.create(id='busy_zone', location=Point(-122.4194, 37.7749))
+        quiet = Zone.objects.create(id='quiet_zone', location=Point(-122.4180, 37.7750))
+
+        busy.claim(user)
+        GameStatsService.record_attack(busy)
+        GameStatsService.record_attack(busy)
+        GameStatsService.record_attack(quiet)
+
+        stats = GameStatsService.get_stats()
+
+        assert stats['total_zones'] == 1
+        assert stats['total_attacks'] == 3
+        assert stats['most_active_zone'] == 'busy_zone'
+
+    def test_top_zones_only_change_when_the_attack_commits(self, django_capture_on_commit_callbacks):
+        """Test a rolled back attack leaves the cached top zones alone"""
+        busy = Zone.objects.create(id='busy_zone', location=Point(-122.4194, 37.7749))
+        quiet = Zone.objects.create(id='quiet_zone', location=Point(-122.4180, 37.7750))
+        GameStatsService.rebuild_top_zones()
+
+        with django_capture_on_commit_callbacks(execute=False):
+            GameStatsService.record_attack(quiet)  # Its transaction never commits
+        with django_capture_on_commit_callbacks(execute=True):
+            GameStatsService.record_attack(busy)
+
+        assert cache.get(GameStatsService.TOP_ZONES_CACHE_KEY) == [(1, 'busy_zone')]
@@ -0,0 +1,38 @@
+import pytest
+from prometheus_client import REGISTRY
+from django.test import RequestFactory
+from utils.metrics import metrics_view, timed
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestMetrics:
+    def test_timed_counts_calls_and_errors(self):
+        """Test timed observes every call and counts the ones that raise"""
+        @timed('test_operation')
+        def operation(fail):
+            if fail:
+                raise ValueError
+            return 'ok'
+
+        calls = sample('game_operation_seconds_count', operation='test_operation')
+        errors = sample('game_operation_errors_total', operation='test_operation')
+
+        assert operation(False) == 'ok'
+        with pytest.raises(ValueError):
+            operation(True)
+
+        assert sample('game_operation_seconds_count', operation='test_operation') == calls + 2
+        assert sample('game_operation_errors_total', operation='test_operation') == errors + 1
+
+    def test_metrics_view_token(self, settings):
+        """Test /metrics requires the configured token"""
+        settings.METRICS_TOKEN = 'secret'
+        factory = RequestFactory()
+
+        assert metrics_view(factory.get('/metrics')).status_code == 403
+        response = metrics_view(factory.get('/metrics', HTTP_AUTHORIZATION='Bearer secret'))
+        assert response.status_code == 200
+        assert b'game_operation_seconds' in response.content
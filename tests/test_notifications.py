@@ -0,0 +1,165 @@
+import pytest
+from django.contrib.auth import get_user_model
+from notifications import metrics
+from notifications.models import PendingNotification
+from notifications.services import OutboxService
+from users.models import DeviceToken
+from utils.notifications import (
+    InMemoryTransport, LoggingTransport, NotificationService, get_transport, set_transport
+)
+
+User = get_user_model()
+
+
+@pytest.fixture
+def transport():
+    transport = InMemoryTransport()
+    previous = set_transport(transport)
+    yield transport
+    set_transport(previous)
+
+
+@pytest.mark.django_db
+class TestNotificationService:
+    def test_send_batch_resolves_tokens(self, transport, django_assert_num_queries):
+        """Test tokens for a batch are looked up in one query and fanned out to every device"""
+        defender = User.objects.create_user(username='defender', password='testpass')
+        DeviceToken.register(defender, 'token-1', 'android')
+        DeviceToken.register(defender, 'token-2', 'ios')
+        silent = User.objects.create_user(username='silent', password='testpass')
+
+        notifications = [
+            NotificationService.build_zone_attack_notification(defender.id, 'zone_1_1', 'attacker'),
+            NotificationService.build_zone_lost_notification(defender.id, 'zone_1_1', 'attacker'),
+            NotificationService.build_zone_attack_notification(silent.id, 'zone_2_2', 'attacker'),
+        ]
+
+        with django_assert_num_queries(1):
+            delivered = NotificationService.send_batch(notifications)
+
+        assert delivered == 2
+        assert transport.calls == 1
+        assert len(transport.sent) == 4
+        assert {message['token'] for message in transport.sent} == {'token-1', 'token-2'}
+
+    def test_deliver_batch_prunes_invalid_tokens(self, transport):
+        """Test unregistered tokens are deleted and transient failures counted"""
+        defender = User.objects.create_user(username='defender', password='testpass')
+        DeviceToken.register(defender, 'dead-token')
+        DeviceToken.register(defender, 'flaky-token')
+        transport.errors = {'dead-token': 'UNREGISTERED', 'flaky-token': 'UNAVAILABLE'}
+
+        notification = NotificationService.build_zone_attack_notification(defender.id, 'zone_1_1', 'attacker')
+
+        assert NotificationService.deliver_batch([notification]) == [False]
+        assert list(DeviceToken.objects.values_list('token', 'failure_count')) == [('flaky-token', 1)]
+
+        transport.errors = {}
+        assert NotificationService.deliver_batch([notification]) == [True]
+        assert DeviceToken.objects.get(token='flaky-token').failure_count == 0
+
+    def test_failed_send_leaves_tokens_alone(self, transport, settings, monkeypatch):
+        """Test a send that fails as a whole is retried without counting against any token"""
+        settings.DEVICE_TOKEN_MAX_FAILURES = 1
+        defender = User.objects.create_user(username='defender', password='testpass')
+        DeviceToken.register(defender, 'token-1')
+
+        def outage(messages):
+            raise ConnectionError("FCM unavailable")
+        monkeypatch.setattr(transport, 'send_each', outage)
+
+        notification = NotificationService.build_zone_attack_notification(defender.id, 'zone_1_1', 'attacker')
+
+        assert NotificationService.deliver_batch([notification]) == [False]
+        assert list(DeviceToken.objects.values_list('token', 'failure_count')) == [('token-1', 0)]
+
+    def test_send_messages_chunks_at_fcm_limit(self, transport):
+        """Test large sends are split into send_each calls of at most 500"""
+        messages = [
+            {'token': f'token-{i}', 'title': 'title', 'body': 'body', 'data': {}}
+            for i in range(1200)
+        ]
+
+        assert NotificationService.send_messages(messages) == 1200
+        assert transport.calls == 3
+
+    def test_transport_built_from_settings(self, settings):
+        """Test the transport named by PUSH_TRANSPORT is built on first use"""
+        settings.PUSH_TRANSPORT = 'utils.notifications.LoggingTransport'
+        previous = set_transport(None)
+        try:
+            assert isinstance(get_transport(), LoggingTransport)
+        finally:
+            set_transport(previous)
+
+
+@pytest.mark.django_db
+class TestOutboxService:
+    @pytest.fixture(autouse=True)
+    def no_coalesce_window(self, settings):
+        settings.NOTIFICATION_COALESCE_WINDOW_SECONDS = 0
+
+    def test_dispatch_batch_marks_outcomes(self, transport):
+        """Test dispatched rows are sent once and marked with their outcome"""
+        defender = User.objects.create_user(username='defender', password='testpass')
+        DeviceToken.register(defender, 'token-1')
+        silent = User.objects.create_user(username='silent', password='testpass')
+
+        OutboxService.enqueue([
+            NotificationService.build_zone_attack_notification(defender.id, 'zone_1_1', 'attacker'),
+            NotificationService.build_zone_attack_notification(silent.id, 'zone_2_2', 'attacker'),
+        ])
+
+        assert OutboxService.dispatch_batch() == 2
+        assert OutboxService.dispatch_batch() == 0
+
+        statuses = dict(PendingNotification.objects.values_list('recipient__username', 'status'))
+        assert statuses == {'defender': 'delivered', 'silent': 'skipped'}
+        assert len(transport.sent) == 1
+
+    def test_dispatch_batch_coalesces_per_recipient(self, transport):
+        """Test a recipient's pending rows go out as one digest push"""
+        defender = User.objects.create_user(username='defender', password='testpass')
+        DeviceToken.register(defender, 'token-1')
+
+        attack = NotificationService.build_zone_attack_notification(defender.id, 'zone_1_1', 'raider')
+        OutboxService.enqueue([
+            attack,
+            attack,
+            NotificationService.build_zone_attack_notification(defender.id, 'zone_2_2', 'pillager'),
+            NotificationService.build_zone_lost_notification(defender.id, 'zone_1_1', 'raider'),
+        ])
+
+        assert OutboxService.dispatch_batch() == 4
+
+        assert len(transport.sent) == 1
+        assert transport.sent[0]['body'] == "2 zones attacked by raider, pillager; 1 lost"
+        assert metrics.snapshot()['notifications_duplicates_dropped'] == 1
+        assert PendingNotification.objects.filter(status='delivered').count() == 4
+
+    def test_dispatch_batch_claims_oldest_rows_first(self, transport):
+        """Test a full batch goes to the oldest rows whatever their recipient"""
+        early = User.objects.create_user(username='early', password='testpass')
+        late = User.objects.create_user(username='late', password='testpass')
+
+        OutboxService.enqueue([
+            NotificationService.build_zone_attack_notification(late.id, 'zone_1_1', 'raider'),
+            NotificationService.build_zone_attack_notification(early.id, 'zone_2_2', 'raider'),
+        ])
+
+        assert OutboxService.dispatch_batch(batch_size=1) == 1
+
+        pending = PendingNotification.objects.filter(status='pending')
+        assert list(pending.values_list('recipient__username', flat=True)) == ['early']
+
+    def test_window_holds_recent_rows(self, transport, settings):
+        """Test rows wait until the recipient's coalescing window has passed"""
+        settings.NOTIFICATION_COALESCE_WINDOW_SECONDS = 30
+        defender = User.objects.create_user(username='defender', password='testpass')
+        DeviceToken.register(defender, 'token-1')
+
+        OutboxService.enqueue([
+            NotificationService.build_zone_attack_notification(defender.id, 'zone_1_1', 'raider'),
+        ])
+
+        assert OutboxService.dispatch_batch() == 0
@@ -0,0 +1,36 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestProfiling:
+    def test_header_profiles_staff_requests_only(self):
+        """Test X-Profile is ignored for players and stored for staff"""
+        player = User.objects.create_user(username='player', password='testpass')
+        admin = User.objects.create_user(username='admin', password='testpass', is_staff=True)
+        client = APIClient()
+
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(player)}')
+        assert 'X-Profile-Id' not in client.get('/api/v1/', HTTP_X_PROFILE='1')
+        assert client.get('/api/v1/profiles/').status_code == 403
+
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(admin)}')
+        response = client.get('/api/v1/', HTTP_X_PROFILE='1')
+        profile_id = int(response['X-Profile-Id'])
+
+        profiles = client.get('/api/v1/profiles/').data['profiles']
+        assert profiles[0]['id'] == profile_id
+        assert profiles[0]['trigger'] == 'header'
+        assert 'cumulative' in client.get(f'/api/v1/profiles/{profile_id}/').data['report']
+
+    def test_view_sample_rate(self, settings):
+        """Test per-view sample rates override the default"""
+        settings.PROFILING_VIEW_RATES = {'api_root': 1.0}
+        client = APIClient()
+
+        assert 'X-Profile-Id' in client.get('/api/v1/')
+        assert 'X-Profile-Id' not in client.get('/api/v1/health/')
@@ -0,0 +1,34 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from utils.queries import QueryBudgetExceeded, fingerprint, query_budget
+
+User = get_user_model()
+
+
+class TestFingerprint:
+    def test_values_are_normalized(self):
+        """Test statements differing only in values share a fingerprint"""
+        assert fingerprint("SELECT * FROM t WHERE id = 1 AND name = 'a'") == \
+            fingerprint("SELECT * FROM t WHERE id = 22 AND name = 'it''s'")
+        assert fingerprint('SELECT * FROM t WHERE id IN (%s, %s)') == \
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)')
+
+
+@pytest.mark.django_db
+class TestQueryBudget:
+    def test_budget_exceeded(self):
+        """Test a block over budget fails and reports the repeated statement"""
+        with pytest.raises(QueryBudgetExceeded, match='2x'):
+            with query_budget(1):
+                list(User.objects.filter(username='a'))
+                list(User.objects.filter(username='b'))
+
+    def test_headers(self, settings):
+        """Test responses carry the query headers when enabled"""
+        settings.QUERY_COUNT_HEADER = True
+        response = APIClient().get('/api/v1/leaderboard/')
+
+        assert int(response['X-DB-Query-Count']) >= 0
+        assert 'X-DB-Time-Ms' in response
+        assert 'X-DB-Duplicate-Queries' in response
@@ -0,0 +1,88 @@
+import pytest
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from rest_framework_simplejwt.tokens import AccessToken
+from utils import replicas
+from zones.models import Zone
+
+User = get_user_model()
+
+
+@pytest.fixture
+def replica(settings, monkeypatch):
+    """Route to a healthy replica alias without connecting to it"""
+    settings.REPLICA_DATABASES = ['replica']
+    settings.REPLICA_HEALTH_CHECK_SECONDS = 3600
+    monkeypatch.setattr(replicas, 'health', replicas.ReplicaHealth())
+    replicas.health.mark('replica', True)
+    return 'replica'
+
+
+class TestReplicaRouter:
+    def test_only_replica_scopes_read_from_replicas(self, replica):
+        """Test reads leave the primary only inside a replica scope"""
+        assert User.objects.all().db == 'default'
+
+        with replicas.replica_reads():
+            assert User.objects.all().db == replica
+
+    def test_written_models_are_read_from_the_primary(self, replica):
+        """Test a scope reads models it has written from the primary"""
+        with replicas.replica_reads():
+            assert replicas.ReplicaRouter().db_for_write(User) == 'default'
+
+            assert User.objects.all().db == 'default'
+            assert Zone.objects.all().db == replica
+
+    def test_primary_reads_override_a_replica_scope(self, replica):
+        """Test reads in a primary_reads() block stay on the primary"""
+        with replicas.replica_reads():
+            with replicas.primary_reads():
+                assert User.objects.all().db == 'default'
+            assert User.objects.all().db == replica
+
+    def test_unhealthy_replicas_fail_over_to_the_primary(self, replica):
+        """Test reads go to the primary while no replica passes its health check"""
+        replicas.health.mark(replica, False)
+
+        with replicas.replica_reads():
+            assert User.objects.all().db == 'default'
+
+    def test_writers_read_their_own_writes(self, replica, rf):
+        """Test a user's requests stay on the primary for a while after they write"""
+        user = User(id=7, username='writer')
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'}
+        routed = []
+
+        def view(request):
+            routed.append(Zone.objects.all().db)
+            return HttpResponse()
+        view.read_replica = True
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = replicas.ReplicaMiddleware(get_response)
+        middleware(rf.get('/', **auth))
+
+        write = rf.post('/')
+        write.user = user
+        middleware(write)
+        middleware(rf.get('/', **auth))
+
+        assert routed == [replica, 'default', 'default']
+
+
+@pytest.mark.skipif(not settings.REPLICA_DATABASES, reason='Set DATABASE_REPLICA_URLS to a second local database')
+@pytest.mark.django_db(transaction=True, databases='__all__')
+def test_replica_reads_against_a_mirrored_database():
+    """Test routed reads run on a replica connection, which tests mirror to the test database"""
+    user = User.objects.create_user(username='testuser', password='testpass')
+
+    with replicas.replica_reads():
+        replica_user = User.objects.get(pk=user.pk)
+
+    assert replica_user._state.db in settings.REPLICA_DATABASES
+    assert replica_user.username == 'testuser'
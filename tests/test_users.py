@@ -0,0 +1,267 @@
+import json
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.tokens import AccessToken
+from leaderboard.services import GameStatsService
+from users import progression
+from users.authentication import CachedJWTAuthentication
+from users.curves import get_curve, load_curve
+from users.progression import ProgressionService
+from users.serializers import FamilyTokenRefreshSerializer
+from users.tokens import FamilyRefreshToken
+
+User = get_user_model()
+
+
+def authenticate(user):
+    request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    return CachedJWTAuthentication().authenticate(request)[0]
+
+
+@pytest.mark.django_db
+class TestCachedJWTAuthentication:
+    def test_repeat_requests_skip_database(self, django_assert_num_queries):
+        """Test only the first request for a user loads the row"""
+        user = User.objects.create_user(username='player', password='testpass')
+
+        with django_assert_num_queries(1):
+            authenticate(user)
+        with django_assert_num_queries(0):
+            assert authenticate(user).username == 'player'
+
+    def test_save_invalidates(self):
+        """Test saving a user replaces the cached row"""
+        user = User.objects.create_user(username='player', password='testpass')
+        authenticate(user)
+
+        user.xp = 500
+        user.save(update_fields=['xp'])
+
+        assert authenticate(user).xp == 500
+
+    def test_requests_get_their_own_copy(self):
+        """Test changes made while handling a request don't leak into the cache"""
+        user = User.objects.create_user(username='player', password='testpass')
+
+        authenticate(user).xp = 999
+
+        assert authenticate(user).xp == 0
+
+    def test_inactive_user_rejected(self):
+        """Test deactivated users are rejected once their row is re-read"""
+        user = User.objects.create_user(username='player', password='testpass')
+        authenticate(user)
+
+        user.is_active = False
+        user.save()
+
+        with pytest.raises(AuthenticationFailed):
+            authenticate(user)
+
+
+def refresh(token):
+    serializer = FamilyTokenRefreshSerializer(data={'refresh': token})
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['refresh']
+
+
+@pytest.mark.django_db
+class TestAsyncProfile:
+    def test_async_profile_matches_sync(self):
+        """Test the async profile returns what the sync view does"""
+        user = User.objects.create_user(username='testuser', password='testpass')
+        auth = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+        expected = Client().get('/api/v1/auth/profile/', headers=auth)
+        response = async_to_sync(AsyncClient().get)('/api/v1/async/auth/profile/', headers=auth)
+
+        assert response.status_code == expected.status_code == 200
+        assert response.json() == expected.json()
+
+    def test_async_profile_requires_token(self):
+        """Test async views reject requests without a valid token like DRF does"""
+        client = AsyncClient()
+
+        assert async_to_sync(client.get)('/api/v1/async/auth/profile/').status_code == 401
+        response = async_to_sync(client.get)(
+            '/api/v1/async/auth/profile/', headers={'Authorization': 'Bearer nope'}
+        )
+        assert response.status_code == 401
+
+
+@pytest.mark.django_db
+class TestLogin:
+    def test_login_rehashes_legacy_password(self, settings):
+        """Test a password hashed by a non-preferred hasher is upgraded on login"""
+        settings.PASSWORD_HASHERS = [
+            'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+            'users.hashers.TunedArgon2PasswordHasher',
+        ]
+        user = User.objects.create_user(username='player', password='testpass')
+        settings.PASSWORD_HASHERS = list(reversed(settings.PASSWORD_HASHERS))
+
+        response = APIClient().post('/api/v1/auth/login/', {'username': 'player', 'password': 'testpass'})
+
+        assert response.status_code == 200
+        user.refresh_from_db()
+        assert user.password.startswith('argon2')
+
+    def test_unchanged_push_token_not_rewritten(self):
+        """Test logging in again with the same push token doesn't update the user row"""
+        User.objects.create_user(username='player', password='testpass', push_token='token-1')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().post('/api/v1/auth/login/', {
+                'username': 'player', 'password': 'testpass', 'push_token': 'token-1'
+            })
+
+        assert response.status_code == 200
+        assert not [query for query in queries if query['sql'].startswith('UPDATE "users_user"')]
+
+
+@pytest.mark.django_db
+class TestTokenFamilies:
+    def test_rotation_advances_generation(self):
+        """Test each refresh returns a token for the next generation of the same family"""
+        user = User.objects.create_user(username='player', password='testpass')
+        token = FamilyRefreshToken.for_user(user)
+
+        rotated = FamilyRefreshToken(refresh(str(token)))
+
+        assert rotated['fam'] == token['fam']
+        assert rotated['gen'] == 1
+        assert 'fam' not in rotated.access_token
+
+    def test_replay_revokes_family(self):
+        """Test reusing a rotated refresh token revokes every token in its family"""
+        user = User.objects.create_user(username='player', password='testpass')
+        original = str(FamilyRefreshToken.for_user(user))
+        rotated = refresh(original)
+
+        with pytest.raises(InvalidToken):
+            refresh(original)
+        with pytest.raises(InvalidToken):
+            refresh(rotated)
+
+
+@pytest.mark.django_db
+class TestProgressionService:
+    def test_concurrent_gains_are_not_lost(self):
+        """Test XP from two stale copies of a user adds up instead of overwriting"""
+        user = User.objects.create_user(username='player', password='testpass')
+        stale = User.objects.get(pk=user.pk)
+
+        ProgressionService.apply(user, 150, recount_zones=False)
+        ProgressionService.apply(stale, 30, recount_zones=False)
+
+        assert (stale.xp, stale.level) == (180, 2)
+        user.refresh_from_db()
+        assert (user.xp, user.level) == (180, 2)
+
+    def test_buffered_gains_flush_together(self, settings, monkeypatch, django_capture_on_commit_callbacks):
+        """Test buffered XP is summed per user and written by one flush"""
+        settings.PROGRESSION_MODE = 'memory'
+        settings.PROGRESSION_FLUSH_INTERVAL_MS = 0
+        monkeypatch.setattr(progression, '_buffer', None)
+        first = User.objects.create_user(username='first', password='testpass')
+        second = User.objects.create_user(username='second', password='testpass')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            ProgressionService.apply(first, 60, recount_zones=False)
+            ProgressionService.apply(first, 60, recount_zones=False)
+            ProgressionService.apply(second, 40, recount_zones=False)
+
+        assert User.objects.get(pk=first.pk).xp == 0
+        assert ProgressionService.flush() == 2
+        assert dict(User.objects.values_list('username', 'xp')) == {'first': 120, 'second': 40}
+        assert User.objects.get(pk=first.pk).level == 2
+
+
+@pytest.fixture
+def curve_table(settings, tmp_path):
+    """Switch to a non-linear curve read from a table file"""
+    path = tmp_path / 'curve.json'
+    path.write_text(json.dumps({'xp': [0, 50, 150, 400, 1000], 'power': [10, 15, 25, 40, 60]}))
+    settings.LEVEL_CURVE = {'table': str(path), 'xp_per_level': 100}
+    get_curve.cache_clear()
+    yield get_curve()
+    get_curve.cache_clear()
+
+
+class TestLevelCurve:
+    def test_default_curve_matches_linear_levels(self):
+        """Test the generated curve keeps a level every 100 XP and the old power formula"""
+        curve = load_curve(
+            {'table': '', 'xp_per_level': 100},
+            {'per_level': 10, 'per_zone': 5, 'zone_cap': 50}
+        )
+
+        assert [curve.level_for_xp(xp) for xp in (0, 99, 100, 250, 99900)] == [1, 1, 2, 3, 1000]
+        assert curve.attack_power(3, 4) == 3 * 10 + 20
+        assert curve.attack_power(3, 40) == 3 * 10 + 50
+
+    def test_default_curve_is_uncapped(self):
+        """Test XP past any table keeps adding a level every xp_per_level, like xp // 100 + 1"""
+        curve = load_curve(
+            {'table': '', 'xp_per_level': 100},
+            {'per_level': 10, 'per_zone': 5, 'zone_cap': 50}
+        )
+
+        assert curve.max_level is None
+        assert curve.level_for_xp(250000) == 250000 // 100 + 1
+        assert curve.xp_for_level(2501) == 250000
+        assert curve.attack_power(2501, 0) == 2501 * 10
+
+    def test_capped_curve_stops_at_max_level(self):
+        """Test an explicit max_level caps the generated curve"""
+        curve = load_curve(
+            {'table': '', 'xp_per_level': 100, 'max_level': 1000},
+            {'per_level': 10, 'per_zone': 5, 'zone_cap': 50}
+        )
+
+        assert curve.level_for_xp(250000) == 1000
+        assert curve.attack_power(2501, 0) == 1000 * 10
+
+    def test_table_curve(self, curve_table):
+        """Test levels and power come from the table file"""
+        assert [curve_table.level_for_xp(xp) for xp in (0, 49, 50, 399, 400, 5000)] == [1, 1, 2, 3, 4, 5]
+        assert curve_table.attack_power(4, 0) == 40
+
+
+@pytest.mark.django_db
+class TestRelevelUsers:
+    def test_relevel_applies_new_curve(self, curve_table):
+        """Test relevel_users moves every user to the level the new curve gives them"""
+        User.objects.create_user(username='novice', password='testpass', xp=60, level=1)
+        User.objects.create_user(username='veteran', password='testpass', xp=450, level=5)
+
+        call_command('relevel_users', batch_size=1)
+
+        assert dict(User.objects.values_list('username', 'level')) == {'novice': 2, 'veteran': 4}
+        call_command('relevel_users', check=True)
+
+
+@pytest.mark.django_db
+class TestUserCounter:
+    def test_total_users_follows_every_write_path(self):
+        """Test users created, deactivated or deleted outside the API keep total_users exact"""
+        GameStatsService.reconcile(['total_users'])
+        player = User.objects.create_user(username='player', password='testpass')
+        User.objects.create_superuser(username='admin', password='testpass')
+        assert GameStatsService.get_stats()['total_users'] == 2
+
+        player = User.objects.get(pk=player.pk)
+        player.is_active = False
+        player.save()
+        player.save()
+        assert GameStatsService.get_stats()['total_users'] == 1
+
+        User.objects.get(username='admin').delete()
+        assert GameStatsService.get_stats()['total_users'] == 0
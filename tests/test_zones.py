@@ -1,9 +1,18 @@
+import asyncio
+import threading
 import pytest
-from django.test import TestCase
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.test import AsyncClient, Client, TestCase
 from django.contrib.auth import get_user_model
 from django.contrib.gis.geos import Point
-from zones.models import Zone
+from zones import checkins, live
+from zones.models import Zone, ZoneCheckIn
 from zones.services import ZoneService
+from leaderboard.services import GameStatsService
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
 User = get_user_model()
 
@@ -41,6 +50,22 @@ class TestZoneService:
         assert zone.claimed_at is not None
         assert zone.expires_at is not None
 
+    def test_claim_only_takes_free_zones(self):
+        """Test a claim through a stale instance can't take a zone someone else holds"""
+        owner = User.objects.create_user(username='owner', password='testpass')
+        user = User.objects.create_user(username='testuser', password='testpass')
+        zone = Zone.objects.create(id='test_zone', location=Point(-122.4194, 37.7749))
+        stale = Zone.objects.get(id='test_zone')
+
+        assert zone.claim(owner) is True
+        assert stale.claim(user) is False
+        assert stale.owner_id == owner.pk
+        assert stale.claim(user, from_owner=user) is False
+
+        assert stale.claim(user, from_owner=owner) is True
+        assert Zone.objects.get(id='test_zone').owner == user
+        assert GameStatsService.get_stats()['total_zones'] == 1
+
     def test_nearby_zones(self):
         """Test getting nearby zones"""
         # Create test zones
@@ -52,3 +77,211 @@ class TestZoneService:
         nearby_zones = ZoneService.get_nearby_zones(user_location, radius_meters=200)
 
         assert nearby_zones.count() == 2  # Should not include far away zone
+
+
+@pytest.mark.django_db
+class TestZoneAcquisition:
+    def test_first_visit_creates_a_claimed_zone(self):
+        """Test a check-in at a new zone creates it owned by the player"""
+        user = User.objects.create_user(username='testuser', password='testpass')
+        location = Point(-122.4194, 37.7749)
+
+        zone, claimed = ZoneService.acquire_zone('new_zone', user, location)
+
+        assert claimed is True
+        assert zone.previous_owner_id is None
+        assert Zone.objects.get(id='new_zone').owner == user
+
+    def test_owned_and_distant_zones_are_not_claimed(self):
+        """Test a zone is only claimed while free and within capture radius"""
+        owner = User.objects.create_user(username='owner', password='testpass')
+        user = User.objects.create_user(username='testuser', password='testpass')
+        location = Point(-122.4194, 37.7749)
+        Zone.objects.create(id='owned_zone', location=location).claim(owner)
+        Zone.objects.create(id='free_zone', location=location)
+
+        zone, claimed = ZoneService.acquire_zone('owned_zone', user, location)
+        assert claimed is False
+        assert zone.owner_id == owner.pk
+
+        zone, claimed = ZoneService.acquire_zone('free_zone', user, Point(-122.4100, 37.7749))
+        assert claimed is False
+        assert zone.owner_id is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_simultaneous_first_visits_claim_once():
+    """Test players racing to a new zone get one owner and no errors"""
+    users = [User.objects.create_user(username=f'testuser{i}', password='testpass') for i in range(4)]
+    location = Point(-122.4194, 37.7749)
+    barrier = threading.Barrier(len(users))
+    results = []
+
+    def visit(user):
+        try:
+            barrier.wait()
+            results.append(ZoneService.acquire_zone('race_zone', user, location))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=visit, args=(user,)) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    owner_id = Zone.objects.get(id='race_zone').owner_id
+    assert len(results) == len(users)
+    assert [zone.owner_id for zone, claimed in results if claimed] == [owner_id]
+    assert {zone.owner_id for zone, claimed in results} == {owner_id}
+
+
+@pytest.mark.django_db
+class TestAsyncViews:
+    def test_async_nearby_matches_sync(self):
+        """Test the async nearby endpoint returns what its sync counterpart does"""
+        user = User.objects.create_user(username='testuser', password='testpass')
+        Zone.objects.create(id='nearby_zone', location=Point(-122.4194, 37.7749)).claim(user)
+        auth = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        params = {'latitude': 37.7749, 'longitude': -122.4194, 'radius': 500}
+
+        expected = Client().get('/api/v1/zones/nearby/', params, headers=auth)
+        response = async_to_sync(AsyncClient().get)('/api/v1/async/zones/nearby/', params, headers=auth)
+
+        assert response.status_code == expected.status_code == 200
+        assert response.json() == expected.json()
+
+
+@pytest.mark.django_db
+class TestLiveZones:
+    def test_claim_and_expiry_reach_nearby_subscribers(self, django_capture_on_commit_callbacks):
+        """Test zone changes are delivered to subscribers of nearby cells only"""
+        user = User.objects.create_user(username='testuser', password='testpass')
+        zone = Zone.objects.create(id='live_zone', location=Point(-122.4194, 37.7749))
+
+        def change(action):
+            with django_capture_on_commit_callbacks(execute=True):
+                action()
+
+        async def scenario():
+            broker = live.get_broker()
+            near = await broker.subscribe(live.cells_around(37.7749, -122.4194 + settings.LIVE_CELL_SIZE, 1))
+            far = await broker.subscribe(live.cells_around(0, 0, 1))
+
+            await sync_to_async(change)(lambda: zone.claim(user))
+            claimed = await asyncio.wait_for(near.get(), 1)
+            await sync_to_async(change)(zone.unclaim)
+            expired = await asyncio.wait_for(near.get(), 1)
+
+            assert far.queue.empty()
+            await broker.unsubscribe(near)
+            await broker.unsubscribe(far)
+            return claimed, expired
+
+        claimed, expired = async_to_sync(scenario)()
+
+        assert claimed['event'] == 'claim'
+        assert claimed['zone'] == 'live_zone'
+        assert claimed['owner'] == 'testuser'
+        assert expired['event'] == 'expire'
+        assert expired['owner'] is None
+        assert live.get_broker().subscribers == {}
+
+    def test_resubscribing_waits_for_a_pending_unsubscribe(self):
+        """Test a cell left and rejoined at once ends up listened to"""
+        calls = []
+
+        class SlowBroker(live.MemoryBroker):
+            async def listen_to(self, cells):
+                calls.append(('listen', cells))
+
+            async def stop_listening_to(self, cells):
+                await asyncio.sleep(0.01)
+                calls.append(('stop', cells))
+
+        async def scenario():
+            broker = SlowBroker()
+            first = await broker.subscribe(['cell'])
+            await asyncio.gather(broker.unsubscribe(first), broker.subscribe(['cell']))
+
+        async_to_sync(scenario)()
+
+        assert calls == [('listen', ['cell']), ('stop', ['cell']), ('listen', ['cell'])]
+
+
+@pytest.mark.django_db
+class TestCheckIns:
+    def test_repeat_check_ins_are_recorded_once(self):
+        """Test check-ins repeated within the dedup window aren't stored again"""
+        user = User.objects.create_user(username='testuser', password='testpass')
+        location = Point(-122.4194, 37.7749)
+        zone = Zone.objects.create(id='checkin_zone', location=location)
+
+        for _ in range(3):
+            checkins.record(user, zone, location)
+
+        assert ZoneCheckIn.objects.filter(user=user, zone=zone).count() == 1
+
+    def test_buffered_check_ins_are_written_on_flush(self, settings, django_capture_on_commit_callbacks):
+        """Test buffered check-ins are inserted in one batch keeping their check-in time"""
+        settings.CHECKIN_DURABILITY = 'buffered'
+        settings.CHECKIN_FLUSH_INTERVAL_MS = 3600 * 1000
+        location = Point(-122.4194, 37.7749)
+        zone = Zone.objects.create(id='checkin_zone', location=location)
+        users = [User.objects.create_user(username=f'testuser{i}', password='testpass') for i in range(3)]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            recorded = [checkins.record(user, zone, location)[0] for user in users]
+
+        assert not ZoneCheckIn.objects.exists()
+        assert checkins.get_buffer().flush() == 3
+        stored = ZoneCheckIn.objects.order_by('user_id')
+        assert [checkin.timestamp for checkin in stored] == [checkin.timestamp for checkin in recorded]
+
+    def test_check_in_response_says_what_was_stored(self, settings, django_capture_on_commit_callbacks):
+        """Test a repeat check-in answers 200 flagged deduplicated and a buffered one 202"""
+        user = User.objects.create_user(username='testuser', password='testpass')
+        Zone.objects.create(id='checkin_zone', location=Point(-122.4194, 37.7749))
+        client = APIClient()
+        client.force_authenticate(user)
+        location = {'latitude': 37.7749, 'longitude': -122.4194}
+
+        first = client.post('/api/v1/zones/checkin_zone/checkin/', location)
+        repeat = client.post('/api/v1/zones/checkin_zone/checkin/', location)
+        assert (first.status_code, first.json()['deduplicated']) == (201, False)
+        assert (repeat.status_code, repeat.json()['deduplicated']) == (200, True)
+
+        settings.CHECKIN_DURABILITY = 'buffered'
+        settings.CHECKIN_DEDUP_SECONDS = 0
+        settings.CHECKIN_FLUSH_INTERVAL_MS = 3600 * 1000
+        with django_capture_on_commit_callbacks(execute=True):
+            buffered = client.post('/api/v1/zones/checkin_zone/checkin/', location)
+        assert (buffered.status_code, buffered.json()['deduplicated']) == (202, False)
+        assert checkins.get_buffer().flush() == 1
+
+    def test_rejected_check_ins_are_dropped_row_by_row(self):
+        """Test a row the database rejects doesn't hold back the rest of its batch"""
+        user = User.objects.create_user(username='testuser', password='testpass')
+        location = Point(-122.4194, 37.7749)
+        zone = Zone.objects.create(id='checkin_zone', location=location)
+        buffer = checkins.CheckInBuffer()
+        buffer.pending = [
+            ZoneCheckIn(user=user, zone=zone, location=location),
+            ZoneCheckIn(user=user, zone=zone, location=None),
+            ZoneCheckIn(user=user, zone=zone, location=location),
+        ]
+
+        assert buffer.flush() == 2
+        assert buffer.pending == []
+        assert ZoneCheckIn.objects.count() == 2
+
+    def test_buffer_holds_at_most_checkin_buffer_max(self, settings):
+        """Test check-ins put back after a failed flush don't grow the buffer past its cap"""
+        settings.CHECKIN_BUFFER_MAX = 2
+        buffer = checkins.CheckInBuffer()
+        buffer.pending = [ZoneCheckIn(zone_id='newer')]
+
+        buffer.restore([ZoneCheckIn(zone_id='older') for _ in range(2)])
+
+        assert [checkin.zone_id for checkin in buffer.pending] == ['older', 'older']
+        assert buffer.dropped == 1
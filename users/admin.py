@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User
+from .models import DeviceToken, User
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -8,3 +8,12 @@ class UserAdmin(admin.ModelAdmin):
     search_fields = ('username', 'email')
     readonly_fields = ('created_at', 'updated_at')
     ordering = ('-xp', '-level')
+
+
+@admin.register(DeviceToken)
+class DeviceTokenAdmin(admin.ModelAdmin):
+    list_display = ('user', 'platform', 'last_seen', 'failure_count', 'created_at')
+    list_filter = ('platform', 'last_seen')
+    search_fields = ('user__username', 'token')
+    readonly_fields = ('created_at',)
+    ordering = ('-last_seen',)
@@ -0,0 +1,8 @@
+from utils.async_api import async_api_view, json_response
+from .serializers import UserProfileSerializer
+
+
+@async_api_view()
+async def profile(request):
+    """Get the user's profile; request.user comes from the user cache, so no query runs"""
+    return json_response(UserProfileSerializer(request.user).data)
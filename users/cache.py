@@ -0,0 +1,95 @@
+"""
+Cached user rows for authentication.
+
+Each user has a version counter in the shared cache, and their row is stored under a key
+that includes the version. Saving the user bumps the version after commit, which orphans
+the old snapshot. In front of the shared cache every process keeps a small LRU of recent
+users; an entry is trusted without any lookup for AUTH_USER_CACHE_LOCAL_TTL seconds, then
+revalidated against the shared version counter.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'auth:user:version:{user_id}'
+SNAPSHOT_KEY = 'auth:user:{user_id}:v{version}'
+
+_local = OrderedDict()  # user_id -> (trusted_until, version, user)
+_lock = threading.Lock()
+
+
+def get_version(user_id):
+    """Get the current version of a user's cached row, starting at 1"""
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+    return version
+
+
+def _remember(user_id, version, user):
+    with _lock:
+        _local[user_id] = (time.monotonic() + settings.AUTH_USER_CACHE_LOCAL_TTL, version, user)
+        _local.move_to_end(user_id)
+        while len(_local) > settings.AUTH_USER_CACHE_LOCAL_SIZE:
+            _local.popitem(last=False)
+
+
+def get_user(user_id, load):
+    """Return a copy of the cached user, calling load() to fetch the row on a miss
+
+    Callers get their own copy, so changes made while handling a request never leak into
+    the cache.
+    """
+    with _lock:
+        entry = _local.get(user_id)
+        if entry is not None:
+            _local.move_to_end(user_id)
+
+    if entry is not None and entry[0] > time.monotonic():
+        return copy.copy(entry[2])
+
+    # Read the version before loading, so a save that lands meanwhile orphans what we store
+    version = get_version(user_id)
+    if entry is not None and entry[1] == version:
+        user = entry[2]
+    else:
+        key = SNAPSHOT_KEY.format(user_id=user_id, version=version)
+        user = cache.get(key)
+        if user is None:
+            user = load()
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+
+    _remember(user_id, version, user)
+    return copy.copy(user)
+
+
+def invalidate(*user_ids):
+    """Drop cached rows for users now and again once the current transaction commits
+
+    The second bump orphans anything a concurrent request cached from the pre-commit row.
+    """
+    def _bump():
+        for user_id in user_ids:
+            with _lock:
+                _local.pop(user_id, None)
+            key = VERSION_KEY.format(user_id=user_id)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 2, None)
+
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def clear_local():
+    """Forget every user held in this process"""
+    with _lock:
+        _local.clear()
@@ -0,0 +1,112 @@
+"""
+Level and attack power curves.
+
+The curve is a table of XP thresholds: thresholds[n] is the XP needed for level n + 1,
+starting at 0 for level 1. It comes from the JSON file named by LEVEL_CURVE['table'], whose
+last level is the highest one. Without a table there is a level every
+LEVEL_CURVE['xp_per_level'] XP with no maximum, as levels always had, unless
+LEVEL_CURVE['max_level'] sets one. The file may also hold a "power" list with the attack
+power of each level; otherwise power grows by ATTACK_POWER['per_level'] a level. Levels
+are resolved with bisect, in SQL with width_bucket over the same thresholds, and both
+tables are built once per process.
+"""
+import json
+from bisect import bisect_right
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+class LevelCurve:
+    """Precomputed XP thresholds and attack power per level"""
+
+    def __init__(self, thresholds, powers, zone_power, zone_power_cap, xp_per_level=None, power_per_level=0):
+        if not thresholds or thresholds[0] != 0:
+            raise ImproperlyConfigured("A level curve must start with 0 XP for level 1")
+        if any(later <= earlier for earlier, later in zip(thresholds, thresholds[1:])):
+            raise ImproperlyConfigured("Level curve thresholds must be strictly increasing")
+        if len(powers) != len(thresholds):
+            raise ImproperlyConfigured("A level curve needs one attack power per level")
+
+        self.thresholds = list(thresholds)
+        self.powers = list(powers)
+        # Set for uncapped curves, which go on a level every xp_per_level XP past the table
+        self.xp_per_level = xp_per_level
+        self.power_per_level = power_per_level
+        # Zone bonus for 0..n zones, after which it stays at the cap
+        self.zone_bonus = [
+            min(zones * zone_power, zone_power_cap)
+            for zones in range(zone_power_cap // max(zone_power, 1) + 2)
+        ]
+
+    @property
+    def max_level(self):
+        """The highest level, or None when the curve is uncapped"""
+        return None if self.xp_per_level else len(self.thresholds)
+
+    def level_for_xp(self, xp):
+        """Level reached with a given amount of XP"""
+        level = bisect_right(self.thresholds, xp)
+        if self.xp_per_level and xp > self.thresholds[-1]:
+            level += (xp - self.thresholds[-1]) // self.xp_per_level
+        return level
+
+    def xp_for_level(self, level):
+        """XP needed to reach a level"""
+        table_levels = len(self.thresholds)
+        if self.xp_per_level and level > table_levels:
+            return self.thresholds[-1] + (level - table_levels) * self.xp_per_level
+        return self.thresholds[min(level, table_levels) - 1]
+
+    def attack_power(self, level, zones_owned):
+        table_levels = len(self.thresholds)
+        if self.xp_per_level and level > table_levels:
+            power = self.powers[-1] + (level - table_levels) * self.power_per_level
+        else:
+            power = self.powers[max(1, min(level, table_levels)) - 1]
+        return power + self.zone_bonus[min(zones_owned, len(self.zone_bonus) - 1)]
+
+    def level_sql(self, xp_sql):
+        """SQL for the level reached with xp_sql XP; takes the thresholds as its one parameter"""
+        if not self.xp_per_level:
+            return f"width_bucket({xp_sql}, %s::integer[])"
+        # xp_sql may hold parameters of its own, so it appears once and before the thresholds
+        return (
+            f"(SELECT width_bucket(curve.xp, curve.thresholds)"
+            f" + GREATEST(curve.xp - curve.thresholds[cardinality(curve.thresholds)], 0) / {int(self.xp_per_level)}"
+            f" FROM (SELECT {xp_sql} AS xp, %s::integer[] AS thresholds) AS curve)"
+        )
+
+
+def load_curve(config, power_config):
+    """Build a curve from LEVEL_CURVE and ATTACK_POWER style settings"""
+    thresholds = powers = None
+    if config.get('table'):
+        try:
+            with open(config['table']) as f:
+                table = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ImproperlyConfigured(f"Could not load level curve table {config['table']}: {e}")
+        thresholds = table['xp']
+        powers = table.get('power')
+    xp_per_level = None
+    if thresholds is None:
+        if config.get('max_level'):
+            thresholds = [level * config['xp_per_level'] for level in range(config['max_level'])]
+        else:
+            thresholds = [0]
+            xp_per_level = config['xp_per_level']
+    if powers is None:
+        powers = [level * power_config['per_level'] for level in range(1, len(thresholds) + 1)]
+
+    return LevelCurve(
+        thresholds, powers, power_config['per_zone'], power_config['zone_cap'],
+        xp_per_level=xp_per_level, power_per_level=power_config['per_level']
+    )
+
+
+@lru_cache(maxsize=None)
+def get_curve():
+    """The curve from settings, built on first use"""
+    return load_curve(settings.LEVEL_CURVE, settings.ATTACK_POWER)
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, BCryptSHA256PasswordHasher
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with the costs from PASSWORD_ARGON2_* instead of Django's defaults
+
+    Hashes keep the 'argon2' algorithm name, so changing the costs rehashes each
+    password on that user's next login.
+    """
+    time_cost = settings.PASSWORD_ARGON2_TIME_COST
+    memory_cost = settings.PASSWORD_ARGON2_MEMORY_COST
+    parallelism = settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class TunedBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
+    """bcrypt with the work factor from PASSWORD_BCRYPT_ROUNDS"""
+    rounds = settings.PASSWORD_BCRYPT_ROUNDS
@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from leaderboard import cache as leaderboard_cache
+from users import cache as user_cache
+from users.curves import get_curve
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's level from the current level curve in one pass over id ranges"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only count users whose level differs from the curve; exit non-zero if any are found',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Width of the id range updated per statement',
+        )
+
+    def handle(self, *args, **options):
+        curve = get_curve()
+        level = curve.level_sql('xp')
+        table = User._meta.db_table
+
+        if options['check']:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT COUNT(*) FROM {table} WHERE level <> {level}",
+                    [curve.thresholds]
+                )
+                mismatched = cursor.fetchone()[0]
+            if mismatched:
+                raise CommandError(f"{mismatched} users have a level that doesn't match the curve")
+            self.stdout.write(self.style.SUCCESS("All user levels match the curve"))
+            return
+
+        bounds = User.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            self.stdout.write("No users to relevel")
+            return
+
+        batch_size = options['batch_size']
+        changed = 0
+        for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+            # Short transactions per range, so row locks are never held for long
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"""
+                        UPDATE {table} SET level = {level}
+                        WHERE id >= %s AND id < %s AND level <> {level}
+                        RETURNING id
+                        """,
+                        [curve.thresholds, start, start + batch_size, curve.thresholds]
+                    )
+                    user_ids = [row[0] for row in cursor.fetchall()]
+                if user_ids:
+                    user_cache.invalidate(*user_ids)
+            changed += len(user_ids)
+
+        if changed:
+            leaderboard_cache.bump_version('level')
+        self.stdout.write(self.style.SUCCESS(
+            f"Releveled {changed} users against "
+            f"{f'a {curve.max_level}-level' if curve.max_level else 'an uncapped'} curve"
+        ))
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def copy_push_tokens(apps, schema_editor):
+    """Seed the registry with the single token each user had before"""
+    User = apps.get_model("users", "User")
+    DeviceToken = apps.get_model("users", "DeviceToken")
+
+    tokens = {}
+    for user_id, token in User.objects.exclude(push_token__isnull=True).exclude(push_token="").values_list("id", "push_token"):
+        tokens[token] = user_id  # The most recent account wins if a token was shared
+
+    DeviceToken.objects.bulk_create(
+        [DeviceToken(user_id=user_id, token=token) for token, user_id in tokens.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_user_successful_attacks"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeviceToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("token", models.CharField(max_length=255, unique=True)),
+                (
+                    "platform",
+                    models.CharField(
+                        choices=[
+                            ("android", "Android"),
+                            ("ios", "iOS"),
+                            ("web", "Web"),
+                            ("unknown", "Unknown"),
+                        ],
+                        default="unknown",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "last_seen",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("failure_count", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="device_tokens",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(copy_push_tokens, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -7,6 +8,7 @@ class User(AbstractUser):
     xp = models.PositiveIntegerField(default=0)
     level = models.PositiveIntegerField(default=1)
     zones_owned = models.PositiveIntegerField(default=0)
+    successful_attacks = models.PositiveIntegerField(default=0, db_index=True)  # Maintained by AttackService
     push_token = models.CharField(max_length=255, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -14,7 +16,79 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_active = instance.__dict__.get('is_active')  # None when deferred
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Compared after the save so every way of creating or (de)activating a user is counted
+        stored_active = False if self._state.adding else getattr(self, '_stored_active', None)
+        update_fields = kwargs.get('update_fields')
+        super().save(*args, **kwargs)
+        from .cache import invalidate
+        invalidate(self.pk)
+
+        if stored_active is not None and (update_fields is None or 'is_active' in update_fields):
+            if self.is_active != stored_active:
+                from leaderboard.services import GameStatsService
+                GameStatsService.increment('total_users', 1 if self.is_active else -1)
+            self._stored_active = self.is_active
+
+    def delete(self, *args, **kwargs):
+        from .cache import invalidate
+        invalidate(self.pk)
+        was_active = getattr(self, '_stored_active', None)
+        if was_active is None:
+            was_active = self.is_active
+        deleted = super().delete(*args, **kwargs)
+        if was_active:
+            from leaderboard.services import GameStatsService
+            GameStatsService.increment('total_users', -1)
+        return deleted
+
     @property
     def attack_power(self):
         """Calculate user's attack power based on level and zones owned"""
-        return self.level * 10 + min(self.zones_owned * 5, 50)
+        from .curves import get_curve
+        return get_curve().attack_power(self.level, self.zones_owned)
+
+
+class DeviceToken(models.Model):
+    """A push token for one of a user's devices"""
+
+    PLATFORM_CHOICES = [
+        ('android', 'Android'),
+        ('ios', 'iOS'),
+        ('web', 'Web'),
+        ('unknown', 'Unknown'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='device_tokens')
+    token = models.CharField(max_length=255, unique=True)
+    platform = models.CharField(max_length=10, choices=PLATFORM_CHOICES, default='unknown')
+    last_seen = models.DateTimeField(default=timezone.now)
+    failure_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.platform} device"
+
+    @classmethod
+    def register(cls, user, token, platform='unknown'):
+        """Add or refresh a device token; a token seen on a new account moves to that account"""
+        # Common case: a known device logging in again, refreshed with a single UPDATE
+        if cls.objects.filter(token=token, user=user).update(
+            platform=platform, last_seen=timezone.now(), failure_count=0
+        ):
+            return
+        cls.objects.update_or_create(
+            token=token,
+            defaults={
+                'user': user,
+                'platform': platform,
+                'last_seen': timezone.now(),
+                'failure_count': 0
+            }
+        )
@@ -0,0 +1,229 @@
+"""
+XP and level progression.
+
+XP is applied with a single UPDATE that adds the delta and derives the level in SQL, so
+concurrent check-ins and attacks can't overwrite each other's gains. With
+PROGRESSION_MODE set to 'memory' or 'redis', deltas are summed per user instead and
+written every PROGRESSION_FLUSH_INTERVAL_MS by one multi-row UPDATE, which saves most of
+the writes for very active players at the cost of XP showing up slightly later.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from . import cache as user_cache
+from .curves import get_curve
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+
+def level_sql(xp_sql):
+    """SQL for a user's level after their XP becomes xp_sql; levels never go down here
+
+    Takes the curve's thresholds as its one parameter.
+    """
+    return f"GREATEST(level, {get_curve().level_sql(xp_sql)})"
+
+
+class Buffer:
+    """Base for XP buffers; the first delta added starts a thread that flushes periodically"""
+
+    def __init__(self):
+        self.flusher = None
+        self.flusher_lock = threading.Lock()
+
+    def start_flusher(self):
+        if not settings.PROGRESSION_FLUSH_INTERVAL_MS:
+            return  # Flushed by the flush_progression task instead
+        with self.flusher_lock:
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self.run, name='progression-flusher', daemon=True)
+                self.flusher.start()
+                atexit.register(ProgressionService.flush)
+
+    def run(self):
+        while True:
+            time.sleep(settings.PROGRESSION_FLUSH_INTERVAL_MS / 1000)
+            close_old_connections()
+            try:
+                ProgressionService.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush XP buffer: {e}")
+
+
+class MemoryBuffer(Buffer):
+    """Sums XP deltas per user in this process"""
+
+    def __init__(self):
+        super().__init__()
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def add(self, user_id, delta):
+        with self.lock:
+            self.pending[user_id] = self.pending.get(user_id, 0) + delta
+        self.start_flusher()
+
+    def take(self):
+        with self.lock:
+            deltas, self.pending = self.pending, {}
+        return deltas
+
+    def ack(self):
+        pass
+
+    def restore(self, deltas):
+        """Put back deltas whose flush failed"""
+        with self.lock:
+            for user_id, delta in deltas.items():
+                self.pending[user_id] = self.pending.get(user_id, 0) + delta
+
+
+class RedisBuffer(Buffer):
+    """Sums XP deltas per user in a Redis hash shared by every process
+
+    Only one process flushes at a time. A flush renames the hash before reading it, so
+    increments that arrive meanwhile go to a fresh hash; the renamed hash is deleted once
+    its UPDATE has committed, and one left behind by a failed flush is retried next time.
+    """
+
+    PENDING_KEY = 'progression:xp:pending'
+    FLUSHING_KEY = 'progression:xp:flushing'
+    LOCK_KEY = 'progression:xp:lock'
+
+    def __init__(self, url):
+        import redis
+        super().__init__()
+        self.client = redis.Redis.from_url(url)
+        self.errors = redis.ResponseError
+
+    def add(self, user_id, delta):
+        self.client.hincrby(self.PENDING_KEY, user_id, delta)
+        self.start_flusher()
+
+    def take(self):
+        # The lock outlives a crashed flusher by a few intervals at most
+        if not self.client.set(self.LOCK_KEY, 1, nx=True, px=settings.PROGRESSION_FLUSH_INTERVAL_MS * 10 + 5000):
+            return {}
+
+        if not self.client.exists(self.FLUSHING_KEY):
+            try:
+                self.client.rename(self.PENDING_KEY, self.FLUSHING_KEY)
+            except self.errors:
+                self.client.delete(self.LOCK_KEY)
+                return {}  # Nothing pending
+        deltas = {
+            int(user_id): int(delta)
+            for user_id, delta in self.client.hgetall(self.FLUSHING_KEY).items()
+        }
+        if not deltas:
+            self.client.delete(self.LOCK_KEY)
+        return deltas
+
+    def ack(self):
+        self.client.delete(self.FLUSHING_KEY, self.LOCK_KEY)
+
+    def restore(self, deltas):
+        self.client.delete(self.LOCK_KEY)  # The deltas are still in the flushing hash
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Return the XP buffer for PROGRESSION_MODE, or None when applying immediately"""
+    global _buffer
+    if settings.PROGRESSION_MODE == 'immediate':
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                if settings.PROGRESSION_MODE == 'redis':
+                    _buffer = RedisBuffer(settings.PROGRESSION_REDIS_URL)
+                else:
+                    _buffer = MemoryBuffer()
+    return _buffer
+
+
+class ProgressionService:
+    """Applies XP and zone count changes to users without read-modify-write"""
+
+    @staticmethod
+    def apply(user, xp_gained, recount_zones=True):
+        """Add XP to a user and optionally recount their zones, updating the instance too"""
+        buffer = get_buffer()
+        buffered = buffer is not None and xp_gained
+        if buffered:
+            # Counted once the surrounding transaction commits, so rolled back work earns nothing
+            transaction.on_commit(lambda: buffer.add(user.pk, xp_gained))
+            user.xp += xp_gained
+            user.level = max(user.level, get_curve().level_for_xp(user.xp))
+            xp_gained = 0
+            if not recount_zones:
+                return
+
+        from zones.models import Zone
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {User._meta.db_table}
+                SET xp = xp + %s,
+                    level = {level_sql('xp + %s')},
+                    zones_owned = CASE WHEN %s THEN (
+                        SELECT COUNT(*) FROM {Zone._meta.db_table} owned
+                        WHERE owned.owner_id = {User._meta.db_table}.id AND owned.expires_at > NOW()
+                    ) ELSE zones_owned END
+                WHERE id = %s
+                RETURNING xp, level, zones_owned
+                """,
+                [xp_gained, xp_gained, get_curve().thresholds, recount_zones, user.pk]
+            )
+            row = cursor.fetchone()
+
+        if row:
+            if not buffered:
+                user.xp, user.level = row[0], row[1]
+            user.zones_owned = row[2]
+        user_cache.invalidate(user.pk)
+
+    @staticmethod
+    def flush():
+        """Write buffered XP deltas for every user in one UPDATE, returning how many users changed"""
+        buffer = get_buffer()
+        if buffer is None:
+            return 0
+
+        deltas = buffer.take()
+        if not deltas:
+            return 0
+
+        values = ', '.join(['(%s::bigint, %s::integer)'] * len(deltas))
+        params = [get_curve().thresholds] + [value for item in deltas.items() for value in item]
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"""
+                        UPDATE {User._meta.db_table}
+                        SET xp = xp + delta.amount,
+                            level = {level_sql('xp + delta.amount')}
+                        FROM (VALUES {values}) AS delta (user_id, amount)
+                        WHERE {User._meta.db_table}.id = delta.user_id
+                        """,
+                        params
+                    )
+                    updated = cursor.rowcount
+                user_cache.invalidate(*deltas)
+        except Exception:
+            buffer.restore(deltas)
+            raise
+
+        buffer.ack()
+        return updated
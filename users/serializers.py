@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
-from .models import User
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from .models import DeviceToken, User
+from .tokens import FamilyRefreshToken
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -20,6 +22,8 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop('password_confirm')
         user = User.objects.create_user(**validated_data)
+        if user.push_token:
+            DeviceToken.register(user, user.push_token)
         return user
 
 
@@ -27,6 +31,7 @@ class UserLoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
     push_token = serializers.CharField(required=False, allow_blank=True)
+    platform = serializers.ChoiceField(choices=DeviceToken.PLATFORM_CHOICES, required=False, default='unknown')
 
     def validate(self, attrs):
         username = attrs.get('username')
@@ -52,6 +57,30 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
 
 class PushTokenUpdateSerializer(serializers.ModelSerializer):
+    platform = serializers.ChoiceField(
+        choices=DeviceToken.PLATFORM_CHOICES, required=False, default='unknown', write_only=True
+    )
+
     class Meta:
         model = User
-        fields = ('push_token',)
+        fields = ('push_token', 'platform')
+
+    def update(self, instance, validated_data):
+        platform = validated_data.pop('platform', 'unknown')
+        instance = super().update(instance, validated_data)
+        if instance.push_token:
+            DeviceToken.register(instance, instance.push_token, platform)
+        return instance
+
+
+class FamilyTokenRefreshSerializer(TokenRefreshSerializer):
+    """Rotates refresh tokens within their family, rejecting replayed ones"""
+    token_class = FamilyRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        refresh.rotate()
+        return {
+            'access': str(refresh.access_token),
+            'refresh': str(refresh),
+        }
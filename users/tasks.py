@@ -0,0 +1,9 @@
+from celery import shared_task
+from .progression import ProgressionService
+
+
+@shared_task
+def flush_progression():
+    """Periodic task to write buffered XP gains, including any left by a failed flush"""
+    updated = ProgressionService.flush()
+    return f"Flushed XP for {updated} users"
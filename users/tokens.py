@@ -0,0 +1,64 @@
+"""
+Refresh token rotation with token families.
+
+Every login starts a family: a random id carried in the refresh token's `fam` claim, with
+the family's current generation kept in the cache. A refresh bumps the generation and
+issues a token carrying the new one. Presenting an older generation means a refresh token
+was replayed, so the whole family is revoked and its holder has to log in again.
+"""
+import secrets
+
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+FAMILY_KEY = 'auth:family:{family}'
+
+
+def get_family_timeout():
+    return int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+
+
+class FamilyRefreshToken(RefreshToken):
+    """A refresh token that belongs to a rotation family"""
+    no_copy_claims = RefreshToken.no_copy_claims + ('fam', 'gen')
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.start_family()
+        return token
+
+    def start_family(self):
+        self['fam'] = secrets.token_hex(8)
+        self['gen'] = 0
+        cache.set(FAMILY_KEY.format(family=self['fam']), 0, get_family_timeout())
+
+    def rotate(self):
+        """Advance the family to the next generation, or revoke it if this token was replayed"""
+        if 'fam' not in self:
+            # Issued before token families existed
+            self.start_family()
+        else:
+            key = FAMILY_KEY.format(family=self['fam'])
+            try:
+                generation = cache.incr(key)
+            except ValueError:
+                raise InvalidToken(_("Token family has expired or been revoked"))
+
+            if generation != self['gen'] + 1:
+                cache.delete(key)
+                raise InvalidToken(_("Refresh token has already been used"))
+
+            cache.touch(key, get_family_timeout())
+            self['gen'] = generation
+
+        self.set_jti()
+        self.set_exp()
+        self.set_iat()
+
+    @staticmethod
+    def revoke(family):
+        cache.delete(FAMILY_KEY.format(family=family))
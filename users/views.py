@@ -2,9 +2,9 @@ from rest_framework import status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import login
-from .models import User
+from .models import DeviceToken, User
+from .tokens import FamilyRefreshToken
 from .serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
@@ -20,7 +20,7 @@ class RegisterView(APIView):
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            refresh = FamilyRefreshToken.for_user(user)
             return Response({
                 'user': UserProfileSerializer(user).data,
                 'tokens': {
@@ -39,13 +39,15 @@ class LoginView(APIView):
         if serializer.is_valid():
             user = serializer.validated_data['user']
 
-            # Update push token if provided
+            # Update push token if provided, skipping the write when it hasn't changed
             push_token = serializer.validated_data.get('push_token')
             if push_token:
-                user.push_token = push_token
-                user.save(update_fields=['push_token'])
+                if push_token != user.push_token:
+                    user.push_token = push_token
+                    user.save(update_fields=['push_token'])
+                DeviceToken.register(user, push_token, serializer.validated_data['platform'])
 
-            refresh = RefreshToken.for_user(user)
+            refresh = FamilyRefreshToken.for_user(user)
             return Response({
                 'user': UserProfileSerializer(user).data,
                 'tokens': {
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class UtilsConfig(AppConfig):
+    name = 'utils'
+
+    def ready(self):
+        # Connect the query recorder to connection_created before any connection opens
+        from . import queries  # noqa: F401
@@ -0,0 +1,60 @@
+"""
+Helpers for the async read endpoints under /api/v1/async/.
+
+DRF views are sync only, so these are plain Django coroutine views. async_api_view
+authenticates the JWT the same way CachedJWTAuthentication does for DRF views and
+answers with DRF's error format, so clients can switch between the two paths freely.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return JsonResponse(data, status=status_code, encoder=JSONEncoder, safe=False)
+
+
+async def authenticate(request):
+    """Return the user for the request's access token, or None without one"""
+    from users.authentication import CachedJWTAuthentication
+
+    authentication = CachedJWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        return None
+    raw_token = authentication.get_raw_token(header)
+    if raw_token is None:
+        return None
+    validated_token = authentication.get_validated_token(raw_token)
+    return await sync_to_async(authentication.get_user)(validated_token)
+
+
+def async_api_view(require_auth=True, read_replica=False):
+    """Turn a coroutine into a GET-only JSON view, authenticating request.user first"""
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return json_response(
+                    {'detail': f'Method "{request.method}" not allowed.'},
+                    status_code=status.HTTP_405_METHOD_NOT_ALLOWED
+                )
+            if require_auth:
+                try:
+                    user = await authenticate(request)
+                except APIException as e:
+                    return json_response(e.detail, status_code=e.status_code)
+                if user is None:
+                    return json_response(
+                        {'detail': 'Authentication credentials were not provided.'},
+                        status_code=status.HTTP_401_UNAUTHORIZED
+                    )
+                request.user = user
+            return await view(request, *args, **kwargs)
+        wrapper.read_replica = read_replica
+        return wrapper
+    return decorator
@@ -0,0 +1,117 @@
+"""
+Prometheus metrics.
+
+Game hot paths are wrapped with @timed(operation), which observes their duration in the
+game_operation_seconds histogram and counts the exceptions they raise; Celery tasks are
+timed through task signals, and the query instrumentation middleware records SQL per
+endpoint. Everything is served in the text format by metrics_view at /metrics.
+
+gunicorn workers and Celery pool processes each keep their own samples. Point
+PROMETHEUS_MULTIPROC_DIR at a directory shared by all of them (and emptied when the
+deployment starts) and /metrics adds up every process's samples.
+"""
+import functools
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess, values
+)
+
+MULTIPROCESS = 'PROMETHEUS_MULTIPROC_DIR' in os.environ
+
+if MULTIPROCESS:
+    # Containers can share the directory, and their pids alone would collide
+    _host = socket.gethostname().replace('_', '-')
+    values.ValueClass = values.MultiProcessValue(lambda: f'{_host}-{os.getpid()}')
+
+OPERATION_SECONDS = Histogram(
+    'game_operation_seconds', 'Duration of game hot paths', ['operation'],
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+)
+OPERATION_ERRORS = Counter('game_operation_errors', 'Exceptions raised by game hot paths', ['operation'])
+
+TASK_SECONDS = Histogram(
+    'celery_task_seconds', 'Duration of Celery tasks', ['task'],
+    buckets=(.005, .01, .05, .1, .5, 1, 5, 10, 30, 60, 300, 900)
+)
+TASKS = Counter('celery_tasks', 'Finished Celery tasks by final state', ['task', 'state'])
+
+NOTIFICATIONS = Counter('notification_events', 'Notification pipeline events', ['event'])
+
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL queries run per request', ['endpoint'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+)
+REQUEST_DB_SECONDS = Histogram('http_request_db_seconds', 'Time spent in SQL per request', ['endpoint'])
+REQUEST_DUPLICATE_QUERIES = Counter(
+    'http_request_duplicate_queries', 'Queries repeating an earlier statement of the same request', ['endpoint']
+)
+
+
+def timed(operation):
+    """Observe a function's duration and count its exceptions under an operation label"""
+    # Bind the label children once, so a call only pays for the clock and two updates
+    duration = OPERATION_SECONDS.labels(operation)
+    errors = OPERATION_ERRORS.labels(operation)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                duration.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def observe_request(endpoint, recorder):
+    """Record a request's SQL, as measured by a utils.queries.QueryRecorder"""
+    REQUEST_QUERIES.labels(endpoint).observe(recorder.count)
+    REQUEST_DB_SECONDS.labels(endpoint).observe(recorder.duration)
+    if recorder.duplicate_count:
+        REQUEST_DUPLICATE_QUERIES.labels(endpoint).inc(recorder.duplicate_count)
+
+
+_task_started = {}
+
+
+def task_started(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+def task_finished(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        TASK_SECONDS.labels(task.name).observe(time.perf_counter() - started)
+    TASKS.labels(task.name, state or 'UNKNOWN').inc()
+
+
+def connect_celery_signals():
+    """Time every task run by this worker"""
+    from celery import signals
+
+    signals.task_prerun.connect(task_started, weak=False)
+    signals.task_postrun.connect(task_finished, weak=False)
+
+
+def metrics_view(request):
+    """Serve every metric in the Prometheus text format"""
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
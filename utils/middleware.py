@@ -0,0 +1,69 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from . import metrics
+from .queries import QueryBudgetExceeded, QueryRecorder
+
+logger = logging.getLogger('utils.queries')
+
+
+class QueryInstrumentationMiddleware:
+    """Records the SQL queries each request runs
+
+    With QUERY_COUNT_HEADER on (the default in DEBUG) the count, total DB time and number
+    of repeated queries are returned as X-DB-* response headers. Otherwise each request
+    is logged as a DEBUG metric line on the utils.queries logger; either way it is exported
+    to Prometheus per route. Views can declare a query_budget attribute; exceeding it logs a
+    warning, or raises when QUERY_BUDGET_ENFORCE is on, as it is in the test suite.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        return self.finish(request, response, recorder)
+
+    async def __acall__(self, request):
+        with QueryRecorder() as recorder:
+            response = await self.get_response(request)
+        return self.finish(request, response, recorder)
+
+    def finish(self, request, response, recorder):
+        match = getattr(request, 'resolver_match', None)
+        endpoint = match.route if match else request.path
+        budget = getattr(request, 'query_budget', None)
+        # Unmatched paths are unbounded, so they share one label
+        metrics.observe_request(match.route if match else '<unmatched>', recorder)
+
+        if budget is not None and recorder.count > budget:
+            message = f"{request.method} {endpoint} exceeded its query budget of {budget}: {recorder.describe()}"
+            if settings.QUERY_BUDGET_ENFORCE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        if settings.QUERY_COUNT_HEADER:
+            response['X-DB-Query-Count'] = str(recorder.count)
+            response['X-DB-Time-Ms'] = f"{recorder.duration * 1000:.1f}"
+            response['X-DB-Duplicate-Queries'] = str(recorder.duplicate_count)
+        else:
+            logger.debug(
+                "endpoint=%s method=%s status=%s queries=%d db_ms=%.1f duplicates=%d",
+                endpoint, request.method, response.status_code,
+                recorder.count, recorder.duration * 1000, recorder.duplicate_count
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # DRF views expose their class on the function returned by as_view()
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        request.query_budget = getattr(view_class, 'query_budget', getattr(view_func, 'query_budget', None))
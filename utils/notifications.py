@@ -1,46 +1,333 @@
-import firebase_admin
-from firebase_admin import credentials, messaging
+import threading
 from django.conf import settings
+from django.utils.module_loading import import_string
 from celery import shared_task
 import logging
+from .metrics import NOTIFICATIONS, timed
 
 logger = logging.getLogger(__name__)
 
-# Initialize Firebase Admin SDK
-if settings.FIREBASE_CREDENTIALS_PATH and not firebase_admin._apps:
-    try:
-        cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_PATH)
-        firebase_admin.initialize_app(cred)
-    except Exception as e:
-        logger.error(f"Failed to initialize Firebase: {e}")
+# FCM accepts at most 500 messages per send_each call
+FCM_BATCH_SIZE = 500
+
+# Send errors that mean the token will never work again
+INVALID_TOKEN_ERRORS = {'UNREGISTERED', 'INVALID_ARGUMENT', 'SENDER_ID_MISMATCH'}
+
+# Given to every message of a send_each call that raised (outage, credentials, network);
+# it says nothing about the tokens, so they are left alone and the send is retried
+BATCH_FAILED = 'BATCH_FAILED'
+
+
+class FCMTransport:
+    """Sends push messages through Firebase Cloud Messaging
+
+    firebase_admin is imported and the app initialized on the first send, so processes
+    that never push don't pay for loading the SDK and credentials.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.app = None
+
+    def get_app(self):
+        """Initialize the Firebase app once per process"""
+        if self.app is None:
+            with self._lock:
+                if self.app is None:
+                    import firebase_admin
+                    from firebase_admin import credentials
+
+                    if firebase_admin._apps:
+                        self.app = firebase_admin.get_app()
+                    else:
+                        cred = None
+                        if settings.FIREBASE_CREDENTIALS_PATH:
+                            cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_PATH)
+                        self.app = firebase_admin.initialize_app(cred)
+        return self.app
+
+    @staticmethod
+    def error_code(error):
+        """Map an FCM exception onto an error code"""
+        from firebase_admin import exceptions, messaging
+
+        if isinstance(error, messaging.UnregisteredError):
+            return 'UNREGISTERED'
+        if isinstance(error, messaging.SenderIdMismatchError):
+            return 'SENDER_ID_MISMATCH'
+        if isinstance(error, exceptions.InvalidArgumentError):
+            return 'INVALID_ARGUMENT'
+        return getattr(error, 'code', None) or str(error)
+
+    def send_each(self, messages):
+        """Send a batch of messages, returning None or an error code for each one"""
+        from firebase_admin import messaging
+
+        response = messaging.send_each([
+            messaging.Message(
+                notification=messaging.Notification(
+                    title=message['title'],
+                    body=message['body'],
+                ),
+                data=message['data'],
+                token=message['token'],
+            )
+            for message in messages
+        ], app=self.get_app())
+        return [
+            None if result.success else self.error_code(result.exception)
+            for result in response.responses
+        ]
+
+
+class LoggingTransport:
+    """Logs push messages instead of sending them, for local development"""
+
+    def send_each(self, messages):
+        for message in messages:
+            logger.info(f"Push to {message['token'][:12]}...: {message['title']} - {message['body']}")
+        return [None] * len(messages)
+
+
+class InMemoryTransport:
+    """Records push messages instead of sending them, for tests and benchmarks"""
+
+    def __init__(self, latency=0, errors=None):
+        self.latency = latency  # Simulated round trip per call, in seconds
+        self.errors = errors or {}  # Error code to return per token
+        self.sent = []
+        self.calls = 0
+
+    def send_each(self, messages):
+        if self.latency:
+            import time
+            time.sleep(self.latency)
+        self.calls += 1
+        results = []
+        for message in messages:
+            error = self.errors.get(message['token'])
+            if error is None:
+                self.sent.append(message)
+            results.append(error)
+        return results
+
+
+_transport = None
+
+
+def get_transport():
+    """Return the push transport, building the one named by PUSH_TRANSPORT on first use"""
+    global _transport
+    if _transport is None:
+        _transport = import_string(settings.PUSH_TRANSPORT)()
+    return _transport
+
+
+def set_transport(transport):
+    """Swap the push transport, returning the previous one"""
+    global _transport
+    previous, _transport = _transport, transport
+    return previous
 
 
 class NotificationService:
     """Service for sending push notifications"""
 
     @staticmethod
+    @timed('push_send')
     def send_push_notification(user_token, title, body, data=None):
         """Send a push notification to a specific user"""
         if not user_token:
             return False
 
-        try:
-            message = messaging.Message(
-                notification=messaging.Notification(
-                    title=title,
-                    body=body,
-                ),
-                data=data or {},
-                token=user_token,
-            )
+        return NotificationService.send_messages([{
+            'token': user_token,
+            'title': title,
+            'body': body,
+            'data': data or {},
+        }]) == 1
+
+    @staticmethod
+    def send_messages(messages):
+        """Send messages in batches of up to 500, returning how many were delivered"""
+        return sum(1 for error in NotificationService.deliver_messages(messages) if error is None)
 
-            response = messaging.send(message)
-            logger.info(f"Successfully sent message: {response}")
-            return True
+    @staticmethod
+    @timed('push_delivery')
+    def deliver_messages(messages):
+        """Send messages in batches of up to 500, returning None or an error code for each one"""
+        results = []
+        transport = get_transport()
 
-        except Exception as e:
-            logger.error(f"Failed to send push notification: {e}")
-            return False
+        for start in range(0, len(messages), FCM_BATCH_SIZE):
+            batch = messages[start:start + FCM_BATCH_SIZE]
+            try:
+                errors = transport.send_each(batch)
+            except Exception as e:
+                logger.error(f"Failed to send push notification batch: {e}")
+                errors = [BATCH_FAILED] * len(batch)
+
+            for error in errors:
+                if error is not None and error != BATCH_FAILED:
+                    logger.error(f"Failed to send push notification: {error}")
+            results.extend(errors)
+
+        delivered = sum(1 for error in results if error is None)
+        NOTIFICATIONS.labels('push_delivered').inc(delivered)
+        NOTIFICATIONS.labels('push_failed').inc(len(results) - delivered)
+        logger.info(f"Sent {delivered}/{len(messages)} push notifications")
+        return results
+
+    @staticmethod
+    def send_batch(notifications):
+        """Resolve device tokens for pending notifications in one query and send them"""
+        return sum(1 for result in NotificationService.deliver_batch(notifications) if result)
+
+    @staticmethod
+    def deliver_batch(notifications):
+        """Fan notifications out to every registered device of their recipients
+
+        Returns True per notification if any device received it, False if sending failed
+        and is worth retrying, or None if the recipient has no usable device. Tokens FCM
+        reports as unregistered or invalid are deleted from the registry; only errors FCM
+        reports for a message count towards a token's failures, not a whole failed send.
+        """
+        from django.db.models import F
+        from users.models import DeviceToken
+
+        user_ids = {notification['user_id'] for notification in notifications}
+        tokens_by_user = {}
+        recovering = set()
+        devices = DeviceToken.objects.filter(user_id__in=user_ids).values_list('user_id', 'token', 'failure_count')
+        for user_id, token, failure_count in devices:
+            tokens_by_user.setdefault(user_id, []).append(token)
+            if failure_count:
+                recovering.add(token)
+
+        messages = []
+        owners = []
+        for position, notification in enumerate(notifications):
+            for token in tokens_by_user.get(notification['user_id'], []):
+                owners.append(position)
+                messages.append({
+                    'token': token,
+                    'title': notification['title'],
+                    'body': notification['body'],
+                    'data': notification['data'],
+                })
+
+        results = [None] * len(notifications)
+        recovered, invalid, failing = [], [], []
+        errors = NotificationService.deliver_messages(messages)
+        for position, message, error in zip(owners, messages, errors):
+            if error is None:
+                results[position] = True
+                if message['token'] in recovering:
+                    recovered.append(message['token'])
+            elif error in INVALID_TOKEN_ERRORS:
+                invalid.append(message['token'])
+            else:
+                if error != BATCH_FAILED:
+                    failing.append(message['token'])
+                if results[position] is None:
+                    results[position] = False
+
+        if invalid:
+            DeviceToken.objects.filter(token__in=invalid).delete()
+            logger.info(f"Pruned {len(invalid)} invalid push tokens")
+        if failing:
+            DeviceToken.objects.filter(token__in=failing).update(failure_count=F('failure_count') + 1)
+            DeviceToken.objects.filter(
+                token__in=failing,
+                failure_count__gte=settings.DEVICE_TOKEN_MAX_FAILURES
+            ).delete()
+        if recovered:
+            DeviceToken.objects.filter(token__in=recovered).update(failure_count=0)
+
+        return results
+
+    @staticmethod
+    def build_zone_attack_notification(defender_id, zone_id, attacker_username):
+        """Build the notification sent when a user's zone is attacked"""
+        return {
+            'user_id': defender_id,
+            'title': "Zone Under Attack!",
+            'body': f"{attacker_username} is attacking your zone {zone_id}",
+            'data': {
+                'type': 'zone_attack',
+                'zone_id': zone_id,
+                'attacker': attacker_username
+            }
+        }
+
+    @staticmethod
+    def build_zone_lost_notification(defender_id, zone_id, attacker_username):
+        """Build the notification sent when a user loses a zone"""
+        return {
+            'user_id': defender_id,
+            'title': "Zone Lost!",
+            'body': f"Your zone {zone_id} was captured by {attacker_username}",
+            'data': {
+                'type': 'zone_lost',
+                'zone_id': zone_id,
+                'attacker': attacker_username
+            }
+        }
+
+    @staticmethod
+    def build_zone_defended_notification(defender_id, zone_id, attacker_username):
+        """Build the notification sent when a user successfully defends a zone"""
+        return {
+            'user_id': defender_id,
+            'title': "Zone Defended!",
+            'body': f"You successfully defended zone {zone_id} from {attacker_username}",
+            'data': {
+                'type': 'zone_defended',
+                'zone_id': zone_id,
+                'attacker': attacker_username
+            }
+        }
+
+    @staticmethod
+    def build_digest_notification(user_id, notifications):
+        """Summarize several notifications for one user, e.g. '3 zones attacked by X, Y'"""
+        def unique(values):
+            return list(dict.fromkeys(value for value in values if value))
+
+        def names(values):
+            shown = ', '.join(values[:3])
+            return f"{shown} and {len(values) - 3} others" if len(values) > 3 else shown
+
+        by_type = {}
+        for notification in notifications:
+            by_type.setdefault(notification['data'].get('type'), []).append(notification['data'])
+
+        parts = []
+        if 'zone_attack' in by_type:
+            zones = unique(data.get('zone_id') for data in by_type['zone_attack'])
+            attackers = unique(data.get('attacker') for data in by_type['zone_attack'])
+            parts.append(f"{len(zones)} zone{'s' if len(zones) != 1 else ''} attacked by {names(attackers)}")
+        if 'zone_lost' in by_type:
+            parts.append(f"{len(by_type['zone_lost'])} lost")
+        if 'zone_defended' in by_type:
+            parts.append(f"{len(by_type['zone_defended'])} defended")
+        others = sum(len(items) for kind, items in by_type.items() if kind not in ('zone_attack', 'zone_lost', 'zone_defended'))
+        if others:
+            parts.append(f"{others} other update{'s' if others != 1 else ''}")
+
+        all_data = [notification['data'] for notification in notifications]
+        return {
+            'user_id': user_id,
+            'title': "Your Zones Are Under Attack!" if 'zone_attack' in by_type else "Zone Updates",
+            'body': '; '.join(parts),
+            'data': {
+                'type': 'zone_digest',
+                'count': str(len(notifications)),
+                'zone_ids': ','.join(unique(data.get('zone_id') for data in all_data)),
+                'attackers': ','.join(unique(data.get('attacker') for data in all_data)),
+            }
+        }
 
     @staticmethod
     def send_zone_attack_notification(defender, zone_id, attacker_username):
@@ -48,16 +335,9 @@ class NotificationService:
         if not defender.push_token:
             return False
 
-        title = "Zone Under Attack!"
-        body = f"{attacker_username} is attacking your zone {zone_id}"
-        data = {
-            'type': 'zone_attack',
-            'zone_id': zone_id,
-            'attacker': attacker_username
-        }
-
+        notification = NotificationService.build_zone_attack_notification(defender.id, zone_id, attacker_username)
         return NotificationService.send_push_notification(
-            defender.push_token, title, body, data
+            defender.push_token, notification['title'], notification['body'], notification['data']
         )
 
     @staticmethod
@@ -66,16 +346,9 @@ class NotificationService:
         if not defender.push_token:
             return False
 
-        title = "Zone Lost!"
-        body = f"Your zone {zone_id} was captured by {attacker_username}"
-        data = {
-            'type': 'zone_lost',
-            'zone_id': zone_id,
-            'attacker': attacker_username
-        }
-
+        notification = NotificationService.build_zone_lost_notification(defender.id, zone_id, attacker_username)
         return NotificationService.send_push_notification(
-            defender.push_token, title, body, data
+            defender.push_token, notification['title'], notification['body'], notification['data']
         )
 
     @staticmethod
@@ -84,20 +357,36 @@ class NotificationService:
         if not defender.push_token:
             return False
 
-        title = "Zone Defended!"
-        body = f"You successfully defended zone {zone_id} from {attacker_username}"
-        data = {
-            'type': 'zone_defended',
-            'zone_id': zone_id,
-            'attacker': attacker_username
-        }
-
+        notification = NotificationService.build_zone_defended_notification(defender.id, zone_id, attacker_username)
         return NotificationService.send_push_notification(
-            defender.push_token, title, body, data
+            defender.push_token, notification['title'], notification['body'], notification['data']
         )
 
 
+class NotificationBatch:
+    """Collects the pushes produced by one operation and writes them to the outbox together"""
+
+    def __init__(self):
+        self.pending = []
+
+    def add(self, notification):
+        self.pending.append(notification)
+
+    def flush(self):
+        """Write pending notifications to the outbox inside the caller's transaction"""
+        from notifications.services import OutboxService
+        if self.pending:
+            OutboxService.enqueue(self.pending)
+        self.pending = []
+
+
 # Celery tasks for async notifications
+@shared_task
+def send_notification_batch_task(notifications):
+    """Async task to send a batch of notifications"""
+    return NotificationService.send_batch(notifications)
+
+
 @shared_task
 def send_zone_attack_notification_task(defender_id, zone_id, attacker_username):
     """Async task to send zone attack notification"""
@@ -0,0 +1,171 @@
+"""
+On-demand cProfile sampling for requests and Celery tasks.
+
+A request is profiled when it is sampled (PROFILING_VIEW_RATES by URL name, falling back
+to PROFILING_SAMPLE_RATE) or when a staff user sends an X-Profile header; tasks are
+sampled by PROFILING_TASK_RATES and PROFILING_TASK_SAMPLE_RATE. Each profile is reduced
+to a call report, its functions sorted by cumulative time with the calls they made, and
+stored in a ring buffer of PROFILING_BUFFER_SIZE slots in the shared cache, so the
+latest profiles from every process can be read from the admin endpoint.
+"""
+import cProfile
+import io
+import pstats
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+CURSOR_KEY = 'profiling:cursor'
+SLOT_KEY = 'profiling:slot:{slot}'
+HEADER = 'X-Profile'
+
+
+def start():
+    """Start a profiler, or return None if another one is already running in this thread"""
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None
+    return profiler
+
+
+def report(profiler):
+    """Render the heaviest functions by cumulative time, with the calls each one made"""
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream).sort_stats('cumulative')
+    stats.print_stats(settings.PROFILING_REPORT_LINES)
+    stats.print_callees(settings.PROFILING_REPORT_LINES)
+    return stream.getvalue()
+
+
+def store(profiler, kind, name, duration, trigger, **details):
+    """Add a profile to the ring buffer, overwriting the oldest once it is full"""
+    cache.add(CURSOR_KEY, 0, None)
+    try:
+        sequence = cache.incr(CURSOR_KEY)
+    except ValueError:  # Evicted between add and incr
+        cache.set(CURSOR_KEY, 1, None)
+        sequence = 1
+
+    entry = {
+        'id': sequence,
+        'kind': kind,
+        'name': name,
+        'trigger': trigger,
+        'duration_ms': round(duration * 1000, 1),
+        'timestamp': timezone.now().isoformat(),
+        'report': report(profiler),
+        **details,
+    }
+    cache.set(SLOT_KEY.format(slot=sequence % settings.PROFILING_BUFFER_SIZE), entry, None)
+    return entry
+
+
+def get_profiles():
+    """Profiles in the ring buffer, newest first"""
+    keys = [SLOT_KEY.format(slot=slot) for slot in range(settings.PROFILING_BUFFER_SIZE)]
+    return sorted(cache.get_many(keys).values(), key=lambda entry: -entry['id'])
+
+
+def get_profile(profile_id):
+    entry = cache.get(SLOT_KEY.format(slot=profile_id % settings.PROFILING_BUFFER_SIZE))
+    if entry and entry['id'] == profile_id:
+        return entry
+    return None
+
+
+def is_staff_request(request):
+    """Whether the request comes from a staff user, authenticating its JWT if needed"""
+    from rest_framework.exceptions import APIException
+    from users.authentication import CachedJWTAuthentication
+
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            result = CachedJWTAuthentication().authenticate(request)
+        except APIException:
+            return False
+        user = result[0] if result else None
+    return bool(user and user.is_staff)
+
+
+class ProfilingMiddleware:
+    """Profiles sampled requests and staff requests carrying an X-Profile header
+
+    Must come last in MIDDLEWARE so the profile covers the view and rendering only.
+    Under ASGI it passes requests through: cProfile follows a thread, and the event loop
+    thread interleaves every in-flight request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.get_response(request)
+
+        response = self.get_response(request)
+
+        profiling = getattr(request, '_profiling', None)
+        if profiling is not None:
+            profiler, trigger, started = profiling
+            profiler.disable()
+            entry = store(
+                profiler, 'request', request.resolver_match.view_name, time.perf_counter() - started, trigger,
+                method=request.method, path=request.path, status=response.status_code
+            )
+            response['X-Profile-Id'] = str(entry['id'])
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.is_async:
+            return None
+        if HEADER in request.headers and is_staff_request(request):
+            trigger = 'header'
+        else:
+            rate = settings.PROFILING_VIEW_RATES.get(request.resolver_match.url_name, settings.PROFILING_SAMPLE_RATE)
+            if not rate or random.random() >= rate:
+                return None
+            trigger = 'sampled'
+
+        profiler = start()
+        if profiler is not None:
+            request._profiling = (profiler, trigger, time.perf_counter())
+        return None
+
+
+_task_profiles = {}
+
+
+def task_started(task_id=None, task=None, **kwargs):
+    rate = settings.PROFILING_TASK_RATES.get(task.name, settings.PROFILING_TASK_SAMPLE_RATE)
+    if rate and random.random() < rate:
+        profiler = start()
+        if profiler is not None:
+            _task_profiles[task_id] = (profiler, time.perf_counter())
+
+
+def task_finished(task_id=None, task=None, state=None, **kwargs):
+    profiling = _task_profiles.pop(task_id, None)
+    if profiling is not None:
+        profiler, started = profiling
+        profiler.disable()
+        store(profiler, 'task', task.name, time.perf_counter() - started, 'sampled', state=state)
+
+
+def connect_celery_signals():
+    """Profile a sample of the tasks run by this worker"""
+    from celery import signals
+
+    signals.task_prerun.connect(task_started, weak=False)
+    signals.task_postrun.connect(task_finished, weak=False)
@@ -0,0 +1,121 @@
+"""
+SQL query instrumentation.
+
+QueryRecorder counts the queries run on every database connection, their total time and
+how often each statement shape (its fingerprint) repeated; a shape repeating is what an
+N+1 looks like. The middleware records every request with it, and query_budget() lets a
+test fail when a block of code runs more queries than it is allowed.
+"""
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LISTS = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+
+
+def fingerprint(sql):
+    """Reduce a statement to its shape, so the same query with other values matches"""
+    sql = _LITERALS.sub('?', sql)
+    sql = _PLACEHOLDER_LISTS.sub('(?)', sql.replace('%s', '?'))
+    return ' '.join(sql.split())
+
+
+_recorders = ContextVar('query_recorders', default=())
+
+
+def _record(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection, feeding the active recorders"""
+    recorders = _recorders.get()
+    if not recorders:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        shape = fingerprint(sql)
+        for recorder in recorders:
+            recorder.add(sql, shape, duration)
+
+
+def install(connection, **kwargs):
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+# Connections are per thread, and under ASGI the ORM runs in other threads than the
+# middleware, so the wrapper stays on every connection and the recorders follow the
+# request through a context variable (which sync_to_async carries into its threads)
+connection_created.connect(install)
+
+
+class QueryRecorder:
+    """Records the queries run on all database connections, in any thread, while active"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = []
+        self.fingerprints = Counter()
+        self._token = None
+
+    def add(self, sql, shape, duration):
+        self.duration += duration
+        self.count += 1
+        self.statements.append(sql)
+        self.fingerprints[shape] += 1
+
+    def __enter__(self):
+        # Connections opened before this module was imported never sent connection_created
+        for connection in connections.all():
+            install(connection)
+        self._token = _recorders.set(_recorders.get() + (self,))
+        return self
+
+    def __exit__(self, *exc_info):
+        _recorders.reset(self._token)
+
+    @property
+    def duplicates(self):
+        """Statement shapes that ran more than once, with their counts"""
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+    @property
+    def duplicate_count(self):
+        """Queries beyond the first of each shape"""
+        return sum(count - 1 for count in self.fingerprints.values())
+
+    def describe(self):
+        lines = [f"{self.count} queries in {self.duration * 1000:.1f}ms"]
+        for sql, count in sorted(self.duplicates.items(), key=lambda item: -item[1]):
+            lines.append(f"  {count}x {sql[:200]}")
+        return '\n'.join(lines)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries, max_duplicates=None):
+    """Fail when the block runs more than max_queries queries (or repeated shapes)
+
+        with query_budget(3):
+            client.get('/api/v1/leaderboard/')
+    """
+    with QueryRecorder() as recorder:
+        yield recorder
+
+    if recorder.count > max_queries:
+        raise QueryBudgetExceeded(f"Query budget of {max_queries} exceeded: {recorder.describe()}")
+    if max_duplicates is not None and recorder.duplicate_count > max_duplicates:
+        raise QueryBudgetExceeded(
+            f"Allowed {max_duplicates} repeated queries, got {recorder.duplicate_count}: {recorder.describe()}"
+        )
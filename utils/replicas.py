@@ -0,0 +1,264 @@
+"""
+Read replica routing.
+
+Everything runs against the primary unless a read is in a replica scope: safe requests to
+views declaring read_replica = True, the Celery tasks in REPLICA_TASKS, and replica_reads()
+blocks. Reads there are spread over the healthy REPLICA_DATABASES (configured from
+DATABASE_REPLICA_URLS), except that they stay on the primary
+
+- inside a transaction on the primary,
+- for models the scope has already written to through the ORM, and
+- for a user who sent a write request within the last REPLICA_STICKY_SECONDS,
+
+so nobody reads back an older copy of their own writes. Anything stored in the shared
+cache or written back from what was read must be built under primary_reads(), or a lagging
+copy outlives the lag. Each process checks a replica at
+most every REPLICA_HEALTH_CHECK_SECONDS; one that can't be reached or is replaying more
+than REPLICA_MAX_LAG_SECONDS behind is skipped until it passes again, and with no healthy
+replica reads go to the primary.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+STICKY_KEY = 'replicas:sticky:{user_id}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Seconds the replica's replay is behind the primary, 0 when it has replayed everything it received
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class Scope:
+    """Where the current request or task may read from, and the models it has written"""
+
+    def __init__(self, replica=False):
+        self.replica = replica
+        self.written = set()
+
+
+_scope = contextvars.ContextVar('replica_scope', default=None)
+
+
+@contextmanager
+def replica_reads():
+    """Allow the reads in this block to go to a replica"""
+    token = _scope.set(Scope(replica=True))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Keep the reads in this block on the primary, e.g. to build something that gets cached
+
+    Also works as a decorator.
+    """
+    token = _scope.set(Scope())
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def mark_written(user_id):
+    """Keep a user's replica scoped reads on the primary for REPLICA_STICKY_SECONDS"""
+    cache.set(STICKY_KEY.format(user_id=user_id), 1, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_sticky(user_id):
+    return cache.get(STICKY_KEY.format(user_id=user_id)) is not None
+
+
+def check(alias):
+    """Whether a replica answers and is within REPLICA_MAX_LAG_SECONDS of the primary"""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            lag = cursor.fetchone()[0]
+    except Exception as e:
+        logger.warning(f"Replica {alias} failed its health check: {e}")
+        connection.close()  # Reconnect on the next check
+        return False
+    if lag > settings.REPLICA_MAX_LAG_SECONDS:
+        logger.warning(f"Replica {alias} is {lag:.1f}s behind the primary")
+        return False
+    return True
+
+
+class ReplicaHealth:
+    """Each replica's last health check result in this process"""
+
+    def __init__(self):
+        self.results = {}  # alias -> (checked at, healthy)
+        self.lock = threading.Lock()
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self.lock:
+            checked_at, healthy = self.results.get(alias, (None, True))
+            due = checked_at is None or now - checked_at >= settings.REPLICA_HEALTH_CHECK_SECONDS
+            if due:
+                # Other threads keep the previous result while this one checks
+                self.results[alias] = (now, healthy)
+        if due:
+            healthy = check(alias)
+            self.mark(alias, healthy)
+        return healthy
+
+    def mark(self, alias, healthy):
+        with self.lock:
+            self.results[alias] = (time.monotonic(), healthy)
+
+
+health = ReplicaHealth()
+
+
+def choose_replica():
+    """A random healthy replica, or None to use the primary"""
+    healthy = [alias for alias in settings.REPLICA_DATABASES if health.is_healthy(alias)]
+    return random.choice(healthy) if healthy else None
+
+
+class ReplicaRouter:
+    """Sends replica scoped reads to a replica and everything else to the primary"""
+
+    def db_for_read(self, model, **hints):
+        scope = _scope.get()
+        if scope is None or not scope.replica or model in scope.written:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return choose_replica()
+
+    def db_for_write(self, model, **hints):
+        scope = _scope.get()
+        if scope is not None:
+            scope.written.add(model)
+        # Explicit, so instances read from a replica are still saved to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # Replicas hold the same rows as the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def request_user_id(request):
+    """The id of the request's user, read from its access token without a query"""
+    from rest_framework.exceptions import APIException
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.settings import api_settings
+
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.pk
+
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    try:
+        return authentication.get_validated_token(raw_token).get(api_settings.USER_ID_CLAIM)
+    except APIException:
+        return None
+
+
+class ReplicaMiddleware:
+    """Opens a replica scope for safe requests to read_replica views
+
+    Users are made sticky to the primary after any unsafe request, whose user DRF has
+    authenticated by the time the response comes back.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = _scope.set(Scope())
+        try:
+            response = self.get_response(request)
+        finally:
+            _scope.reset(token)
+        self.finish(request)
+        return response
+
+    async def __acall__(self, request):
+        token = _scope.set(Scope())
+        try:
+            response = await self.get_response(request)
+        finally:
+            _scope.reset(token)
+        if request.method not in SAFE_METHODS:
+            await sync_to_async(self.finish)(request)  # request.user may load the session
+        return response
+
+    def finish(self, request):
+        if request.method in SAFE_METHODS or not settings.REPLICA_DATABASES:
+            return
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            mark_written(user.pk)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in SAFE_METHODS or not settings.REPLICA_DATABASES:
+            return None
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        if not getattr(view_class, 'read_replica', getattr(view_func, 'read_replica', False)):
+            return None
+        user_id = request_user_id(request)
+        if user_id is not None and is_sticky(user_id):
+            return None
+        # The scope object is shared with __call__, even when this runs in another thread
+        scope = _scope.get()
+        if scope is not None:
+            scope.replica = True
+        return None
+
+
+_task_scopes = {}
+
+
+def task_started(task_id=None, task=None, **kwargs):
+    if task.name in settings.REPLICA_TASKS:
+        _task_scopes[task_id] = _scope.set(Scope(replica=True))
+
+
+def task_finished(task_id=None, task=None, **kwargs):
+    token = _task_scopes.pop(task_id, None)
+    if token is not None:
+        _scope.reset(token)
+
+
+def connect_celery_signals():
+    """Let the tasks in REPLICA_TASKS read from replicas"""
+    from celery import signals
+
+    signals.task_prerun.connect(task_started, weak=False)
+    signals.task_postrun.connect(task_finished, weak=False)
@@ -0,0 +1,27 @@
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from . import profiling
+
+
+class ProfileListView(APIView):
+    """List the profiles in the ring buffer, newest first (admin only)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        profiles = [
+            {key: value for key, value in entry.items() if key != 'report'}
+            for entry in profiling.get_profiles()
+        ]
+        return Response({'profiles': profiles, 'count': len(profiles)})
+
+
+class ProfileDetailView(APIView):
+    """Get one profile with its call report (admin only)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, profile_id):
+        entry = profiling.get_profile(profile_id)
+        if entry is None:
+            return Response({'error': 'Profile not found or overwritten'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(entry)
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.http import StreamingHttpResponse
+from utils.async_api import async_api_view, json_response
+from . import live
+from .serializers import ZoneSerializer
+from .services import ZoneService
+
+
+@async_api_view(require_auth=False, read_replica=True)
+async def nearby_zones(request):
+    """Get zones near user's location"""
+    try:
+        latitude = float(request.GET.get('latitude'))
+        longitude = float(request.GET.get('longitude'))
+        radius = int(request.GET.get('radius', 1000))
+    except (ValueError, TypeError):
+        return json_response({'error': 'Invalid latitude, longitude, or radius'}, status_code=400)
+
+    zones = [zone async for zone in ZoneService.get_nearby_zones(Point(longitude, latitude), radius)]
+    data = ZoneSerializer(zones, many=True).data
+
+    return json_response({
+        'zones': data,
+        'count': len(data)
+    })
+
+
+@async_api_view()
+async def live_zones(request):
+    """Stream claims, captures and expiries in the cells around the user as server-sent events"""
+    try:
+        latitude = float(request.GET.get('latitude'))
+        longitude = float(request.GET.get('longitude'))
+        ring = min(int(request.GET.get('ring', 1)), settings.LIVE_MAX_RING)
+    except (ValueError, TypeError):
+        return json_response({'error': 'Invalid latitude, longitude, or ring'}, status_code=400)
+
+    subscription = await live.get_broker().subscribe(live.cells_around(latitude, longitude, max(ring, 0)))
+    response = StreamingHttpResponse(live.stream(subscription), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
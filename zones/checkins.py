@@ -0,0 +1,154 @@
+"""
+Check-in ingestion.
+
+GPS jitter makes players check in to the same zone many times within seconds, so only
+the first check-in per (user, zone) in CHECKIN_DEDUP_SECONDS is recorded; the window is
+kept in the shared cache so it holds across processes. With CHECKIN_DURABILITY set to
+'sync' each recorded check-in is inserted by the request that made it. With 'buffered'
+they are queued in the process once the request's transaction commits and inserted
+together by bulk_create every CHECKIN_FLUSH_INTERVAL_MS, or as soon as CHECKIN_FLUSH_SIZE
+are waiting; check-ins still queued when a process is killed without warning are lost.
+A batch the database rejects is retried row by row and the rows that still fail are logged
+and dropped, while one that can't reach the database is kept for the next flush. At most
+CHECKIN_BUFFER_MAX check-ins wait in a process; newer ones are dropped until it drains.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, InterfaceError, OperationalError, close_old_connections, transaction
+from django.utils import timezone
+
+from .models import ZoneCheckIn
+
+logger = logging.getLogger(__name__)
+
+DEDUP_KEY = 'checkin:dedup:{user_id}:{zone_id}'
+
+# What record() did with a check-in
+RECORDED = 'recorded'
+DEDUPLICATED = 'deduplicated'  # Not stored, a recent one already was
+QUEUED = 'queued'  # Buffered; it has no id until the buffer is flushed
+
+
+def is_duplicate(user_id, zone_id):
+    """Whether the user already checked in to the zone within the dedup window"""
+    if not settings.CHECKIN_DEDUP_SECONDS:
+        return False
+    key = DEDUP_KEY.format(user_id=user_id, zone_id=zone_id)
+    return not cache.add(key, 1, settings.CHECKIN_DEDUP_SECONDS)
+
+
+class CheckInBuffer:
+    """Queues check-ins in this process; the first one added starts a flusher thread"""
+
+    def __init__(self):
+        self.pending = []
+        self.lock = threading.Lock()
+        self.full = threading.Event()
+        self.flusher = None
+        self.dropped = 0
+
+    def add(self, checkin):
+        with self.lock:
+            if len(self.pending) >= settings.CHECKIN_BUFFER_MAX:
+                self.dropped += 1
+                return
+            self.pending.append(checkin)
+            if len(self.pending) >= settings.CHECKIN_FLUSH_SIZE:
+                self.full.set()
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self.run, name='checkin-flusher', daemon=True)
+                self.flusher.start()
+                atexit.register(self.flush)
+
+    def take(self):
+        with self.lock:
+            checkins, self.pending = self.pending, []
+            dropped, self.dropped = self.dropped, 0
+            self.full.clear()
+        if dropped:
+            logger.warning(f"Dropped {dropped} check-ins while the buffer was full")
+        return checkins
+
+    def restore(self, checkins):
+        """Put back check-ins the database couldn't be reached for, ahead of newer ones"""
+        with self.lock:
+            pending = checkins + self.pending
+            self.pending = pending[:settings.CHECKIN_BUFFER_MAX]
+            self.dropped += len(pending) - len(self.pending)
+
+    def flush(self):
+        """Insert every queued check-in, returning how many were written"""
+        checkins = self.take()
+        if not checkins:
+            return 0
+        try:
+            with transaction.atomic():
+                ZoneCheckIn.objects.bulk_create(checkins, batch_size=settings.CHECKIN_FLUSH_SIZE)
+        except (OperationalError, InterfaceError):
+            self.restore(checkins)
+            raise
+        except DatabaseError:
+            return self.insert_each(checkins)
+        return len(checkins)
+
+    def insert_each(self, checkins):
+        """Insert a rejected batch one row at a time, dropping the rows that still fail"""
+        written = 0
+        for index, checkin in enumerate(checkins):
+            try:
+                with transaction.atomic():
+                    checkin.save(force_insert=True)
+            except (OperationalError, InterfaceError):
+                self.restore(checkins[index:])
+                raise
+            except DatabaseError as e:
+                logger.error(f"Dropped check-in of user {checkin.user_id} at zone {checkin.zone_id}: {e}")
+            else:
+                written += 1
+        return written
+
+    def run(self):
+        while True:
+            self.full.wait(settings.CHECKIN_FLUSH_INTERVAL_MS / 1000)
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush check-ins: {e}")
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Return this process's check-in buffer, or None when CHECKIN_DURABILITY is 'sync'"""
+    global _buffer
+    if settings.CHECKIN_DURABILITY == 'sync':
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = CheckInBuffer()
+    return _buffer
+
+
+def record(user, zone, location):
+    """Record a check-in unless it duplicates a recent one
+
+    Returns the (maybe unsaved) instance and whether it was RECORDED, DEDUPLICATED or QUEUED.
+    """
+    checkin = ZoneCheckIn(user=user, zone=zone, location=location, timestamp=timezone.now())
+    if is_duplicate(user.pk, zone.pk):
+        return checkin, DEDUPLICATED
+
+    buffer = get_buffer()
+    if buffer is None:
+        checkin.save()
+        return checkin, RECORDED
+    transaction.on_commit(lambda: buffer.add(checkin))
+    return checkin, QUEUED
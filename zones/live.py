@@ -0,0 +1,278 @@
+"""
+Live zone updates.
+
+The map is divided into square cells of LIVE_CELL_SIZE degrees. Claims, captures and
+expiries publish a small delta to the cell holding the zone once their transaction
+commits, and clients stream the deltas for the cells around them as server-sent events
+from /api/v1/async/zones/live/ instead of polling nearby.
+
+With LIVE_BACKEND = 'redis' deltas go through Redis pub/sub so every web process sees
+every change; each process holds a single subscription per cell in use and fans its
+messages out to its own clients. 'memory' keeps everything in the process, for tests
+and single-process development.
+"""
+import asyncio
+import json
+import logging
+import math
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Queued in place of deltas a slow client missed, telling it to refetch nearby
+RESYNC = {'event': 'resync'}
+
+
+def cell_for(latitude, longitude):
+    size = settings.LIVE_CELL_SIZE
+    return f'{math.floor(latitude / size)}:{math.floor(longitude / size)}'
+
+
+def cells_around(latitude, longitude, ring=1):
+    """The cell containing a location and the `ring` cells around it in every direction"""
+    size = settings.LIVE_CELL_SIZE
+    row, col = math.floor(latitude / size), math.floor(longitude / size)
+    return [
+        f'{row + dr}:{col + dc}'
+        for dr in range(-ring, ring + 1)
+        for dc in range(-ring, ring + 1)
+    ]
+
+
+def zone_delta(zone, event):
+    return {
+        'event': event,
+        'zone': zone.id,
+        'latitude': zone.location.y,
+        'longitude': zone.location.x,
+        'owner': zone.owner.username if zone.owner else None,
+        'expires_at': zone.expires_at.isoformat() if zone.expires_at else None,
+    }
+
+
+def publish_zone(zone, event):
+    """Publish a zone's new state to its cell once the current transaction commits"""
+    cell = cell_for(zone.location.y, zone.location.x)
+    delta = zone_delta(zone, event)
+
+    def _publish():
+        try:
+            get_broker().publish(cell, delta)
+        except Exception as e:
+            logger.error(f"Failed to publish zone update for {zone.id}: {e}")
+
+    transaction.on_commit(_publish)
+
+
+class Subscription:
+    """One client's queue of deltas for a set of cells, owned by its event loop"""
+
+    def __init__(self, cells, loop):
+        self.cells = cells
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=settings.LIVE_QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, delta):
+        """Queue a delta from any thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, delta)
+        except RuntimeError:
+            pass  # The client's loop has closed
+
+    def _put(self, delta):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(delta)
+        except asyncio.QueueFull:
+            # Drop the backlog; the client refetches rather than replaying stale deltas
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self):
+        delta = await self.queue.get()
+        if delta is RESYNC:
+            self.overflowed = False
+        return delta
+
+
+class Broker:
+    """Base for live update brokers; fans deltas out to this process's subscribers"""
+
+    def __init__(self):
+        self.subscribers = {}
+        self.lock = threading.Lock()
+        # Held across a change to the map and the (un)subscribe it needs, so an unsubscribe
+        # from a cell can't overtake the subscribe that a newer client is waiting on
+        self.subscribing = asyncio.Lock()
+
+    async def subscribe(self, cells):
+        subscription = Subscription(cells, asyncio.get_running_loop())
+        async with self.subscribing:
+            new_cells = []
+            with self.lock:
+                for cell in cells:
+                    subscribers = self.subscribers.setdefault(cell, set())
+                    if not subscribers:
+                        new_cells.append(cell)
+                    subscribers.add(subscription)
+            if new_cells:
+                await self.listen_to(new_cells)
+        return subscription
+
+    async def unsubscribe(self, subscription):
+        async with self.subscribing:
+            idle_cells = []
+            with self.lock:
+                for cell in subscription.cells:
+                    subscribers = self.subscribers.get(cell)
+                    if subscribers is None:
+                        continue
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.subscribers[cell]
+                        idle_cells.append(cell)
+            if idle_cells:
+                await self.stop_listening_to(idle_cells)
+
+    def deliver(self, cell, delta):
+        with self.lock:
+            subscribers = list(self.subscribers.get(cell, ()))
+        for subscription in subscribers:
+            subscription.put(delta)
+
+    def publish(self, cell, delta):
+        raise NotImplementedError
+
+    async def listen_to(self, cells):
+        pass
+
+    async def stop_listening_to(self, cells):
+        pass
+
+
+class MemoryBroker(Broker):
+    """Delivers deltas to subscribers in this process only"""
+
+    def publish(self, cell, delta):
+        self.deliver(cell, delta)
+
+
+class RedisBroker(Broker):
+    """Publishes deltas on a Redis channel per cell, shared by every process"""
+
+    CHANNEL = 'zones:live:{cell}'
+
+    def __init__(self, url):
+        import redis
+        super().__init__()
+        self.url = url
+        self.client = redis.Redis.from_url(url)
+        self.pubsub = None
+        self.listener = None
+
+    def publish(self, cell, delta):
+        self.client.publish(self.CHANNEL.format(cell=cell), json.dumps(delta))
+
+    async def listen_to(self, cells):
+        if self.pubsub is None:
+            import redis.asyncio
+            self.pubsub = redis.asyncio.Redis.from_url(self.url).pubsub()
+        await self.pubsub.subscribe(*(self.CHANNEL.format(cell=cell) for cell in cells))
+        if self.listener is None:
+            self.listener = asyncio.create_task(self.listen())
+
+    async def stop_listening_to(self, cells):
+        await self.pubsub.unsubscribe(*(self.CHANNEL.format(cell=cell) for cell in cells))
+
+    async def listen(self):
+        prefix = self.CHANNEL.format(cell='')
+        while True:
+            # Nothing may end this task: while self.listener is set no other one is started
+            try:
+                if self.pubsub.connection is None:  # Reconnected while no cell was in use
+                    await asyncio.sleep(1)
+                    continue
+                try:
+                    message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                except Exception as e:
+                    logger.error(f"Lost the live zone subscription, reconnecting: {e}")
+                    await asyncio.sleep(1)
+                    await self.reconnect()
+                    continue
+                if message:
+                    self.deliver(message['channel'].decode()[len(prefix):], json.loads(message['data']))
+            except Exception as e:
+                logger.error(f"Failed to deliver a live zone update: {e}")
+
+    async def reconnect(self):
+        """Resubscribe every cell in use; clients refetch whatever was missed meanwhile"""
+        import redis.asyncio
+        async with self.subscribing:
+            self.pubsub = redis.asyncio.Redis.from_url(self.url).pubsub()
+            with self.lock:
+                cells = list(self.subscribers)
+                subscriptions = {subscription for subscribers in self.subscribers.values() for subscription in subscribers}
+            try:
+                if cells:
+                    await self.pubsub.subscribe(*(self.CHANNEL.format(cell=cell) for cell in cells))
+            except Exception as e:
+                logger.error(f"Failed to resubscribe to live zone updates: {e}")
+                return
+        for subscription in subscriptions:
+            subscription.put(RESYNC)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                if settings.LIVE_BACKEND == 'redis':
+                    _broker = RedisBroker(settings.LIVE_REDIS_URL)
+                else:
+                    _broker = MemoryBroker()
+    return _broker
+
+
+def set_broker(broker):
+    """Replace the broker (for tests), returning the previous one"""
+    global _broker
+    previous, _broker = _broker, broker
+    return previous
+
+
+async def stream(subscription):
+    """Server-sent events for a subscription, ending after LIVE_STREAM_SECONDS
+
+    Streams are closed periodically so connections dropped without notice don't hold
+    their subscription forever; EventSource clients reconnect on their own.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.LIVE_STREAM_SECONDS
+    try:
+        yield f"retry: 1000\nevent: subscribed\ndata: {json.dumps({'cells': subscription.cells})}\n\n"
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                delta = await asyncio.wait_for(
+                    subscription.get(), min(remaining, settings.LIVE_KEEPALIVE_SECONDS)
+                )
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield f"event: {delta['event']}\ndata: {json.dumps(delta)}\n\n"
+    finally:
+        await get_broker().unsubscribe(subscription)
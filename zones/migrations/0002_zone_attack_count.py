@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zones", "0001_initial"),
+        ("attacks", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="zone",
+            name="attack_count",
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        # Backfill from existing attacks so the counter starts out consistent
+        migrations.RunSQL(
+            sql=(
+                "UPDATE zones_zone SET attack_count = counts.total "
+                "FROM (SELECT zone_id, COUNT(*) AS total FROM attacks_attack GROUP BY zone_id) AS counts "
+                "WHERE zones_zone.id = counts.zone_id"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:02
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zones", "0002_zone_attack_count"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="zonecheckin",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
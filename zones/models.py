@@ -1,5 +1,6 @@
 from django.contrib.gis.db import models
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.utils import timezone
 from datetime import timedelta
 
@@ -14,6 +15,7 @@ class Zone(models.Model):
     claimed_at = models.DateTimeField(null=True, blank=True)
     expires_at = models.DateTimeField(null=True, blank=True)
     xp_value = models.PositiveIntegerField(default=10)
+    attack_count = models.PositiveIntegerField(default=0, db_index=True)  # Maintained by GameStatsService
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -40,20 +42,82 @@ class Zone(models.Model):
             return 0
         return self.owner.attack_power + 20  # Defender advantage
 
-    def claim(self, user):
-        """Claim this zone for a user"""
+    @staticmethod
+    def free_sql(alias, now):
+        """SQL that is true while the zone row `alias` is unowned or has expired by `now`"""
+        return f"({alias}.owner_id IS NULL OR {alias}.expires_at IS NULL OR {alias}.expires_at <= {now})"
+
+    def claim(self, user, from_owner=None):
+        """Claim this zone for a user if it is free, returning whether the claim went through
+
+        With from_owner the zone is captured instead, provided from_owner still holds it.
+        The check and the write of the ownership columns are a single statement on the
+        locked row, so only one of several simultaneous claims wins; either way the
+        instance is left showing the zone's current owner.
+        """
         from django.conf import settings
+        table = self._meta.db_table
+        claimed_at = timezone.now()
+        expires_at = claimed_at + timedelta(hours=settings.ZONE_EXPIRY_HOURS)
+        if from_owner is None:
+            guard, guard_params = self.free_sql('previous', '%s'), [claimed_at]
+        else:
+            guard, guard_params = 'previous.owner_id = %s AND previous.expires_at > %s', [from_owner.pk, claimed_at]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH previous AS (
+                    SELECT id, owner_id, claimed_at, expires_at FROM {table} WHERE id = %s FOR UPDATE
+                ), claimed AS (
+                    UPDATE {table} AS zone
+                    SET owner_id = %s, claimed_at = %s, expires_at = %s, updated_at = %s
+                    FROM previous
+                    WHERE zone.id = previous.id AND {guard}
+                    RETURNING zone.id
+                )
+                SELECT owner_id, claimed_at, expires_at, EXISTS (SELECT 1 FROM claimed) FROM previous
+                """,
+                [self.pk, user.pk, claimed_at, expires_at, claimed_at] + guard_params
+            )
+            row = cursor.fetchone()
+
+        if row is None:
+            return False
+        previous_owner_id, previous_claimed_at, previous_expires_at, claimed = row
+        if not claimed:
+            self.owner_id, self.claimed_at, self.expires_at = previous_owner_id, previous_claimed_at, previous_expires_at
+            return False
+
         self.owner = user
-        self.claimed_at = timezone.now()
-        self.expires_at = self.claimed_at + timedelta(hours=settings.ZONE_EXPIRY_HOURS)
-        self.save()
+        self.claimed_at = claimed_at
+        self.expires_at = expires_at
+        self.updated_at = claimed_at
+        self.record_claim(previous_owner_id)
+        return True
+
+    def record_claim(self, previous_owner_id):
+        """Count and publish a claim of this zone that has been written"""
+        from leaderboard.services import GameStatsService
+        from .live import publish_zone
+        if previous_owner_id is None:
+            GameStatsService.increment('total_zones')
+        captured = previous_owner_id is not None and previous_owner_id != self.owner_id
+        publish_zone(self, 'capture' if captured else 'claim')
 
     def unclaim(self):
         """Remove ownership of this zone"""
+        from leaderboard.services import GameStatsService
+        from .live import publish_zone
+        was_owned = self.owner_id is not None
         self.owner = None
         self.claimed_at = None
         self.expires_at = None
-        self.save()
+        self.save(update_fields=['owner', 'claimed_at', 'expires_at', 'updated_at'])
+
+        if was_owned:
+            GameStatsService.increment('total_zones', -1)
+            publish_zone(self, 'expire')
 
     @classmethod
     def generate_zone_id(cls, lat, lng, grid_size=0.001):
@@ -68,7 +132,7 @@ class ZoneCheckIn(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='zone_checkins')
     zone = models.ForeignKey(Zone, on_delete=models.CASCADE, related_name='checkins')
     location = models.PointField()  # User's actual location during check-in
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)  # Set when checking in, not when a buffered insert runs
     success = models.BooleanField(default=True)
 
     class Meta:
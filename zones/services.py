@@ -3,7 +3,12 @@ from django.contrib.gis.measure import Distance
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.utils import timezone
-from .models import Zone, ZoneCheckIn
+from datetime import timedelta
+from leaderboard.services import PeriodLeaderboardService
+from users.progression import ProgressionService
+from utils.metrics import timed
+from . import checkins
+from .models import Zone
 from .tasks import schedule_zone_expiry
 
 User = get_user_model()
@@ -30,6 +35,66 @@ class ZoneService:
         )
         return zone, created
 
+    @staticmethod
+    def acquire_zone(zone_id, user, user_location):
+        """Create a zone claimed by the user, or claim it if it is free, in one statement
+
+        Returns the zone as it ends up and whether the user claimed it. A free zone is only
+        claimed when the user is within capture radius of it; a new zone is created at the
+        user's location. The zone's previous owner is kept on zone.previous_owner_id.
+        """
+        table = Zone._meta.db_table
+        claimed_at = timezone.now()
+        zones = list(Zone.objects.raw(
+            f"""
+            WITH previous AS (
+                SELECT owner_id FROM {table} WHERE id = %(id)s
+            ), acquired AS (
+                INSERT INTO {table} (
+                    id, location, owner_id, claimed_at, expires_at, xp_value, attack_count, created_at, updated_at
+                )
+                VALUES (
+                    %(id)s, ST_SetSRID(ST_MakePoint(%(longitude)s, %(latitude)s), 4326), %(owner)s,
+                    %(claimed_at)s, %(expires_at)s, %(xp_value)s, 0, %(claimed_at)s, %(claimed_at)s
+                )
+                ON CONFLICT (id) DO UPDATE
+                SET owner_id = EXCLUDED.owner_id,
+                    claimed_at = EXCLUDED.claimed_at,
+                    expires_at = EXCLUDED.expires_at,
+                    updated_at = EXCLUDED.updated_at
+                WHERE {Zone.free_sql(table, 'EXCLUDED.claimed_at')}
+                    AND ST_Distance({table}.location, EXCLUDED.location) * 111000 <= %(radius)s
+                RETURNING *
+            )
+            SELECT acquired.*, TRUE AS acquired, (SELECT owner_id FROM previous) AS previous_owner_id
+            FROM acquired
+            UNION ALL
+            SELECT {table}.*, FALSE, owner_id
+            FROM {table}
+            WHERE id = %(id)s AND NOT EXISTS (SELECT 1 FROM acquired)
+            """,
+            {
+                'id': zone_id,
+                'longitude': user_location.x,
+                'latitude': user_location.y,
+                'owner': user.pk,
+                'claimed_at': claimed_at,
+                'expires_at': claimed_at + timedelta(hours=settings.ZONE_EXPIRY_HOURS),
+                'xp_value': Zone._meta.get_field('xp_value').default,
+                'radius': settings.ZONE_CAPTURE_RADIUS_METERS,
+            }
+        ))
+        if zones:
+            zone = zones[0]
+        else:
+            # Inserted by a transaction that committed after this statement's snapshot was taken
+            zone = Zone.objects.get(id=zone_id)
+            zone.acquired, zone.previous_owner_id = False, zone.owner_id
+
+        if zone.owner_id == user.pk:
+            zone.owner = user
+        return zone, zone.acquired
+
     @staticmethod
     def validate_user_location(user_location, zone_location):
         """Validate user is within capture radius"""
@@ -37,30 +102,22 @@ class ZoneService:
         return distance <= settings.ZONE_CAPTURE_RADIUS_METERS
 
     @staticmethod
+    @timed('check_in')
     def check_in_to_zone(user, zone_id, user_location):
-        """Handle zone check-in logic"""
-        zone, created = ZoneService.get_or_create_zone(
-            zone_id,
-            user_location.y,
-            user_location.x
-        )
+        """Handle zone check-in logic, returning the check-in, a message and the checkins outcome"""
+        # Creates the zone on a first visit and claims it if it is free
+        zone, claimed = ZoneService.acquire_zone(zone_id, user, user_location)
 
         # Validate location
-        if not ZoneService.validate_user_location(user_location, zone.location):
+        if not claimed and not ZoneService.validate_user_location(user_location, zone.location):
             raise ValueError(f"You must be within {settings.ZONE_CAPTURE_RADIUS_METERS}m of the zone")
 
-        # Create check-in record
-        checkin = ZoneCheckIn.objects.create(
-            user=user,
-            zone=zone,
-            location=user_location
-        )
+        # Record the check-in, skipping GPS jitter repeats
+        checkin, outcome = checkins.record(user, zone, user_location)
 
-        # Handle zone claiming logic
-        if not zone.is_claimed:
-            # Zone is unclaimed, user can claim it
-            zone.claim(user)
-            ZoneService.update_user_stats(user, zone.xp_value)
+        if claimed:
+            zone.record_claim(zone.previous_owner_id)
+            ZoneService.update_user_stats(user, zone.xp_value, zones_captured=1)
 
             # Schedule zone expiry task
             schedule_zone_expiry.apply_async(
@@ -68,32 +125,24 @@ class ZoneService:
                 eta=zone.expires_at
             )
 
-            return checkin, "Zone claimed successfully!"
+            return checkin, "Zone claimed successfully!", outcome
 
-        elif zone.owner == user:
+        elif zone.owner_id == user.pk:
             # User already owns this zone
-            return checkin, "You already own this zone"
+            return checkin, "You already own this zone", outcome
 
         else:
             # Zone is owned by someone else - this is just a check-in
-            return checkin, "Zone is owned by another player. Use attack to claim it!"
+            return checkin, "Zone is owned by another player. Use attack to claim it!", outcome
 
     @staticmethod
-    def update_user_stats(user, xp_gained):
+    def update_user_stats(user, xp_gained, zones_captured=0):
         """Update user XP, level, and zone count"""
-        user.xp += xp_gained
-
-        # Simple level calculation (every 100 XP = 1 level)
-        new_level = (user.xp // 100) + 1
-        if new_level > user.level:
-            user.level = new_level
-
-        # Update zones owned count
-        user.zones_owned = user.owned_zones.filter(
-            expires_at__gt=timezone.now()
-        ).count()
+        # Zone counts only change on a capture or a loss (the calls without XP)
+        ProgressionService.apply(user, xp_gained, recount_zones=bool(zones_captured) or not xp_gained)
 
-        user.save(update_fields=['xp', 'level', 'zones_owned'])
+        # Feed the daily/weekly/season leaderboard buckets
+        PeriodLeaderboardService.record_progress(user, xp_gained, zones_captured)
 
     @staticmethod
     def expire_zone(zone_id):
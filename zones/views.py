@@ -8,6 +8,7 @@ from django.contrib.gis.geos import Point
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.conf import settings
+from . import checkins
 from .models import Zone, ZoneCheckIn
 from .serializers import (
     ZoneSerializer,
@@ -24,6 +25,7 @@ class ZoneViewSet(ModelViewSet):
     queryset = Zone.objects.select_related('owner')
     serializer_class = ZoneSerializer
     lookup_field = 'id'
+    read_replica = True  # Safe methods only, claims and check-ins stay on the primary
 
     def get_permissions(self):
         """No permissions needed for listing/retrieving zones"""
@@ -74,22 +76,19 @@ class ZoneViewSet(ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Check if zone is already claimed
-            if zone.is_claimed and zone.owner != request.user:
+            # Claim the zone if it is free; a claimed zone is left as it is
+            if not zone.claim(request.user):
+                if zone.owner_id == request.user.pk:
+                    return Response(
+                        {'message': 'You already own this zone'},
+                        status=status.HTTP_200_OK
+                    )
                 return Response(
                     {'error': 'Zone is already claimed by another player. Use attack to claim it!'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            if zone.is_claimed and zone.owner == request.user:
-                return Response(
-                    {'message': 'You already own this zone'},
-                    status=status.HTTP_200_OK
-                )
-
-            # Claim the zone
-            zone.claim(request.user)
-            ZoneService.update_user_stats(request.user, zone.xp_value)
+            ZoneService.update_user_stats(request.user, zone.xp_value, zones_captured=1)
 
             return Response(
                 {
@@ -120,17 +119,25 @@ class ZoneViewSet(ModelViewSet):
             longitude = float(request.data.get('longitude'))
             user_location = Point(longitude, latitude)
 
-            checkin, message = ZoneService.check_in_to_zone(
+            checkin, message, outcome = ZoneService.check_in_to_zone(
                 request.user,
                 id,
                 user_location
             )
 
+            # A repeat within the dedup window isn't stored again, and a buffered one is
+            # accepted now but only stored on the next flush
+            response_status = {
+                checkins.RECORDED: status.HTTP_201_CREATED,
+                checkins.DEDUPLICATED: status.HTTP_200_OK,
+                checkins.QUEUED: status.HTTP_202_ACCEPTED,
+            }[outcome]
             response_serializer = ZoneCheckInResponseSerializer(checkin)
             return Response({
                 'checkin': response_serializer.data,
-                'message': message
-            }, status=status.HTTP_201_CREATED)
+                'message': message,
+                'deduplicated': outcome == checkins.DEDUPLICATED
+            }, status=response_status)
 
         except ValueError as e:
             return Response(
@@ -166,6 +173,7 @@ class UserZonesView(APIView):
 
 class ZoneCheckInHistoryView(APIView):
     """Get user's check-in history"""
+    read_replica = True
 
     def get(self, request):
         if not request.user.is_authenticated: